@@ -1,12 +1,19 @@
 """Initializes game database."""
 
+from sqlalchemy.engine import Engine
+
 from src.backend.database.config import engine
 from src.backend.database.models import Base
 
 
+def create_tables(bind: Engine = engine) -> None:
+    """Creates the tables that don't exist yet."""
+    Base.metadata.create_all(bind=bind)
+
+
 def initialize_db():
     """Creates all tables based on SQLAlchemy models."""
-    Base.metadata.create_all(bind=engine)
+    create_tables()
     print("✅ Database initialized successfully!")
 
 
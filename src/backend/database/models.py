@@ -1,6 +1,18 @@
 """Defines models for game database."""
 
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Table, Text
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    Table,
+    Text,
+)
 from sqlalchemy.dialects.sqlite import JSON
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -9,6 +21,11 @@ from src.utils import weighted_random_stat
 Base = declarative_base()
 
 
+def utc_now() -> datetime:
+    """Current time in UTC, the timezone every timestamp of the database is stored in."""
+    return datetime.now(timezone.utc)
+
+
 # Traits table
 class Trait(Base):
     """Defines character traits that races can have."""
@@ -215,3 +232,74 @@ class Character(Base):
 
     def __repr__(self):
         return f"<Character(name={self.name}, class={self.char_class.name}, race={self.race.name})>"
+
+
+# Game sessions table
+class GameSession(Base):
+    """Defines a game session, the unit of isolation between concurrent games.
+
+    A session owns its character and, in its directory under the game data, its campaign, chat
+    history and story memory. The client only keeps the session id and the last turn it has seen.
+    """
+
+    __tablename__ = "game_sessions"
+
+    id = Column(String, primary_key=True)
+    character_id = Column(Integer, ForeignKey("characters.id"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
+
+    character = relationship("Character")
+
+    def __repr__(self):
+        return f"<GameSession(id={self.id})>"
+
+
+# Campaign jobs table
+class CampaignJob(Base):
+    """Defines a background campaign creation job.
+
+    Jobs are persisted so their results survive client disconnects and server restarts.
+    """
+
+    __tablename__ = "campaign_jobs"
+
+    id = Column(String, primary_key=True)
+    session_id = Column(String, ForeignKey("game_sessions.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending", index=True)
+    user_message = Column(Text, nullable=False)
+    result = Column(JSON, nullable=True)  # Serialized ChatResponse once completed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
+
+    def __repr__(self):
+        return f"<CampaignJob(id={self.id}, status={self.status})>"
+
+
+# Usage ledger table
+class UsageLedgerEntry(Base):
+    """Defines the LLM usage totals of a game session, service type and model.
+
+    Calls made outside of a game session, such as campaign pool refills, have an empty session
+    id. Averages are derived from the totals, TTFT only over the calls that report it and the
+    generation rate only over the calls that report their completion tokens.
+    """
+
+    __tablename__ = "usage_ledger"
+
+    session_id = Column(String, primary_key=True)
+    service_type = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    calls = Column(Integer, nullable=False, default=0)
+    failed_calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_seconds = Column(Float, nullable=False, default=0.0)
+    ttft_calls = Column(Integer, nullable=False, default=0)
+    ttft_seconds = Column(Float, nullable=False, default=0.0)
+    generation_seconds = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now)
+
+    def __repr__(self):
+        return f"<UsageLedgerEntry(session_id={self.session_id}, service_type={self.service_type})>"
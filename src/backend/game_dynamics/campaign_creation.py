@@ -1,17 +1,196 @@
 """Implements campaign creation logic"""
 
+import contextvars
 import random
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
 
 import networkx as nx
 from langchain_community.vectorstores import FAISS
 
+from src.backend.game_dynamics.campaign_pool import CampaignPool
+from src.backend.game_dynamics.game_state_manager import (
+    get_campaign_file,
+    get_session_dir,
+)
+from src.backend.game_dynamics.stage_graph import StageGraph
+from src.backend.orchestrator.deadline import Deadline, DeadlineExceeded
+from src.backend.orchestrator.metrics import IO_SECONDS
 from src.backend.orchestrator.models import ChatRequest, ChatResponse
+from src.backend.orchestrator.router import AUTO_BACKEND
 from src.backend.orchestrator.services import LLMServiceFactory
-from src.constants import DATA_GAME, DATABASE, DATABASE_FAISS
+from src.backend.orchestrator.tracing import span
+from src.backend.utils import atomic_write_text
+from src.constants import DATABASE, DATABASE_FAISS
 from src.logger_definition import get_logger
 
 logger = get_logger(__file__)
 
+# Element category -> (number of FAISS candidates, number randomly selected)
+ELEMENT_SAMPLING = {
+    "characters": (15, 10),
+    "creatures": (15, 10),
+    "items": (15, 10),
+    "cultural_facts": (50, 20),
+}
+
+# Maximum length of the location text used to query the element databases
+ELEMENT_QUERY_MAX_CHARS = 2000
+
+# Campaign generation modes, see `generation_mode` in the campaign-creation service config
+GENERATION_MODES = ("single", "sectioned")
+
+# Body of a generated section whose call failed, the Dungeon Master improvises it from the outline
+SECTION_FALLBACK = (
+    "(This section could not be written. Improvise it from the Campaign Overview and the Core"
+    " Encounters.)"
+)
+
+# Note ending a streamed campaign that failed after its opening sections were handed out
+CAMPAIGN_INCOMPLETE = (
+    "(The rest of this campaign could not be written. Improvise the following acts from the"
+    " Campaign Overview and the Core Encounters.)"
+)
+
+# Heading of the second act. Once it is streamed, the Overview and Act 1 are complete.
+ACT_2_HEADING = re.compile(r"^[\s#*]*Act\s*2\b", re.IGNORECASE | re.MULTILINE)
+
+
+class CampaignStream:
+    """
+    Consumes a streamed campaign generation on a background thread.
+
+    The opening sections (everything before the Act 2 heading) are made available as soon as
+    they are streamed, while the rest of the campaign keeps generating in the background.
+
+    Args:
+        chunks (Iterator[str]): Streamed campaign text.
+        on_opening_sections (Callable[[str], None]): Called with the text of the opening sections
+            as soon as they are complete.
+        on_complete (Callable[[str], None]): Called with the full campaign text.
+        on_incomplete (Callable[[str], None], optional): Called with the text of the opening
+            sections if the stream fails after they were released.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterator[str],
+        on_opening_sections: Callable[[str], None],
+        on_complete: Callable[[str], None],
+        on_incomplete: Callable[[str], None] | None = None,
+    ):
+        self.text = ""
+        self.opening_text: str | None = None
+        self.error: Exception | None = None
+        self.opening_ready = threading.Event()
+        self.done = threading.Event()
+
+        self._chunks = chunks
+        self._on_opening_sections = on_opening_sections
+        self._on_complete = on_complete
+        self._on_incomplete = on_incomplete
+        # The stream is consumed in the context of its caller, in its trace and for its session
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._consume,),
+            name="campaign-stream",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _find_opening_sections(self, start: float, scan_from: int, scan_to: int) -> int:
+        """
+        Looks for the Act 2 heading in the lines of the text between two line starts, releasing
+        the opening sections if it is found. Returns the position the next scan starts from.
+        """
+        match = ACT_2_HEADING.search(self.text, scan_from, scan_to)
+        if match:
+            self._release_opening_sections(self.text[: match.start()].rstrip(), start)
+        return scan_to
+
+    def _consume(self):
+        """Accumulates the stream, firing the callbacks at the opening sections and at the end."""
+        start = time.perf_counter()
+        # Start of the first line not searched for the Act 2 heading yet
+        scanned = 0
+        try:
+            for chunk in self._chunks:
+                self.text += chunk
+
+                # Only complete lines are searched, so a heading split across chunks is found
+                # once its line ends
+                if self.opening_text is None:
+                    line_end = self.text.rfind("\n", scanned) + 1
+                    if line_end:
+                        scanned = self._find_opening_sections(start, scanned, line_end)
+
+            if self.opening_text is None:
+                self._find_opening_sections(start, scanned, len(self.text))
+            # Campaigns without a recognizable Act 2 heading are released once complete
+            if self.opening_text is None:
+                self._release_opening_sections(self.text, start)
+
+            self._on_complete(self.text)
+            logger.info("Campaign stream completed in %.2fs", time.perf_counter() - start)
+        except Exception as e:
+            self.error = e
+            logger.exception("Campaign stream failed")
+            if self.opening_text is not None and self._on_incomplete:
+                self._on_incomplete(self.opening_text)
+        finally:
+            self.opening_ready.set()
+            self.done.set()
+
+    def _release_opening_sections(self, opening_text: str, start: float):
+        """Stores the opening sections and notifies waiters."""
+        self.opening_text = opening_text
+        self._on_opening_sections(opening_text)
+        self.opening_ready.set()
+        logger.info("Campaign opening sections streamed in %.2fs", time.perf_counter() - start)
+
+    def wait_for_opening_sections(self) -> str:
+        """Blocks until the opening sections are streamed and returns them."""
+        self.opening_ready.wait()
+        if isinstance(self.error, DeadlineExceeded):
+            raise self.error
+        if self.opening_text is None:
+            raise RuntimeError("Campaign stream failed before the opening sections") from self.error
+        return self.opening_text
+
+
+class CampaignFile:
+    """
+    Campaign file of a game session, written once the turn opening the campaign is recorded.
+
+    The file moving the session to the story phase, it must not exist before that turn does.
+    Campaign text saved before `commit` is held back and written by it.
+
+    Args:
+        path (Path): Campaign file of the game session.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.text: str | None = None
+        self.committed = False
+        self._lock = threading.Lock()
+
+    def save(self, text: str) -> None:
+        """Saves the campaign text, written to the file right away once committed."""
+        with self._lock:
+            self.text = text
+            if self.committed:
+                atomic_write_text(self.path, text)
+
+    def commit(self) -> None:
+        """Writes the campaign text saved so far, and any saved after, to the file."""
+        with self._lock:
+            self.committed = True
+            atomic_write_text(self.path, self.text)
+
 
 class CampaignManager:
     """
@@ -27,6 +206,12 @@ class CampaignManager:
     Attributes:
         location_service (LLMService): LLM for selecting adventure locations.
         campaign_creation_service (LLMService): LLM for generating the final campaign.
+        generation_mode (str): "single" to write the campaign in one call, or "sectioned" to write
+            an outline first and then every section in parallel.
+        streaming (bool): Whether the campaign is streamed so the opening message can be written
+            before the whole campaign exists. Only supported in "single" mode.
+        campaign_pool (CampaignPool | None): Pool of pregenerated campaigns served to players whose
+            story start is close enough to a pooled theme.
         embedding_model (OpenAIEmbeddings): Embedding model for FAISS vector search.
         wiki_graph (networkx.DiGraph): Knowledge graph of Forgotten Realms locations.
         FAISS databases (FAISS): Stores locations, characters, creatures, items, and historical lore
@@ -36,51 +221,94 @@ class CampaignManager:
             Finds the most thematically appropriate Forgotten Realms setting for the adventure.
         select_campaign_elements(selected_location: str, location_summary: str) -> dict
             Retrieves 10 characters, 10 creatures, 10 items, and 20 historical/cultural facts.
-        generate_campaign(user_input: str) -> dict
-            Calls the above methods and generates a fully formatted adventure using GPT.
+        build_campaign_graph(user_input: str) -> StageGraph
+            Builds the creation pipeline as concurrent stages with per-stage timings.
+        generate_campaign(user_input: str) -> str
+            Runs the pipeline and generates a fully formatted adventure using GPT.
     """
 
-    def __init__(self, campaign_backend: str, location_backend: str = "gpt3-5"):
+    def __init__(
+        self,
+        campaign_backend: str,
+        location_backend: str = AUTO_BACKEND,
+        generation_mode: str | None = None,
+        streaming: bool | None = None,
+        campaign_pool: CampaignPool | None = None,
+    ):
         """Initializes FAISS retrievers and OpenAI LLM service."""
         self.location_service = LLMServiceFactory(
             location_backend, "location-selection"
         ).get_service()
-        self.campaign_creation_service = LLMServiceFactory(
-            campaign_backend, "campaign-creation"
-        ).get_service()
+        campaign_factory = LLMServiceFactory(campaign_backend, "campaign-creation")
+        self.campaign_creation_service = campaign_factory.get_service()
+
+        # Generation mode defaults to the one set in the service config
+        self.generation_mode = generation_mode or campaign_factory.service_config.get(
+            "generation_mode", "single"
+        )
+        if self.generation_mode not in GENERATION_MODES:
+            raise ValueError(f"Unsupported campaign generation mode: {self.generation_mode}")
+
+        self.streaming = (
+            streaming
+            if streaming is not None
+            else campaign_factory.service_config.get("streaming", False)
+        )
+        if self.streaming and self.generation_mode != "single":
+            raise ValueError("Campaign streaming is only supported in 'single' generation mode")
+
+        self.campaign_pool = campaign_pool
+
+        if self.generation_mode == "sectioned":
+            self.campaign_outline_service = LLMServiceFactory(
+                campaign_backend, "campaign-outline"
+            ).get_service()
+            section_factory = LLMServiceFactory(campaign_backend, "campaign-section")
+            self.campaign_section_service = section_factory.get_service()
+            self.campaign_sections = section_factory.service_config["sections"]
 
         self.embedding_model = self.location_service.embedding_model
 
         # Load FAISS vector databases
-        self.places_db = FAISS.load_local(
-            str(DATABASE_FAISS / "places"),
-            self.embedding_model,
-            allow_dangerous_deserialization=True,
-        )
-        self.history_db = FAISS.load_local(
-            str(DATABASE_FAISS / "history_and_culture"),
-            self.embedding_model,
-            allow_dangerous_deserialization=True,
-        )
-        self.characters_db = FAISS.load_local(
-            str(DATABASE_FAISS / "characters"),
-            self.embedding_model,
-            allow_dangerous_deserialization=True,
-        )
-        self.creatures_db = FAISS.load_local(
-            str(DATABASE_FAISS / "creatures"),
-            self.embedding_model,
-            allow_dangerous_deserialization=True,
-        )
-        self.items_db = FAISS.load_local(
-            str(DATABASE_FAISS / "items"),
-            self.embedding_model,
-            allow_dangerous_deserialization=True,
-        )
+        with span("faiss.load"), IO_SECONDS.time(component="world", operation="load_faiss"):
+            self.places_db = FAISS.load_local(
+                str(DATABASE_FAISS / "places"),
+                self.embedding_model,
+                allow_dangerous_deserialization=True,
+            )
+            self.history_db = FAISS.load_local(
+                str(DATABASE_FAISS / "history_and_culture"),
+                self.embedding_model,
+                allow_dangerous_deserialization=True,
+            )
+            self.characters_db = FAISS.load_local(
+                str(DATABASE_FAISS / "characters"),
+                self.embedding_model,
+                allow_dangerous_deserialization=True,
+            )
+            self.creatures_db = FAISS.load_local(
+                str(DATABASE_FAISS / "creatures"),
+                self.embedding_model,
+                allow_dangerous_deserialization=True,
+            )
+            self.items_db = FAISS.load_local(
+                str(DATABASE_FAISS / "items"),
+                self.embedding_model,
+                allow_dangerous_deserialization=True,
+            )
+
+        self.element_dbs = {
+            "characters": self.characters_db,
+            "creatures": self.creatures_db,
+            "items": self.items_db,
+            "cultural_facts": self.history_db,
+        }
 
         # Load the NetworkX knowledge graph
         self.wiki_graph = self._load_graph()
 
+    @span("graph.load")
+    @IO_SECONDS.time(component="world", operation="load_graph")
     def _load_graph(self):
         """Loads the knowledge graph from the stored .gml file."""
         graph_path = DATABASE / "forgotten_realms_graph.gml"
@@ -145,24 +373,24 @@ class CampaignManager:
 
         return hierarchy[::-1]  # Return from broad to specific
 
-    def select_campaign_location(self, user_input: str):
-        """Generates the campaign starting location based on user input using an LLM-powered FAISS
-        search.
-        """
-
+    @span("faiss.search_locations")
+    @IO_SECONDS.time(component="world", operation="search_locations")
+    def search_locations(self, user_input: str) -> list:
+        """Retrieves candidate campaign locations for the user input from FAISS."""
         # Retrieve 20 relevant locations from FAISS
         retrieved_docs = self.places_db.similarity_search(user_input, k=20)
 
-        if not retrieved_docs:
-            return {"error": "No suitable locations found."}
-
         # Randomly select 10 locations for variety
-        selected_docs = random.sample(retrieved_docs, min(10, len(retrieved_docs)))
+        return random.sample(retrieved_docs, min(10, len(retrieved_docs)))
 
+    def pick_location(
+        self, user_input: str, location_docs: list, deadline: Deadline | None = None
+    ) -> dict:
+        """Asks the location LLM to pick the most appropriate location among the candidates."""
         # Prepare list of retrieved locations
         location_options = [
             f"- {doc.metadata.get('title', 'Unknown')}: {doc.page_content[:300]}..."
-            for doc in selected_docs
+            for doc in location_docs
         ]
 
         # Construct LLM prompt to pick the best specific location
@@ -175,132 +403,375 @@ class CampaignManager:
             location_list=location_list, user_input=user_input
         )
 
-        chosen_location = self.location_service.generate_formatted_response(location_prompt).strip()
+        chosen_location = self.location_service.generate_formatted_response(
+            location_prompt, deadline
+        ).strip()
         location_description = [
             location.page_content
-            for location in selected_docs
+            for location in location_docs
             if location.metadata.get("title") == chosen_location
         ][0]
 
-        # Get a location summary from full description of selected location
-        location_summary = self.location_service.generate_formatted_response(
+        return {"selected_location": chosen_location, "location_description": location_description}
+
+    def summarize_location(
+        self, location_description: str, deadline: Deadline | None = None
+    ) -> str:
+        """Gets a location summary from the full description of the selected location."""
+        return self.location_service.generate_formatted_response(
             "Create a summarized version of the following fantasy location wiki:"
-            f" {location_description}"
+            f" {location_description}",
+            deadline,
         )
 
-        # Retrieve hierarchical location breakdown
-        location_hierarchy = self.get_hierarchical_location(chosen_location)
+    def select_campaign_location(self, user_input: str):
+        """Generates the campaign starting location based on user input using an LLM-powered FAISS
+        search.
+        """
+        selected_docs = self.search_locations(user_input)
+
+        if not selected_docs:
+            return {"error": "No suitable locations found."}
+
+        location = self.pick_location(user_input, selected_docs)
 
         return {
-            "selected_location": chosen_location,
-            "location_description": location_description,
-            "location_summary": location_summary,
-            "location_hierarchy": location_hierarchy,
+            **location,
+            "location_summary": self.summarize_location(location["location_description"]),
+            "location_hierarchy": self.get_hierarchical_location(location["selected_location"]),
         }
 
+    def embed_element_query(self, selected_location: str, location_text: str) -> list[float]:
+        """Embeds the query shared by all world element searches for a location.
+
+        The query is embedded once and reused for every FAISS element database.
+        """
+        return self.embedding_model.embed_query(
+            f"{selected_location}: {location_text[:ELEMENT_QUERY_MAX_CHARS]}"
+        )
+
+    @span("faiss.search_elements")
+    @IO_SECONDS.time(component="world", operation="search_elements")
+    def retrieve_elements(self, category: str, query_embedding: list[float]) -> list[str]:
+        """Retrieves and randomly samples world elements of a single category.
+
+        Args:
+            category (str): One of the keys of `ELEMENT_SAMPLING`.
+            query_embedding (list[float]): Embedded location query.
+
+        Returns:
+            list[str]: Titles of the selected elements, or trimmed page content for lore facts.
+        """
+        candidates, selected = ELEMENT_SAMPLING[category]
+        docs = self.element_dbs[category].similarity_search_by_vector(query_embedding, k=candidates)
+
+        # Randomly select the required number from candidates
+        selected_docs = random.sample(docs, min(selected, len(docs)))
+
+        if category == "cultural_facts":
+            return [fact.page_content[:300] for fact in selected_docs]  # Trim for clarity
+        return [doc.metadata.get("title", "Unknown") for doc in selected_docs]
+
     def select_campaign_elements(self, selected_location: str, location_summary: str):
         """
         Fetches a list of related characters, creatures, items, and historical/cultural facts
         for the given location. Constructs a structured adventure context summary.
         """
-
         # Use both the location name and summary in FAISS searches
-        search_query = f"{selected_location}: {location_summary}"
-
-        # Retrieve 15 candidates for each category
-        characters = self.characters_db.similarity_search(search_query, k=15)
-        creatures = self.creatures_db.similarity_search(search_query, k=15)
-        items = self.items_db.similarity_search(search_query, k=15)
-        cultural_facts = self.history_db.similarity_search(search_query, k=50)
-
-        # Randomly select the required number from candidates
-        selected_characters = random.sample(characters, min(10, len(characters)))
-        selected_creatures = random.sample(creatures, min(10, len(creatures)))
-        selected_items = random.sample(items, min(10, len(items)))
-        selected_cultural_facts = random.sample(cultural_facts, min(20, len(cultural_facts)))
-
-        # Extract metadata for final selection
-        character_list = [char.metadata.get("title", "Unknown") for char in selected_characters]
-        creature_list = [
-            creature.metadata.get("title", "Unknown") for creature in selected_creatures
-        ]
-        item_list = [item.metadata.get("title", "Unknown") for item in selected_items]
-        cultural_fact_list = [
-            fact.page_content[:300] for fact in selected_cultural_facts
-        ]  # Trim for clarity
+        query_embedding = self.embed_element_query(selected_location, location_summary)
 
         # Build a structured summary
         adventure_context = {
             "selected_location": selected_location,
             "location_summary": location_summary,
-            "characters": character_list,
-            "creatures": creature_list,
-            "items": item_list,
-            "cultural_facts": cultural_fact_list,
         }
+        for category in ELEMENT_SAMPLING:
+            adventure_context[category] = self.retrieve_elements(category, query_embedding)
 
         return adventure_context
 
-    def generate_campaign(self, user_input: str) -> str:
-        """
-        Generates a full D&D one-shot campaign from scratch using user input.
-
-        This method:
-        - Selects an appropriate Forgotten Realms location.
-        - Retrieves relevant characters, creatures, items, and lore.
-        - Calls GPT-4 to generate a complete campaign based on the D&D One-Shot Template.
+    @staticmethod
+    def _prompt_elements(campaign_context: dict) -> dict[str, str]:
+        """Formats the adventure context as keyword arguments for the campaign prompts."""
+        return {
+            "selected_location": campaign_context["selected_location"],
+            "location_summary": campaign_context["location_summary"],
+            "characters": ", ".join(campaign_context["characters"]),
+            "creatures": ", ".join(campaign_context["creatures"]),
+            "items": ", ".join(campaign_context["items"]),
+            "cultural_facts": ", ".join(campaign_context["cultural_facts"]),
+        }
 
-        Args:
-            user_input (str): A brief description of the type of adventure the user wants.
+    def write_campaign(self, campaign_context: dict, deadline: Deadline | None = None) -> str:
+        """Calls the campaign LLM to write the full campaign from the adventure context."""
+        if not self.campaign_creation_service.initial_prompt:
+            raise ValueError("Missing system prompt for campaign creation service")
 
-        Returns:
-            str: The generated campaign text.
-        """
-        # Select the campaign location
-        location_output = self.select_campaign_location(user_input)
+        campaign_creation_prompt = self.campaign_creation_service.initial_prompt.format(
+            **self._prompt_elements(campaign_context)
+        )
 
-        # Retrieve campaign elements (characters, creatures, items, lore)
-        campaign_elements = self.select_campaign_elements(
-            location_output["selected_location"], location_output["location_summary"]
+        return self.campaign_creation_service.generate_formatted_response(
+            campaign_creation_prompt, deadline
         )
 
+    def stream_campaign(
+        self, campaign_context: dict, deadline: Deadline | None = None
+    ) -> Iterator[str]:
+        """Streams the full campaign from the adventure context."""
         if not self.campaign_creation_service.initial_prompt:
             raise ValueError("Missing system prompt for campaign creation service")
 
         campaign_creation_prompt = self.campaign_creation_service.initial_prompt.format(
-            selected_location=campaign_elements["selected_location"],
-            location_summary=campaign_elements["location_summary"],
-            characters=", ".join(campaign_elements["characters"]),
-            creatures=", ".join(campaign_elements["creatures"]),
-            items=", ".join(campaign_elements["items"]),
-            cultural_facts=", ".join(campaign_elements["cultural_facts"]),
+            **self._prompt_elements(campaign_context)
+        )
+
+        return self.campaign_creation_service.stream_formatted_response(
+            campaign_creation_prompt, deadline
         )
 
-        return self.campaign_creation_service.generate_formatted_response(campaign_creation_prompt)
+    def write_campaign_outline(
+        self, campaign_context: dict, deadline: Deadline | None = None
+    ) -> str:
+        """Writes the compact campaign outline every section of a sectioned campaign builds on."""
+        if not self.campaign_outline_service.initial_prompt:
+            raise ValueError("Missing system prompt for campaign outline service")
 
-    def initialize_campaign(
-        self, request: ChatRequest, file_name: str = "active_campaign.txt"
-    ) -> ChatResponse:
+        outline_prompt = self.campaign_outline_service.initial_prompt.format(
+            **self._prompt_elements(campaign_context)
+        )
+
+        return self.campaign_outline_service.generate_formatted_response(outline_prompt, deadline)
+
+    def write_campaign_section(
+        self,
+        section: dict,
+        outline: str,
+        campaign_context: dict,
+        deadline: Deadline | None = None,
+    ) -> str:
+        """Writes the body of a single campaign section, consistent with the outline."""
+        if not self.campaign_section_service.initial_prompt:
+            raise ValueError("Missing system prompt for campaign section service")
+
+        section_prompt = self.campaign_section_service.initial_prompt.format(
+            **self._prompt_elements(campaign_context),
+            outline=outline,
+            section_heading=section["heading"],
+            section_instructions=section["instructions"],
+        )
+
+        return self.campaign_section_service.generate_formatted_response(
+            section_prompt, deadline
+        ).strip()
+
+    def _split_outline(self, outline: str) -> dict[str, str]:
         """
-        Handles campaign initialization based on user starting location prompt response.
+        Splits the outline into the sections that are copied verbatim into the campaign.
+
+        Each outline section starts at its `from_outline` title and runs until the next one. If a
+        title can't be found the whole outline is used for the first section, so no content is
+        ever dropped.
+        """
+        outline_sections = [s for s in self.campaign_sections if s.get("from_outline")]
+        lowered = outline.lower()
+        starts = {
+            section["name"]: lowered.find(section["from_outline"].lower())
+            for section in outline_sections
+        }
+
+        if any(start == -1 for start in starts.values()):
+            logger.warning("Could not split campaign outline, using it as a single section")
+            return {outline_sections[0]["name"]: outline.strip()}
+
+        bounds = sorted(starts.values()) + [len(outline)]
+        split = {}
+        for name, start in starts.items():
+            end = bounds[bounds.index(start) + 1]
+            # Drop the title line itself, the campaign heading replaces it
+            body = outline[start:end].split("\n", 1)
+            split[name] = body[1].strip() if len(body) > 1 else ""
+
+        return split
+
+    def stitch_campaign(self, outline: str, section_texts: dict[str, str]) -> str:
+        """
+        Joins the outline and the generated sections into the campaign document format.
 
         Args:
-            request (ChatRequest): User response to the "where does your story begin" prompt.
+            outline (str): Output of the campaign outline call.
+            section_texts (dict[str, str]): Generated section bodies keyed by section name.
 
         Returns:
-            ChatResponse: A system message embedding the campaign into the LLM context.
+            str: The campaign text, with sections in the order of the campaign-section config.
         """
-        campaign_file = DATA_GAME / file_name
+        texts = {**self._split_outline(outline), **section_texts}
+
+        parts = []
+        current_group = None
+        for section in self.campaign_sections:
+            if section["name"] not in texts:
+                continue
+            group = section.get("group")
+            if group and group != current_group:
+                parts.append(group)
+            current_group = group
+            parts.append(f"{section['heading']}\n{texts[section['name']]}")
+
+        return "\n\n".join(parts)
+
+    def _add_sectioned_campaign_stages(
+        self, graph: StageGraph, deadline: Deadline | None = None
+    ) -> None:
+        """
+        Adds the stages of a sectioned campaign: one outline call, one parallel call per generated
+        section, and a final `campaign` stage stitching them together. A section whose call fails
+        is replaced with a note to improvise it from the outline instead of failing the campaign.
+        """
+        graph.add_stage(
+            "campaign_outline",
+            lambda deps: self.write_campaign_outline(deps["campaign_context"], deadline),
+            depends_on=["campaign_context"],
+        )
 
-        # Generate a new campaign
-        campaign_text = self.generate_campaign(request.user_message)
+        def section_stage(section):
+            def write_section(deps):
+                try:
+                    return self.write_campaign_section(
+                        section, deps["campaign_outline"], deps["campaign_context"], deadline
+                    )
+                except DeadlineExceeded:
+                    raise
+                except Exception:
+                    # The outline holds enough of the story to play through a missing section
+                    logger.exception("Campaign section '%s' failed", section["name"])
+                    return SECTION_FALLBACK
+
+            return write_section
+
+        generated = [
+            section for section in self.campaign_sections if not section.get("from_outline")
+        ]
+        for section in generated:
+            graph.add_stage(
+                f"section_{section['name']}",
+                section_stage(section),
+                depends_on=["campaign_outline", "campaign_context"],
+            )
+
+        graph.add_stage(
+            "campaign",
+            lambda deps: self.stitch_campaign(
+                deps["campaign_outline"],
+                {section["name"]: deps[f"section_{section['name']}"] for section in generated},
+            ),
+            depends_on=["campaign_outline"]
+            + [f"section_{section['name']}" for section in generated],
+        )
 
-        # Save the campaign to a file
-        with open(campaign_file, "w", encoding="utf-8") as f:
-            f.write(campaign_text)
+    def build_campaign_graph(self, user_input: str, deadline: Deadline | None = None) -> StageGraph:
+        """
+        Builds the campaign creation pipeline as a dependency graph of stages.
+
+        The location summary, the hierarchy lookup and the world element retrieval only depend
+        on the picked location, so they run concurrently. Element searches use the raw location
+        description instead of the summary so they don't wait on the summary LLM call. In
+        sectioned mode the campaign sections are also written concurrently once the outline is
+        ready.
+
+        Args:
+            user_input (str): A brief description of the type of adventure the user wants.
+            deadline (Deadline, optional): Time budget of the LLM calls of the stages.
+
+        Returns:
+            StageGraph: Pipeline whose `campaign` stage returns the generated campaign text.
+        """
+        graph = StageGraph("campaign-creation")
+
+        def search(_):
+            location_docs = self.search_locations(user_input)
+            if not location_docs:
+                raise ValueError("No suitable locations found.")
+            return location_docs
+
+        graph.add_stage("location_search", search)
+        graph.add_stage(
+            "location_pick",
+            lambda deps: self.pick_location(user_input, deps["location_search"], deadline),
+            depends_on=["location_search"],
+        )
+        graph.add_stage(
+            "location_summary",
+            lambda deps: self.summarize_location(
+                deps["location_pick"]["location_description"], deadline
+            ),
+            depends_on=["location_pick"],
+        )
+        graph.add_stage(
+            "location_hierarchy",
+            lambda deps: self.get_hierarchical_location(deps["location_pick"]["selected_location"]),
+            depends_on=["location_pick"],
+        )
+        graph.add_stage(
+            "element_query",
+            lambda deps: self.embed_element_query(
+                deps["location_pick"]["selected_location"],
+                deps["location_pick"]["location_description"],
+            ),
+            depends_on=["location_pick"],
+        )
+
+        def retrieval_stage(category):
+            return lambda deps: self.retrieve_elements(category, deps["element_query"])
+
+        for category in ELEMENT_SAMPLING:
+            graph.add_stage(category, retrieval_stage(category), depends_on=["element_query"])
+
+        def build_context(deps):
+            return {
+                "selected_location": deps["location_pick"]["selected_location"],
+                "location_summary": deps["location_summary"],
+                "location_hierarchy": deps["location_hierarchy"],
+                **{category: deps[category] for category in ELEMENT_SAMPLING},
+            }
+
+        graph.add_stage(
+            "campaign_context",
+            build_context,
+            depends_on=["location_pick", "location_summary", "location_hierarchy"]
+            + list(ELEMENT_SAMPLING),
+        )
+        if self.generation_mode == "sectioned":
+            self._add_sectioned_campaign_stages(graph, deadline)
+        else:
+            graph.add_stage(
+                "campaign",
+                lambda deps: self.write_campaign(deps["campaign_context"], deadline),
+                depends_on=["campaign_context"],
+            )
+
+        return graph
 
-        # Create campaign metadata
-        campaign_metadata = [
+    def generate_campaign(self, user_input: str) -> str:
+        """
+        Generates a full D&D one-shot campaign from scratch using user input.
+
+        This method:
+        - Selects an appropriate Forgotten Realms location.
+        - Retrieves relevant characters, creatures, items, and lore.
+        - Calls GPT-4 to generate a complete campaign based on the D&D One-Shot Template.
+
+        Args:
+            user_input (str): A brief description of the type of adventure the user wants.
+
+        Returns:
+            str: The generated campaign text.
+        """
+        return self.build_campaign_graph(user_input).run(["campaign"])["campaign"]
+
+    def get_campaign_metadata(self, campaign_text: str) -> list[dict[str, str]]:
+        """Builds the system messages that embed the campaign into the LLM context."""
+        return [
             {
                 "role": "system",
                 "content": "Game Context: The following will be the campaign setting for all of the"
@@ -310,7 +781,8 @@ class CampaignManager:
             {"role": "system", "content": campaign_text},
         ]
 
-        # Get first campaign message
+    def get_opening_message(self, campaign_text: str, deadline: Deadline | None = None) -> str:
+        """Writes the first Dungeon Master message of the campaign."""
         campaign_start_prompt = f"""
         You are a DnD dungeon master guiding the player through an adventure.
 
@@ -328,8 +800,128 @@ class CampaignManager:
         {campaign_text}
         """
 
-        start_message = self.campaign_creation_service.generate_formatted_response(
-            campaign_start_prompt
+        return self.campaign_creation_service.generate_formatted_response(
+            campaign_start_prompt, deadline
+        )
+
+    def pregenerate_campaign(self, user_input: str) -> tuple[str, str]:
+        """Generates a campaign and its opening message ahead of time for the campaign pool."""
+        campaign_text = self.generate_campaign(user_input)
+        return campaign_text, self.get_opening_message(campaign_text)
+
+    def _claim_pooled_campaign(
+        self, user_input: str, campaign_file: CampaignFile
+    ) -> ChatResponse | None:
+        """
+        Serves a pregenerated campaign if the player's story start matches a pooled theme.
+
+        Every answer is recorded for theme clustering, matched or not. Claiming a campaign wakes
+        the pool worker up so it is replaced in the background.
+        """
+        embedding = self.embedding_model.embed_query(user_input)
+        self.campaign_pool.record_answer(user_input, embedding)
+
+        campaign = self.campaign_pool.claim(embedding)
+        if not campaign:
+            return None
+
+        self.campaign_pool.request_refill()
+        campaign_file.save(campaign["campaign_text"])
+
+        return ChatResponse(
+            assistant_message=campaign["opening_message"],
+            metadata=self.get_campaign_metadata(campaign["campaign_text"]),
+        )
+
+    @span("campaign.initialize")
+    def initialize_campaign(
+        self,
+        request: ChatRequest,
+        record_turn: Callable[[ChatResponse], int],
+        deadline: Deadline | None = None,
+    ) -> ChatResponse:
+        """
+        Handles campaign initialization based on user starting location prompt response.
+
+        The opening message is recorded as a turn by `record_turn`, and the campaign is then
+        saved to the file of the request's game session. The file moves the session to the story
+        phase, so if any step fails, the file isn't written and the next player message starts
+        the campaign creation again.
+
+        Args:
+            request (ChatRequest): User response to the "where does your story begin" prompt.
+            record_turn (Callable[[ChatResponse], int]): Records the opening message with its
+                metadata and returns its turn id.
+            deadline (Deadline, optional): Time budget of the campaign creation.
+
+        Returns:
+            ChatResponse: The opening message and its turn id.
+        """
+        campaign_file = CampaignFile(get_campaign_file(get_session_dir(request.session_id)))
+        campaign_file.path.parent.mkdir(parents=True, exist_ok=True)
+
+        response = None
+        if self.campaign_pool and self.campaign_pool.enabled:
+            response = self._claim_pooled_campaign(request.user_message, campaign_file)
+        if not response and self.streaming:
+            response = self._initialize_streamed_campaign(request, campaign_file, deadline)
+        if not response:
+            response = self._initialize_generated_campaign(request, campaign_file, deadline)
+
+        turn = record_turn(response)
+        campaign_file.commit()
+        return ChatResponse(assistant_message=response.assistant_message, turn=turn)
+
+    def _initialize_generated_campaign(
+        self, request: ChatRequest, campaign_file: CampaignFile, deadline: Deadline | None = None
+    ) -> ChatResponse:
+        """
+        Runs the creation pipeline and writes the opening message of the campaign, saving the
+        campaign while the opening message is written since both only depend on its text.
+        """
+        graph = self.build_campaign_graph(request.user_message, deadline)
+        graph.add_stage(
+            "campaign_save",
+            lambda deps: campaign_file.save(deps["campaign"]),
+            depends_on=["campaign"],
+        )
+        graph.add_stage(
+            "opening_message",
+            lambda deps: self.get_opening_message(deps["campaign"], deadline),
+            depends_on=["campaign"],
+        )
+        results = graph.run(deadline=deadline)
+
+        return ChatResponse(
+            assistant_message=results["opening_message"],
+            metadata=self.get_campaign_metadata(results["campaign"]),
         )
 
-        return ChatResponse(assistant_message=start_message, metadata=campaign_metadata)
+    def _initialize_streamed_campaign(
+        self, request: ChatRequest, campaign_file: CampaignFile, deadline: Deadline | None = None
+    ) -> ChatResponse:
+        """
+        Streams the campaign and answers as soon as the Overview and Act 1 are complete.
+
+        The opening sections are saved right away, so the game moves on to the story phase once
+        the turn is recorded, and are replaced with the full campaign once the stream finishes.
+        If the stream fails after that, the campaign is marked incomplete so the Dungeon Master
+        improvises the rest of the story.
+        The returned metadata embeds only the opening sections; `GameStateManager` swaps in the
+        full campaign on later turns.
+        """
+        graph = self.build_campaign_graph(request.user_message, deadline)
+        campaign_context = graph.run(["campaign_context"], deadline)["campaign_context"]
+
+        stream = CampaignStream(
+            self.stream_campaign(campaign_context, deadline),
+            on_opening_sections=campaign_file.save,
+            on_complete=campaign_file.save,
+            on_incomplete=lambda text: campaign_file.save(f"{text}\n\n{CAMPAIGN_INCOMPLETE}"),
+        )
+        opening_text = stream.wait_for_opening_sections()
+
+        return ChatResponse(
+            assistant_message=self.get_opening_message(opening_text, deadline),
+            metadata=self.get_campaign_metadata(opening_text),
+        )
@@ -0,0 +1,311 @@
+"""Implements a pool of pregenerated campaigns for common adventure themes.
+
+Every answer to the "where does your story begin" prompt is recorded with its embedding. A
+background worker clusters past answers into themes and keeps a few campaigns pregenerated for
+the most common ones, so players whose answer is close enough to a theme skip the campaign
+creation pipeline entirely.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from src.backend.utils import atomic_write_text, file_lock
+from src.constants import BACKEND_CONFIG, DATA_GAME
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+POOL_DIR = DATA_GAME / "campaign_pool"
+
+DEFAULT_POOL_CONFIG = {
+    "enabled": False,
+    "backend": "gpt-4",
+    "pool_size": 6,
+    "num_themes": 3,
+    "min_answers": 10,
+    "max_answers": 500,
+    "max_age_hours": 72,
+    "similarity_threshold": 0.88,
+    "refill_interval_minutes": 30,
+}
+
+
+def load_pool_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the `campaign-pool` section of the LLM services config, filling in defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("campaign-pool", {})
+    return {**DEFAULT_POOL_CONFIG, **config}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scales vectors to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def cluster_embeddings(
+    embeddings: np.ndarray, num_clusters: int, iterations: int = 20, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Clusters embeddings with spherical k-means.
+
+    Args:
+        embeddings (np.ndarray): Matrix of shape (n, dim).
+        num_clusters (int): Number of clusters, capped at the number of embeddings.
+        iterations (int): Number of assignment/update rounds.
+        seed (int): Seed for the initial centroid selection.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Unit-length centroids of shape (k, dim) and the cluster
+            label of every embedding.
+    """
+    vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+    num_clusters = min(num_clusters, len(vectors))
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), num_clusters, replace=False)]
+
+    labels = np.zeros(len(vectors), dtype=int)
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        new_centroids = np.array(
+            [
+                vectors[labels == k].mean(axis=0) if np.any(labels == k) else centroids[k]
+                for k in range(num_clusters)
+            ]
+        )
+        new_centroids = _normalize(new_centroids)
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+
+    return centroids, labels
+
+
+class CampaignPool:
+    """
+    Pool of pregenerated campaigns keyed by theme clusters of past story start answers.
+
+    Pooled campaigns are stored as one JSON file each, so claiming a campaign is a single file
+    removal and two players can never be served the same one.
+
+    Args:
+        config (dict): The `campaign-pool` config, see `load_pool_config`.
+        pool_dir (Path): Directory holding recorded answers and pooled campaigns.
+    """
+
+    def __init__(self, config: dict | None = None, pool_dir: Path = POOL_DIR):
+        self.config = config if config is not None else load_pool_config()
+        self.answers_file = pool_dir / "story_starts.jsonl"
+        self.campaigns_dir = pool_dir / "campaigns"
+        self.campaigns_dir.mkdir(parents=True, exist_ok=True)
+
+        # Answers are appended and the pool refilled by every worker process
+        self._answers_lock = file_lock(pool_dir / "story_starts.lock")
+        self._refill_lock = file_lock(pool_dir / "refill.lock")
+        self._refill_requested = threading.Event()
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the pool is enabled in the config."""
+        return bool(self.config["enabled"])
+
+    def record_answer(self, answer: str, embedding: list[float]) -> None:
+        """Stores a story start answer so it is taken into account when clustering themes."""
+        with self._answers_lock, open(self.answers_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"answer": answer, "embedding": embedding}) + "\n")
+
+    def load_answers(self) -> tuple[list[str], np.ndarray]:
+        """
+        Returns the most recent recorded answers and their embeddings.
+
+        Older answers are dropped from the answers file, so it never holds more than the answers
+        recorded since the last refill on top of the ones used for clustering.
+        """
+        if not self.answers_file.exists():
+            return [], np.empty((0, 0), dtype=np.float32)
+
+        with self._answers_lock:
+            with open(self.answers_file, encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            if len(lines) > self.config["max_answers"]:
+                lines = lines[-self.config["max_answers"] :]
+                atomic_write_text(self.answers_file, "".join(lines))
+        records = [json.loads(line) for line in lines]
+
+        return [record["answer"] for record in records], np.array(
+            [record["embedding"] for record in records], dtype=np.float32
+        )
+
+    def cluster_themes(self) -> list[dict]:
+        """
+        Clusters past answers into the most common adventure themes.
+
+        Returns:
+            list[dict]: One theme per cluster, largest first, with the answer closest to the
+                cluster centroid (used to generate its campaigns), the centroid and the size.
+        """
+        answers, embeddings = self.load_answers()
+        if len(answers) < self.config["min_answers"]:
+            return []
+
+        centroids, labels = cluster_embeddings(embeddings, self.config["num_themes"])
+        vectors = _normalize(embeddings)
+
+        themes = []
+        for k, centroid in enumerate(centroids):
+            members = np.flatnonzero(labels == k)
+            if not len(members):
+                continue
+            representative = members[np.argmax(vectors[members] @ centroid)]
+            themes.append(
+                {"answer": answers[representative], "embedding": centroid, "size": len(members)}
+            )
+
+        return sorted(themes, key=lambda theme: theme["size"], reverse=True)
+
+    def _is_fresh(self, campaign: dict) -> bool:
+        """Whether a pooled campaign is younger than the configured maximum age."""
+        return time.time() - campaign["created_at"] < self.config["max_age_hours"] * 3600
+
+    def load_campaigns(self) -> list[dict]:
+        """Returns every fresh pooled campaign, discarding stale ones."""
+        campaigns = []
+        for path in self.campaigns_dir.glob("*.json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    campaign = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue  # Claimed or still being written
+
+            if self._is_fresh(campaign):
+                campaign["path"] = path
+                campaigns.append(campaign)
+            else:
+                path.unlink(missing_ok=True)
+
+        return campaigns
+
+    def add_campaign(self, theme: dict, campaign_text: str, opening_message: str) -> None:
+        """Stores a pregenerated campaign for a theme."""
+        campaign_id = uuid.uuid4().hex
+        campaign = {
+            "id": campaign_id,
+            "theme_answer": theme["answer"],
+            "embedding": np.asarray(theme["embedding"]).tolist(),
+            "created_at": time.time(),
+            "campaign_text": campaign_text,
+            "opening_message": opening_message,
+        }
+
+        # Write under a temporary name so the matcher never reads a partial campaign
+        tmp_path = self.campaigns_dir / f"{campaign_id}.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(campaign, f)
+        tmp_path.rename(self.campaigns_dir / f"{campaign_id}.json")
+
+    def claim(self, embedding: list[float]) -> dict | None:
+        """
+        Claims the pooled campaign whose theme is most similar to an answer.
+
+        Args:
+            embedding (list[float]): Embedding of the player's story start answer.
+
+        Returns:
+            dict | None: The claimed campaign, removed from the pool, or None if no fresh
+                campaign is similar enough.
+        """
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        candidates = sorted(
+            (
+                (float(_normalize(np.asarray(c["embedding"], dtype=np.float32)) @ query), c)
+                for c in self.load_campaigns()
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+
+        for similarity, campaign in candidates:
+            if similarity < self.config["similarity_threshold"]:
+                break
+            try:
+                campaign["path"].unlink()  # Only one claimer can remove the file
+            except FileNotFoundError:
+                continue
+            logger.info("Serving pooled campaign %s (similarity %.3f)", campaign["id"], similarity)
+            return campaign
+
+        return None
+
+    def refill(self, generate: Callable[[str], tuple[str, str]]) -> None:
+        """
+        Tops up the pool so every theme has its share of fresh campaigns.
+
+        Args:
+            generate (Callable[[str], tuple[str, str]]): Generates the campaign text and opening
+                message for a story start answer.
+        """
+        # Workers refill one at a time, so the next one finds the pool already topped up
+        with self._refill_lock:
+            self._refill(generate)
+
+    def _refill(self, generate: Callable[[str], tuple[str, str]]) -> None:
+        """Tops up the pool, see `refill`."""
+        themes = self.cluster_themes()
+        if not themes:
+            return
+
+        per_theme = max(1, self.config["pool_size"] // len(themes))
+        pooled = [
+            _normalize(np.asarray(c["embedding"], dtype=np.float32)) for c in self.load_campaigns()
+        ]
+
+        for theme in themes:
+            if self._stop.is_set():
+                return
+
+            available = sum(
+                float(embedding @ theme["embedding"]) >= self.config["similarity_threshold"]
+                for embedding in pooled
+            )
+
+            for _ in range(per_theme - available):
+                logger.info("Pregenerating campaign for theme '%s'", theme["answer"])
+                try:
+                    campaign_text, opening_message = generate(theme["answer"])
+                except Exception:
+                    logger.exception("Failed to pregenerate campaign")
+                    return
+                self.add_campaign(theme, campaign_text, opening_message)
+
+    def request_refill(self) -> None:
+        """Wakes the worker up to refill the pool without waiting for the next interval."""
+        self._refill_requested.set()
+
+    def start_worker(self, generate: Callable[[str], tuple[str, str]]) -> None:
+        """Starts the background thread that keeps the pool filled."""
+        if self._worker and self._worker.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                self.refill(generate)
+                self._refill_requested.wait(self.config["refill_interval_minutes"] * 60)
+                self._refill_requested.clear()
+
+        self._stop.clear()
+        self._worker = threading.Thread(target=run, name="campaign-pool", daemon=True)
+        self._worker.start()
+
+    def stop_worker(self) -> None:
+        """Signals the background worker to stop after its current campaign."""
+        self._stop.set()
+        self._refill_requested.set()
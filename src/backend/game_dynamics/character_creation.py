@@ -10,10 +10,13 @@ from src.backend.database.models import (
     Character,
     CharacterClass,
     Equipment,
+    GameSession,
     Race,
 )
+from src.backend.orchestrator.deadline import Deadline
 from src.backend.orchestrator.models import ChatRequest, ChatResponse
 from src.backend.orchestrator.services import LLMServiceFactory
+from src.backend.orchestrator.tracing import span
 from src.logger_definition import get_logger
 from src.utils import weighted_random_stat
 
@@ -48,7 +51,11 @@ class CharacterCreationError(Exception):
 
 
 class CharacterManager:
-    """Handles character creation, retrieval, and description for DungeonMind."""
+    """
+    Handles character creation, retrieval, and description for DungeonMind.
+
+    Characters belong to the game session they were created in.
+    """
 
     def __init__(self, db: Session, character_backend: str):
         self.db = db
@@ -63,7 +70,7 @@ class CharacterManager:
         backgrounds = [background.name for background in self.db.query(Background).all()]
         return races, classes, backgrounds
 
-    def parse_character_from_text(self, user_message: str):
+    def parse_character_from_text(self, user_message: str, deadline: Deadline | None = None):
         """
         Uses the LLM to extract character attributes from user input.
         """
@@ -81,7 +88,7 @@ class CharacterManager:
                 {"role": "user", "content": user_message},
             ]
         )
-        response = self.character_service.chat_completion()
+        response = self.character_service.chat_completion(deadline)
 
         try:
             parsed_data = json.loads(response)
@@ -109,9 +116,22 @@ class CharacterManager:
                 "LLM output is not valid JSON.", llm_output=response
             ) from e
 
-    def create_character(self, user_message: str):
-        """Handles character creation when a player does not already have one."""
-        parsed_character = self.parse_character_from_text(user_message)
+    def get_session_character(self, session_id: str) -> Character | None:
+        """Returns the character of a game session, or None if it wasn't created yet."""
+        game_session = self.db.get(GameSession, session_id)
+        return game_session.character if game_session else None
+
+    def create_character(
+        self,
+        user_message: str,
+        game_session: GameSession | None = None,
+        deadline: Deadline | None = None,
+    ):
+        """
+        Handles character creation when a player does not already have one, assigning the
+        character to the player's game session if given.
+        """
+        parsed_character = self.parse_character_from_text(user_message, deadline)
 
         character_name = parsed_character.get("name", DEFAULT_NAME)
         race_name = parsed_character.get("race", DEFAULT_RACE)
@@ -215,6 +235,8 @@ class CharacterManager:
         )
 
         self.db.add(character)
+        if game_session:
+            game_session.character = character
         self.db.commit()
         self.db.refresh(character)
 
@@ -283,9 +305,14 @@ class CharacterManager:
         {inventory_list}
         """
 
-    def initialize_character(self, request: ChatRequest) -> ChatResponse:
+    @span("character.initialize")
+    def initialize_character(
+        self, request: ChatRequest, deadline: Deadline | None = None
+    ) -> ChatResponse:
         """Handles character initialization based on user starting location message"""
-        character, race, char_class, background = self.create_character(request.user_message)
+        character, race, char_class, background = self.create_character(
+            request.user_message, self.db.get(GameSession, request.session_id), deadline
+        )
 
         # Add game context & character details to metadata
         character_summary = self.get_character_summary(character, race, char_class, background)
@@ -0,0 +1,293 @@
+"""Implements an append-only chat history store.
+
+Messages are appended as JSON lines to an active segment, next to a fixed-width index holding the
+byte offset of every line. Appending a turn costs O(turn size) and reading the last N messages
+costs O(N), no matter how long the session is. Once the active segment grows past a threshold,
+all but its most recent messages are moved to an archive segment, zstd-compressed when the
+`zstandard` package is installed. Every access holds a lock file of the store, so several worker
+processes can share it.
+
+Compactions never modify files in use. The new archive segment and active segment are written
+next to the current ones, under the next generation number, and a manifest naming the active
+generation and the number of archived messages is then atomically replaced. A compaction
+interrupted at any point leaves the store as it was before or after it, files it left behind are
+ignored and removed by the next compaction. Accesses only stat the manifest, it is read again, and
+the archive listed again, once a compaction replaced it.
+"""
+
+import json
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.backend.utils import file_lock
+from src.logger_definition import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, archives are stored uncompressed without it
+    zstandard = None
+
+logger = get_logger(__file__)
+
+# Byte offsets are stored as little-endian unsigned 64 bit integers
+OFFSET = struct.Struct("<Q")
+
+
+def write_durably(path: Path, data: bytes) -> None:
+    """Writes a file and flushes it to disk."""
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class ChatHistoryStore:
+    """
+    Append-only chat history stored as JSON lines with an offset index.
+
+    Message indices are global: they keep counting across compactions, so index `i` always
+    refers to the `i`-th message ever appended.
+
+    Args:
+        directory (Path): Directory holding the history files.
+        compact_threshold (int): Number of messages in the active segment that triggers a
+            compaction.
+        keep_recent (int): Number of messages kept in the active segment after a compaction.
+        compress (bool): Whether archive segments are zstd-compressed, if zstandard is installed.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        compact_threshold: int = 2000,
+        keep_recent: int = 200,
+        compress: bool = True,
+    ):
+        if keep_recent >= compact_threshold:
+            raise ValueError("keep_recent must be smaller than compact_threshold")
+
+        self.directory = directory
+        self.archive_dir = directory / "archive"
+        self.manifest_file = directory / "history.manifest"
+        self.compact_threshold = compact_threshold
+        self.keep_recent = keep_recent
+        self.compress = compress and zstandard is not None
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = file_lock(directory / "history.lock")
+        # Stat of the manifest last read, and the archive segments of its archived count
+        self._manifest_stat: tuple[int, int, int] | None = None
+        self._segments: tuple[int, list[tuple[int, int, Path]]] | None = None
+        self._generation, self._archived = self._read_manifest()
+
+    def _read_manifest(self) -> tuple[int, int]:
+        """
+        Generation of the active segment and number of archived messages. The manifest is only
+        read again once it was replaced by a compaction.
+        """
+        try:
+            stat = self.manifest_file.stat()
+        except FileNotFoundError:
+            return 0, 0
+        manifest_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if manifest_stat == self._manifest_stat:
+            return self._generation, self._archived
+
+        manifest = json.loads(self.manifest_file.read_bytes())
+        self._manifest_stat = manifest_stat
+        return manifest["generation"], manifest["archived"]
+
+    def _segment_files(self, generation: int) -> tuple[Path, Path]:
+        """Data and index files of an active segment generation."""
+        return (
+            self.directory / f"history.{generation}.jsonl",
+            self.directory / f"history.{generation}.idx",
+        )
+
+    @property
+    def data_file(self) -> Path:
+        """Data file of the active segment."""
+        return self._segment_files(self._generation)[0]
+
+    @property
+    def index_file(self) -> Path:
+        """Index file of the active segment."""
+        return self._segment_files(self._generation)[1]
+
+    @contextmanager
+    def _locked(self):
+        """Holds the store lock, picking up compactions made by other processes."""
+        with self._lock:
+            self._generation, self._archived = self._read_manifest()
+            yield
+
+    def _archive_segments(self) -> list[tuple[int, int, Path]]:
+        """
+        Returns the (start, stop, path) of every archive segment, in order. Segments past the
+        archived count are leftovers of an interrupted compaction. The archive directory is only
+        listed again once the archived count changed.
+        """
+        if self._segments and self._segments[0] == self._archived:
+            return self._segments[1]
+
+        segments = []
+        for path in self.archive_dir.glob("segment-*"):
+            start, stop = path.name.split(".")[0].split("-")[1:]
+            if int(stop) <= self._archived:
+                segments.append((int(start), int(stop), path))
+        self._segments = (self._archived, sorted(segments))
+        return self._segments[1]
+
+    def _remove_leftovers(self) -> None:
+        """Removes the files of interrupted or replaced compactions."""
+        for path in self.archive_dir.glob("segment-*"):
+            if int(path.name.split(".")[0].split("-")[2]) > self._archived:
+                path.unlink()
+        for path in self.directory.glob("history.*.*"):
+            if path.name.split(".")[1] != str(self._generation) and path != self.manifest_file:
+                path.unlink()
+
+    def _active_count(self) -> int:
+        """Number of messages in the active segment."""
+        if not self.index_file.exists():
+            return 0
+        return self.index_file.stat().st_size // OFFSET.size
+
+    def __len__(self) -> int:
+        with self._locked():
+            return self._archived + self._active_count()
+
+    def append(self, messages: list[dict]) -> None:
+        """Appends messages to the history, compacting the active segment if needed."""
+        if not messages:
+            return
+
+        with self._locked():
+            with open(self.data_file, "ab") as data, open(self.index_file, "ab") as index:
+                offset = data.seek(0, os.SEEK_END)
+                offsets = []
+                for message in messages:
+                    line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+                    offsets.append(OFFSET.pack(offset))
+                    data.write(line)
+                    offset += len(line)
+                # Data is flushed before the index so indexed offsets always point at full lines
+                data.flush()
+                index.write(b"".join(offsets))
+
+            if self._active_count() >= self.compact_threshold:
+                self.compact()
+
+    def _read_active(self, start: int, stop: int) -> list[dict]:
+        """Reads messages [start, stop) of the active segment using the offset index."""
+        if start >= stop:
+            return []
+
+        with open(self.index_file, "rb") as index:
+            index.seek(start * OFFSET.size)
+            first = OFFSET.unpack(index.read(OFFSET.size))[0]
+            index.seek(stop * OFFSET.size)
+            end = index.read(OFFSET.size)
+
+        with open(self.data_file, "rb") as data:
+            data.seek(first)
+            chunk = data.read(OFFSET.unpack(end)[0] - first) if end else data.read()
+
+        return [json.loads(line) for line in chunk.splitlines()[: stop - start]]
+
+    def _read_segment(self, path: Path) -> list[dict]:
+        """Reads every message of an archive segment."""
+        raw = path.read_bytes()
+        if path.suffix == ".zst":
+            raw = zstandard.ZstdDecompressor().decompress(raw)
+        return [json.loads(line) for line in raw.splitlines()]
+
+    def read(self, start: int = 0, stop: int | None = None) -> list[dict]:
+        """
+        Reads messages [start, stop) by global index.
+
+        Only archive segments overlapping the range are read, so recent ranges are served from
+        the active segment alone.
+        """
+        with self._locked():
+            total = self._archived + self._active_count()
+            stop = total if stop is None else min(stop, total)
+            start = max(start, 0)
+
+            messages = []
+            if start < self._archived:
+                for seg_start, seg_stop, path in self._archive_segments():
+                    if seg_stop > start and seg_start < stop:
+                        segment = self._read_segment(path)
+                        messages.extend(segment[max(start - seg_start, 0) : stop - seg_start])
+
+            active_start = max(start - self._archived, 0)
+            messages.extend(self._read_active(active_start, stop - self._archived))
+            return messages
+
+    def read_last(self, n: int) -> list[dict]:
+        """Reads the last `n` messages."""
+        with self._locked():
+            return self.read(len(self) - n)
+
+    def read_all(self) -> list[dict]:
+        """Reads the whole history, including archived messages."""
+        return self.read()
+
+    def compact(self) -> None:
+        """
+        Moves all but the most recent messages of the active segment to an archive segment.
+
+        The archive and the next generation of the active segment are fully written before the
+        manifest is replaced to point at them.
+        """
+        with self._locked():
+            active_count = self._active_count()
+            if active_count <= self.keep_recent:
+                return
+            self._remove_leftovers()
+
+            moved = active_count - self.keep_recent
+            with open(self.index_file, "rb") as index:
+                index.seek(moved * OFFSET.size)
+                recent_index = index.read()
+            split = (
+                OFFSET.unpack_from(recent_index)[0]
+                if recent_index
+                else self.data_file.stat().st_size
+            )
+            recent_offsets = [
+                OFFSET.unpack_from(recent_index, i)[0] - split
+                for i in range(0, len(recent_index), OFFSET.size)
+            ]
+            with open(self.data_file, "rb") as data:
+                archived_data = data.read(split)
+                recent_data = data.read()
+
+            start, stop = self._archived, self._archived + moved
+            archive_name = f"segment-{start:09d}-{stop:09d}.jsonl"
+            if self.compress:
+                archived_data = zstandard.ZstdCompressor().compress(archived_data)
+                archive_name += ".zst"
+
+            old_files = self._segment_files(self._generation)
+            generation = self._generation + 1
+            data_file, index_file = self._segment_files(generation)
+            write_durably(self.archive_dir / archive_name, archived_data)
+            write_durably(data_file, recent_data)
+            write_durably(index_file, b"".join(OFFSET.pack(offset) for offset in recent_offsets))
+
+            # Replacing the manifest commits the compaction
+            tmp_manifest = self.manifest_file.with_suffix(".tmp")
+            write_durably(
+                tmp_manifest, json.dumps({"generation": generation, "archived": stop}).encode()
+            )
+            os.replace(tmp_manifest, self.manifest_file)
+            self._generation, self._archived = generation, stop
+
+            for path in old_files:
+                path.unlink(missing_ok=True)
+
+            logger.info("Compacted chat history: archived messages %d to %d", start, stop)
@@ -0,0 +1,137 @@
+"""Local extractive compression of chat messages before summarization.
+
+Dungeon Master replies repeat descriptions and end with boilerplate prompts to the player, and
+the summarizer pays for every one of those tokens. This module drops boilerplate and repeated
+sentences, then ranks the remaining Dungeon Master sentences with TextRank, PageRank over a
+sentence similarity graph, and keeps the most salient ones. Player messages and sentences with
+numbers, such as HP, damage or gold, are always kept.
+"""
+
+import math
+import re
+
+import numpy as np
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD = re.compile(r"[a-z0-9']+")
+MARKDOWN = re.compile(r"[*_#>`]+")
+
+# Closing prompts that carry no story information
+BOILERPLATE = re.compile(
+    r"^(what (do|will|would) you (do|like to do)|how (do|will|would) you (proceed|respond)"
+    r"|the choice is yours|what is your next move)",
+    re.IGNORECASE,
+)
+
+# Words shorter than this don't count towards sentence similarity
+MIN_WORD_LENGTH = 3
+# Sentences sharing this share of their words are considered repeated
+DUPLICATE_THRESHOLD = 0.8
+# Shorter sentences are never considered repeated
+MIN_DUPLICATE_WORDS = 3
+
+# PageRank damping factor and convergence settings
+DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+
+
+def split_sentences(text: str) -> list[str]:
+    """Splits a message into sentences, removing markdown emphasis and headers."""
+    text = MARKDOWN.sub("", text)
+    return [sentence.strip() for sentence in SENTENCE_SPLIT.split(text) if sentence.strip()]
+
+
+def content_words(sentence: str) -> set[str]:
+    """Lowercased words of a sentence used to compare it with others."""
+    return {word for word in WORD.findall(sentence.lower()) if len(word) >= MIN_WORD_LENGTH}
+
+
+def sentence_similarity(words_a: set[str], words_b: set[str]) -> float:
+    """TextRank similarity: shared words normalized by the log length of both sentences."""
+    if len(words_a) < 2 or len(words_b) < 2:
+        return 0.0
+    return len(words_a & words_b) / (math.log(len(words_a)) + math.log(len(words_b)))
+
+
+def is_duplicate(words: set[str], kept_words: list[set[str]]) -> bool:
+    """Whether a sentence repeats one already kept."""
+    return len(words) >= MIN_DUPLICATE_WORDS and any(
+        len(words & other) / min(len(words), len(other)) >= DUPLICATE_THRESHOLD
+        for other in kept_words
+        if other
+    )
+
+
+def rank_sentences(sentences: list[str]) -> np.ndarray:
+    """Scores sentences with PageRank over their similarity graph."""
+    words = [content_words(sentence) for sentence in sentences]
+    num_sentences = len(sentences)
+
+    weights = np.zeros((num_sentences, num_sentences))
+    for i in range(num_sentences):
+        for j in range(i + 1, num_sentences):
+            weights[i, j] = weights[j, i] = sentence_similarity(words[i], words[j])
+
+    # Sentences without similar ones spread their score evenly, as dangling PageRank nodes do
+    out_weights = weights.sum(axis=1, keepdims=True)
+    transitions = np.where(out_weights > 0, weights / np.maximum(out_weights, 1e-12), 1)
+    transitions /= transitions.sum(axis=1, keepdims=True)
+
+    scores = np.full(num_sentences, 1 / num_sentences)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / num_sentences + DAMPING * scores @ transitions
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def compress_messages(messages: list[dict], keep_ratio: float = 0.5) -> list[dict]:
+    """
+    Compresses chat messages by keeping their most salient sentences.
+
+    Args:
+        messages (list[dict]): Chat messages to compress.
+        keep_ratio (float): Share of the ranked Dungeon Master sentences kept, after boilerplate
+            and repeated sentences are dropped.
+
+    Returns:
+        list[dict]: Messages with the same roles and order, holding only the kept sentences.
+            Messages left without sentences are dropped.
+    """
+    # (message index, sentence, always kept), player sentences are never dropped
+    candidates = []
+    kept_words = []
+    for i, msg in enumerate(messages):
+        for sentence in split_sentences(msg["content"]):
+            if msg["role"] == "user":
+                candidates.append((i, sentence, True))
+                continue
+
+            words = content_words(sentence)
+            if BOILERPLATE.match(sentence) or is_duplicate(words, kept_words):
+                continue
+            kept_words.append(words)
+            candidates.append((i, sentence, any(char.isdigit() for char in sentence)))
+
+    ranked = [c for c in range(len(candidates)) if not candidates[c][2]]
+    if ranked:
+        scores = rank_sentences([candidates[c][1] for c in ranked])
+        num_kept = max(1, round(len(ranked) * keep_ratio))
+        by_score = sorted(zip(scores, ranked), reverse=True)
+        dropped = {c for _, c in by_score[num_kept:]}
+    else:
+        dropped = set()
+
+    sentences = {}
+    for c, (i, sentence, _) in enumerate(candidates):
+        if c not in dropped:
+            sentences.setdefault(i, []).append(sentence)
+
+    return [
+        {"role": msg["role"], "content": " ".join(sentences[i])}
+        for i, msg in enumerate(messages)
+        if i in sentences
+    ]
@@ -0,0 +1,114 @@
+"""Benchmarks the local compression of scenes before summarization on recorded sessions.
+
+Recorded sessions are chat history store directories, or JSON files holding a list of chat
+messages. They are cut into scenes like the story memory does, and for every scene the
+summarizer input tokens and latency are measured with and without compression.
+
+Usage:
+    uv run python -m src.backend.game_dynamics.compression_benchmark [SESSION ...]
+        [--backend gpt-4] [--skip-llm]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.game_dynamics.compression import compress_messages
+from src.backend.game_dynamics.context_packer import format_transcript
+from src.backend.game_dynamics.game_state_manager import SESSIONS_DIR
+from src.backend.orchestrator.services import LLMServiceFactory
+from src.backend.utils import count_tokens
+
+
+def load_session(path: Path) -> list[dict]:
+    """Loads the chat messages of a recorded session, without system messages."""
+    if path.is_dir():
+        messages = ChatHistoryStore(path).read_all()
+    else:
+        with open(path, encoding="utf-8") as f:
+            messages = json.load(f)
+    return [msg for msg in messages if msg["role"] != "system"]
+
+
+def timed(func, *args):
+    """Runs a function, returning its result and the elapsed seconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_scene(scene, keep_ratio, model, summarizer=None) -> dict:
+    """Measures the summarizer input of a scene, and its latency if a summarizer is given."""
+    compressed, compression_time = timed(compress_messages, scene, keep_ratio)
+    raw_log, compressed_log = format_transcript(scene), format_transcript(compressed)
+
+    result = {
+        "raw_tokens": count_tokens(raw_log, model),
+        "compressed_tokens": count_tokens(compressed_log, model),
+        "compression_seconds": compression_time,
+    }
+    if summarizer:
+        prompt = summarizer.initial_prompt
+        _, result["raw_latency"] = timed(
+            summarizer.generate_formatted_response, prompt.format(chat_log=raw_log)
+        )
+        _, result["compressed_latency"] = timed(
+            summarizer.generate_formatted_response, prompt.format(chat_log=compressed_log)
+        )
+    return result
+
+
+def report(results: list[dict]) -> None:
+    """Prints the aggregated benchmark results."""
+    raw = sum(r["raw_tokens"] for r in results)
+    compressed = sum(r["compressed_tokens"] for r in results)
+    compression_ms = statistics.mean(r["compression_seconds"] for r in results) * 1000
+
+    print(f"Scenes: {len(results)}")
+    print(f"Summarizer input tokens: {raw} raw, {compressed} compressed")
+    print(f"Compression ratio: {compressed / raw:.2f} ({1 - compressed / raw:.0%} fewer tokens)")
+    print(f"Local compression time: {compression_ms:.1f} ms per scene")
+
+    if "raw_latency" in results[0]:
+        raw_latency = statistics.mean(r["raw_latency"] for r in results)
+        compressed_latency = statistics.mean(r["compressed_latency"] for r in results)
+        print(
+            f"Summarizer latency: {raw_latency:.2f} s raw, {compressed_latency:.2f} s compressed"
+            f" ({1 - compressed_latency / raw_latency:.0%} faster)"
+        )
+
+
+def main():
+    """Runs the benchmark over the recorded sessions given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "sessions", nargs="*", type=Path, default=sorted(SESSIONS_DIR.glob("*/chat_history"))
+    )
+    parser.add_argument("--backend", default="gpt-4")
+    parser.add_argument("--skip-llm", action="store_true", help="Only measure tokens")
+    args = parser.parse_args()
+
+    factory = LLMServiceFactory(args.backend, "story-summarizer")
+    scene_size = factory.service_config["scene_size"]
+    keep_ratio = factory.service_config["compression_keep_ratio"]
+    model = factory.backend_config["model"]
+    summarizer = None if args.skip_llm else factory.get_service()
+
+    results = []
+    for session in args.sessions:
+        messages = load_session(session)
+        for start in range(0, len(messages) - scene_size + 1, scene_size):
+            scene = messages[start : start + scene_size]
+            results.append(benchmark_scene(scene, keep_ratio, model, summarizer))
+
+    if not results:
+        print("No complete scenes in the recorded sessions")
+        return
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
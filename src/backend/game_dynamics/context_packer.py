@@ -0,0 +1,210 @@
+"""Token-budgeted assembly of the Dungeon Master context.
+
+The Dungeon Master prompt is made of the service's system prompt, the pinned game context
+(character sheet and campaign), the rolling story summary and the conversation turns. The
+packer measures each of them with the model's tokenizer and fits them under the backend's
+`prompt_budget`, dropping the oldest turns first. The player's current message is always sent,
+the pinned context is cut short if it doesn't fit next to it. It also decides when the
+conversation is long enough to be summarized, based on the `summary_trigger_tokens` of the
+backend.
+"""
+
+from functools import lru_cache
+
+from src.backend.utils import count_tokens, truncate_tokens
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+# System messages starting with this header introduce the pinned message that follows them
+GAME_CONTEXT_HEADER = "Game Context:"
+# Role and separator tokens added to every chat message
+MESSAGE_OVERHEAD = 4
+# Newest turns always kept verbatim when summarizing: the player's message and the reply to it
+MIN_RECENT_TURNS = 2
+
+DEFAULT_PROMPT_BUDGET = 6000
+DEFAULT_SUMMARY_TRIGGER_TOKENS = 2000
+DEFAULT_RECENT_TOKENS = 800
+DEFAULT_RECALL_TOKENS = 400
+
+TRANSCRIPT_ROLES = {"system": "Story so far", "user": "Player", "assistant": "Dungeon Master"}
+
+
+@lru_cache(maxsize=128)
+def count_cached_tokens(text: str, model: str) -> int:
+    """Counts the tokens of a text that doesn't change between turns, such as the campaign."""
+    return count_tokens(text, model)
+
+
+def split_history(chat_history: list[dict]) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Splits a chat history into pinned game context, story summaries and conversation turns.
+
+    Pinned context is every "Game Context" header and the system message that follows it.
+    Any other system message is a summary of earlier turns.
+    """
+    pinned, summaries, turns = [], [], []
+    follows_header = False
+    for msg in chat_history:
+        if msg["role"] != "system":
+            turns.append(msg)
+        elif follows_header or msg["content"].startswith(GAME_CONTEXT_HEADER):
+            pinned.append(msg)
+        else:
+            summaries.append(msg)
+        follows_header = msg["role"] == "system" and msg["content"].startswith(GAME_CONTEXT_HEADER)
+    return pinned, summaries, turns
+
+
+def format_transcript(messages: list[dict]) -> str:
+    """Formats summaries and turns as a plain transcript for the summarizer."""
+    return "\n\n".join(
+        f"{TRANSCRIPT_ROLES.get(msg['role'], msg['role'])}: {msg['content']}" for msg in messages
+    )
+
+
+class ContextPacker:
+    """
+    Fits the Dungeon Master context under a token budget.
+
+    Args:
+        model (str): Model whose tokenizer measures the context.
+        backend_config (dict): Backend configuration, with optional `prompt_budget`,
+            `summary_trigger_tokens`, `recent_tokens` and `recall_tokens` keys.
+        system_prompt (str): Dungeon Master system prompt, sent before the chat history.
+    """
+
+    def __init__(self, model: str, backend_config: dict, system_prompt: str = ""):
+        self.model = model
+        self.prompt_budget = backend_config.get("prompt_budget", DEFAULT_PROMPT_BUDGET)
+        self.summary_trigger_tokens = backend_config.get(
+            "summary_trigger_tokens", DEFAULT_SUMMARY_TRIGGER_TOKENS
+        )
+        self.recent_tokens = backend_config.get("recent_tokens", DEFAULT_RECENT_TOKENS)
+        self.recall_tokens = backend_config.get("recall_tokens", DEFAULT_RECALL_TOKENS)
+        self.system_prompt = system_prompt
+
+    def message_tokens(self, msg: dict, cached: bool = False) -> int:
+        """Tokens taken by a chat message, using the cache for immutable messages."""
+        counter = count_cached_tokens if cached else count_tokens
+        return counter(msg["content"], self.model) + MESSAGE_OVERHEAD
+
+    def conversation_tokens(self, chat_history: list[dict]) -> int:
+        """Tokens taken by the summaries and turns, the part of the context that grows."""
+        _, summaries, turns = split_history(chat_history)
+        return sum(self.message_tokens(msg) for msg in summaries + turns)
+
+    def needs_summary(self, chat_history: list[dict]) -> bool:
+        """Whether the conversation reached the summarization threshold."""
+        return self.conversation_tokens(chat_history) >= self.summary_trigger_tokens
+
+    def select_within(self, texts: list[str], budget: int) -> list[str]:
+        """Selects texts in order, skipping those that no longer fit in the token budget."""
+        selected = []
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if tokens <= budget:
+                selected.append(text)
+                budget -= tokens
+        return selected
+
+    def recent_turns_start(self, turns: list[dict]) -> int:
+        """
+        Index of the first turn kept verbatim when summarizing.
+
+        The newest turns are kept up to `recent_tokens`, and never fewer than two.
+        """
+        start, used = len(turns), 0
+        while start > 0:
+            tokens = self.message_tokens(turns[start - 1])
+            if len(turns) - start >= MIN_RECENT_TURNS and used + tokens > self.recent_tokens:
+                break
+            start -= 1
+            used += tokens
+        return start
+
+    def fits(self, chat_history: list[dict]) -> bool:
+        """Whether the whole chat history fits in the prompt budget."""
+        return self.pack(chat_history, log_dropped=False) == chat_history
+
+    def _take(self, messages: list[dict], budget: int, kept: set[int]) -> tuple[int, bool]:
+        """
+        Keeps messages newest first until one doesn't fit in the budget.
+
+        Returns:
+            tuple[int, bool]: Remaining budget and whether every message was kept.
+        """
+        for msg in reversed(messages):
+            if id(msg) in kept:
+                continue
+            tokens = self.message_tokens(msg)
+            if tokens > budget:
+                return budget, False
+            budget -= tokens
+            kept.add(id(msg))
+        return budget, True
+
+    def _take_pinned(
+        self, pinned: list[dict], budget: int, kept: set[int], trimmed: dict[int, dict]
+    ) -> int:
+        """
+        Keeps the pinned context in order. The first message that doesn't fit is cut to the
+        remaining budget, and the ones after it are dropped.
+
+        Returns:
+            int: Remaining budget.
+        """
+        for msg in pinned:
+            tokens = self.message_tokens(msg, cached=True)
+            if tokens > budget:
+                room = budget - MESSAGE_OVERHEAD
+                if room > 0:
+                    content = truncate_tokens(msg["content"], room, self.model)
+                    trimmed[id(msg)] = {**msg, "content": content}
+                    kept.add(id(msg))
+                return 0
+            budget -= tokens
+            kept.add(id(msg))
+        return budget
+
+    def pack(self, chat_history: list[dict], log_dropped: bool = True) -> list[dict]:
+        """
+        Selects the messages sent to the Dungeon Master under the prompt budget.
+
+        The player's current message always goes in. The rest is taken by priority: pinned
+        game context, the recent turns, the summaries and finally older turns, newest first
+        within each group. A group stops at its first message that doesn't fit, so the kept
+        turns are always the latest ones, and pinned context that doesn't fit is cut short.
+        The selected messages keep their original order.
+        """
+        pinned, summaries, turns = split_history(chat_history)
+        budget = self.prompt_budget - count_cached_tokens(self.system_prompt, self.model)
+        kept: set[int] = set()
+        trimmed: dict[int, dict] = {}
+
+        # The Dungeon Master answers the player's current message, it is never dropped
+        current = next((msg for msg in reversed(turns) if msg["role"] == "user"), None)
+        if current is not None:
+            budget -= self.message_tokens(current)
+            kept.add(id(current))
+
+        # The budget is meant to leave room for the pinned context, it is only cut when it doesn't
+        budget = self._take_pinned(pinned, budget, kept, trimmed)
+
+        recent_start = self.recent_turns_start(turns)
+        budget, recent_complete = self._take(turns[recent_start:], budget, kept)
+        budget, _ = self._take(summaries, budget, kept)
+        # Older turns can only follow the recent ones if all of those made it
+        if recent_complete:
+            self._take(turns[:recent_start], budget, kept)
+
+        packed = [trimmed.get(id(msg), msg) for msg in chat_history if id(msg) in kept]
+        if log_dropped and (trimmed or len(packed) < len(chat_history)):
+            logger.warning(
+                "Dropped %d messages and cut %d to fit the %d token prompt budget",
+                len(chat_history) - len(packed),
+                len(trimmed),
+                self.prompt_budget,
+            )
+        return packed
@@ -0,0 +1,138 @@
+"""Implements an episodic memory of the campaign over past exchanges.
+
+Every completed exchange, a player message and the Dungeon Master reply to it, is embedded
+once into a small per-session FAISS index. Before each Dungeon Master call the exchanges most
+relevant to the player's message are recalled, so specific past events stay available after
+the story memory compressed them into summaries.
+"""
+
+import json
+from pathlib import Path
+
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.game_dynamics.context_packer import format_transcript
+from src.backend.utils import atomic_write_text, file_lock
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+# Candidates fetched per recalled exchange, before dropping those still in the context
+FETCH_FACTOR = 4
+
+
+class EpisodicMemory:
+    """
+    Vector index of the past exchanges of a chat history.
+
+    Exchanges record the range of history store indices [start, stop) they come from. OpenAI
+    embeddings are normalized, so the index ranks exchanges by inner product.
+
+    Args:
+        index_dir (Path): Directory holding the FAISS index.
+        embedding_model (Embeddings): Model embedding exchanges and player messages.
+        top_k (int): Maximum number of exchanges recalled per turn.
+    """
+
+    def __init__(self, index_dir: Path, embedding_model: Embeddings, top_k: int = 4):
+        self.index_dir = index_dir
+        self.state_file = index_dir / "state.json"
+        # Indexes are updated from background tasks of every worker while requests read them
+        self._lock = file_lock(index_dir / "index.lock")
+        self.embedding_model = embedding_model
+        self.top_k = top_k
+
+    @property
+    def indexed(self) -> int:
+        """Index of the first history message not indexed yet."""
+        if not self.state_file.exists():
+            return 0
+        with open(self.state_file, encoding="utf-8") as f:
+            return json.load(f)["indexed"]
+
+    def _load_index(self) -> FAISS | None:
+        """Loads the FAISS index, or None if no exchange was indexed yet."""
+        if not (self.index_dir / "index.faiss").exists():
+            return None
+        return FAISS.load_local(
+            str(self.index_dir),
+            self.embedding_model,
+            allow_dangerous_deserialization=True,
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+
+    def add_exchanges(self, history_store: ChatHistoryStore) -> int:
+        """
+        Embeds the exchanges completed since the last update.
+
+        Exchanges are embedded outside the lock and only added if no other update indexed them
+        in the meantime.
+
+        Returns:
+            int: Number of exchanges added to the index.
+        """
+        start = self.indexed
+        messages = history_store.read(start)
+
+        texts, metadatas, indexed = [], [], start
+        for i, (msg, reply) in enumerate(zip(messages, messages[1:])):
+            if msg["role"] == "user" and reply["role"] == "assistant":
+                texts.append(format_transcript([msg, reply]))
+                metadatas.append({"start": start + i, "stop": start + i + 2})
+                indexed = start + i + 2
+
+        if not texts:
+            return 0
+
+        text_embeddings = list(zip(texts, self.embedding_model.embed_documents(texts)))
+
+        with self._lock:
+            if self.indexed != start:
+                logger.info("Discarding exchanges already indexed from message %d", start)
+                return 0
+
+            db = self._load_index()
+            if db is None:
+                self.index_dir.mkdir(parents=True, exist_ok=True)
+                db = FAISS.from_embeddings(
+                    text_embeddings,
+                    self.embedding_model,
+                    metadatas=metadatas,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                )
+            else:
+                db.add_embeddings(text_embeddings, metadatas=metadatas)
+
+            db.save_local(str(self.index_dir))
+            atomic_write_text(self.state_file, json.dumps({"indexed": indexed}))
+
+        logger.info("Indexed %d exchanges up to message %d", len(texts), indexed)
+        return len(texts)
+
+    def recall(self, query: str, before: int) -> list[str]:
+        """
+        Recalls the exchanges most relevant to the query, most relevant first.
+
+        Args:
+            query (str): Player message the exchanges should be relevant to.
+            before (int): Only exchanges ending before this history index are recalled, newer
+                ones are still in the context.
+
+        Returns:
+            list[str]: Transcripts of the recalled exchanges.
+        """
+        with self._lock:
+            db = self._load_index()
+        if db is None:
+            return []
+
+        results = db.similarity_search_with_score_by_vector(
+            self.embedding_model.embed_query(query),
+            k=self.top_k,
+            filter=lambda metadata: metadata["stop"] <= before,
+            fetch_k=self.top_k * FETCH_FACTOR,
+        )
+        return [doc.page_content for doc, _ in results]
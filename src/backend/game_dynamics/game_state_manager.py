@@ -1,84 +1,396 @@
 import json
+import threading
+from functools import partial
+from pathlib import Path
 
-from src.backend.orchestrator.models import ChatRequest
+from fastapi import BackgroundTasks
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.game_dynamics.compression import compress_messages
+from src.backend.game_dynamics.context_packer import (
+    ContextPacker,
+    format_transcript,
+    split_history,
+)
+from src.backend.game_dynamics.episodic_memory import EpisodicMemory
+from src.backend.game_dynamics.story_memory import StoryMemory
+from src.backend.orchestrator.deadline import Deadline
+from src.backend.orchestrator.metrics import IO_SECONDS, STAGE_SECONDS
+from src.backend.orchestrator.router import AUTO_BACKEND
 from src.backend.orchestrator.services import LLMServiceFactory
+from src.backend.orchestrator.telemetry import session_context
+from src.backend.orchestrator.tracing import span
+from src.backend.utils import FileLock, atomic_write_text, file_lock
 from src.constants import DATA_GAME
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+# Every game session keeps its chat history, game context and memories in its own directory
+SESSIONS_DIR = DATA_GAME / "sessions"
+RECALL_HEADER = "Relevant past events, recalled from earlier in the campaign:"
+# Latest stored messages searched for a player message recorded twice
+DEDUPLICATION_WINDOW = 50
+
+# Story memories with a background update running, so a turn arriving before it finishes
+# doesn't start another one
+_memory_updates_in_flight: set[Path] = set()
+_memory_updates_lock = threading.Lock()
+
+
+def get_session_dir(session_id: str) -> Path:
+    """Returns the directory holding the state of a game session."""
+    return SESSIONS_DIR / session_id
+
+
+def get_session_lock(session_dir: Path) -> FileLock:
+    """
+    Returns the lock serializing changes to a game session across worker processes, held while
+    the session is initialized and while a turn is recorded.
+    """
+    return file_lock(session_dir / "session.lock")
+
+
+def get_campaign_lock(session_dir: Path) -> FileLock:
+    """Returns the lock held by the worker generating the campaign of a game session."""
+    return file_lock(session_dir / "campaign.lock")
+
+
+def get_campaign_file(session_dir: Path) -> Path:
+    """Returns the campaign file of a game session, which exists once its campaign is created."""
+    return session_dir / "campaign.txt"
+
+
+def get_history_store(session_dir: Path) -> ChatHistoryStore:
+    """Returns the chat history store of a game session."""
+    return ChatHistoryStore(session_dir / "chat_history")
+
 
-CHAT_HISTORY_FILE = DATA_GAME / "active_campaign_chat_history.json"
+def load_session_messages(history_store: ChatHistoryStore, after: int = 0) -> list[dict]:
+    """Returns the player and Dungeon Master messages stored after the given turn id."""
+    return [
+        {"turn": turn, "role": msg["role"], "content": msg["content"]}
+        for turn, msg in enumerate(history_store.read(after), start=after + 1)
+        if msg["role"] != "system"
+    ]
 
 
 class GameStateManager:
     """
     Handles chat history storage, retrieval, and summarization to maintain story continuity
     while staying within token limits.
+
+    The state of the game session lives in `session_dir`: the full chat history, the campaign,
+    the game context (character sheet and campaign) and the story and episodic memories.
+
+    `backend` is the backend of the Dungeon Master, whose context is packed for its model.
+    Summaries are written by `summary_backend`, by default the one the router picks per call.
     """
 
-    def __init__(self, backend: str):
-        self.summarizer_service = LLMServiceFactory(backend, "story-summarizer").get_service()
+    def __init__(self, backend: str, session_dir: Path, summary_backend: str = AUTO_BACKEND):
+        factory = LLMServiceFactory(summary_backend, "story-summarizer")
+        self.summarizer_service = factory.get_service()
+        self.act_summarizer_service = LLMServiceFactory(
+            summary_backend, "act-summarizer"
+        ).get_service()
+        self.compression_keep_ratio = factory.service_config["compression_keep_ratio"]
+        dungeon_master_factory = LLMServiceFactory(backend, "dungeon-master")
+        self.context_packer = ContextPacker(
+            dungeon_master_factory.backend_config["model"],
+            dungeon_master_factory.backend_config,
+            dungeon_master_factory.service_config["initial_prompt"],
+        )
+        self.session_dir = session_dir
+        self.context_file = session_dir / "context.json"
+        self.campaign_file = get_campaign_file(session_dir)
+        self.history_store = get_history_store(session_dir)
+        self.story_memory = StoryMemory(
+            session_dir / "story_memory.json",
+            scene_size=factory.service_config["scene_size"],
+            scenes_per_act=factory.service_config["scenes_per_act"],
+        )
+        # Only backends with an embedding model recall past exchanges
+        embedding_model = getattr(self.summarizer_service, "embedding_model", None)
+        self.episodic_memory = (
+            EpisodicMemory(session_dir / "episodic_index", embedding_model)
+            if embedding_model
+            else None
+        )
 
-    def load_chat_history(self):
-        """Loads stored chat history from file if available."""
-        if CHAT_HISTORY_FILE.exists():
-            with open(CHAT_HISTORY_FILE, encoding="utf-8") as f:
-                return json.load(f)
-        return []
+    @IO_SECONDS.time(component="game_state", operation="load_history")
+    def load_chat_history(self, last_n: int | None = None):
+        """Loads the stored chat history, or only its last `last_n` messages."""
+        if last_n is not None:
+            return self.history_store.read_last(last_n)
+        return self.history_store.read_all()
 
-    def save_chat_history(self, history):
-        """Saves chat history to file."""
-        with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=4)
+    @IO_SECONDS.time(component="game_state", operation="save_history")
+    def save_chat_history(self, messages):
+        """Appends new messages to the stored chat history."""
+        self.history_store.append(messages)
 
-    def summarize_history(self, chat_history):
+    @property
+    def current_turn(self) -> int:
+        """Turn id of the last stored message, 0 if the session has no messages yet."""
+        return len(self.history_store)
+
+    @IO_SECONDS.time(component="game_state", operation="load_context")
+    def load_context(self) -> list[dict]:
+        """Loads the game context messages: the character sheet and the campaign."""
+        if not self.context_file.exists():
+            return []
+        with open(self.context_file, encoding="utf-8") as f:
+            context = json.load(f)
+
+        # Swap in the full campaign if it finished streaming after it was stored
+        return self.refresh_campaign_context(context)
+
+    def find_reply(self, idempotency_key: str) -> tuple[int, str] | None:
         """
-        Summarizes the first 12 non-system messages in the chat history
-        to reduce the conversation length while preserving context.
+        Turn id and text of the reply to a recently recorded player message, found by its key.
         """
-        system_messages = [msg for msg in chat_history if msg["role"] == "system"]
-        non_system_messages = [msg for msg in chat_history if msg["role"] != "system"]
+        start = max(self.current_turn - DEDUPLICATION_WINDOW, 0)
+        messages = self.history_store.read(start)
+        for i, msg in enumerate(messages):
+            if msg.get("idempotency_key") != idempotency_key:
+                continue
+            for j in range(i + 1, len(messages)):
+                if messages[j]["role"] == "assistant":
+                    return start + j + 1, messages[j]["content"]
+        return None
 
-        messages_to_summarize = non_system_messages[:-4]
+    @span("game_state.record_turn")
+    @STAGE_SECONDS.time(pipeline="chat-turn", stage="record_turn")
+    def record_turn(
+        self,
+        user_message: str,
+        assistant_message: str,
+        metadata=None,
+        idempotency_key: str | None = None,
+    ) -> int:
+        """
+        Stores a player message, the hidden context produced while answering it and the
+        Dungeon Master reply.
 
-        recent_messages = non_system_messages[-4:]
+        A player message already stored with the same idempotency key isn't stored again.
+
+        Returns:
+            int: Turn id of the reply.
+        """
+        with get_session_lock(self.session_dir):
+            if idempotency_key:
+                reply = self.find_reply(idempotency_key)
+                if reply:
+                    logger.info("Request %s was already recorded", idempotency_key)
+                    return reply[0]
+
+            if metadata:
+                context = self.load_context() + metadata
+                with IO_SECONDS.time(component="game_state", operation="save_context"):
+                    atomic_write_text(self.context_file, json.dumps(context, ensure_ascii=False))
+
+            user_msg = {"role": "user", "content": user_message}
+            if idempotency_key:
+                user_msg["idempotency_key"] = idempotency_key
+            self.save_chat_history(
+                [user_msg]
+                + (metadata or [])
+                + [{"role": "assistant", "content": assistant_message}]
+            )
+            return self.current_turn
+
+    def refresh_campaign_context(self, chat_history):
+        """
+        Replaces a partially streamed campaign in the chat history with the full campaign.
+
+        Streamed campaigns are handed to the player as soon as their opening sections exist, so
+        the campaign system message may only hold a prefix of the campaign file.
+        """
+        if not self.campaign_file.exists():
+            return chat_history
 
+        campaign_text = self.campaign_file.read_text(encoding="utf-8")
+
+        for msg in chat_history:
+            if (
+                msg["role"] == "system"
+                and msg["content"] != campaign_text
+                and campaign_text.startswith(msg["content"])
+                # Avoid matching short system messages that happen to prefix the campaign
+                and len(msg["content"]) > len(campaign_text) // 10
+            ):
+                msg["content"] = campaign_text
+
+        return chat_history
+
+    def summarize_scene(self, messages, deadline: Deadline | None = None):
+        """
+        Summarizes the chat messages of a scene with the summarizer service, after compressing
+        them locally to their most salient sentences.
+        """
         if not self.summarizer_service.initial_prompt:
             raise ValueError("Missing system prompt for summarizer service")
 
+        compressed = compress_messages(messages, self.compression_keep_ratio)
         summarizer_prompt = self.summarizer_service.initial_prompt.format(
-            chat_log=str(messages_to_summarize),
+            chat_log=format_transcript(compressed),
         )
 
-        summary = self.summarizer_service.generate_formatted_response(summarizer_prompt)
+        return self.summarizer_service.generate_formatted_response(summarizer_prompt, deadline)
 
-        # Rebuild chat history: Keep system messages, add the summary, and retain last 4 messages
-        new_chat_history = system_messages + [{"role": "system", "content": summary}]
-        new_chat_history.extend(recent_messages)
+    def summarize_act(self, scene_summaries, deadline: Deadline | None = None):
+        """Rolls up the summaries of consecutive scenes into an act summary."""
+        if not self.act_summarizer_service.initial_prompt:
+            raise ValueError("Missing system prompt for act summarizer service")
 
-        return new_chat_history
+        summarizer_prompt = self.act_summarizer_service.initial_prompt.format(
+            scene_summaries="\n\n".join(scene_summaries),
+        )
+
+        return self.act_summarizer_service.generate_formatted_response(summarizer_prompt, deadline)
 
-    def manage_chat_history(self, request: ChatRequest) -> list:
+    @span("game_state.build_history")
+    @STAGE_SECONDS.time(pipeline="chat-turn", stage="build_history")
+    def build_history(self, user_message: str):
         """
-        Handles chat history storage, retrieval, and summarization to maintain story continuity.
+        Builds the chat history from the game context, the story memory, the stored messages it
+        doesn't cover yet and the new player message.
+        """
+        with IO_SECONDS.time(component="game_state", operation="load_history"):
+            memory = self.story_memory.load()
+            recent_messages = self.history_store.read(memory["covered"])
 
-        The function returns a summarized version the history every 12 non-system messages while
-        keeping record of full chat history.
+        return (
+            self.load_context()
+            + self.story_memory.context_messages(memory)
+            + [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in recent_messages
+                if msg["role"] != "system"
+            ]
+            + [{"role": "user", "content": user_message}]
+        )
+
+    @span("game_state.update_story_memory")
+    def update_story_memory(self, deadline: Deadline | None = None) -> bool:
+        """
+        Summarizes the next scene of the chat history, if it ended before the recent turns.
+
+        Returns:
+            bool: Whether a scene was summarized.
         """
+        covered = self.story_memory.covered
+        messages = self.history_store.read(covered)
+        turn_indices = [covered + i for i, msg in enumerate(messages) if msg["role"] != "system"]
+
+        # Recent turns are kept verbatim, scenes must end before them
+        recent_start = self.context_packer.recent_turns_start(
+            [messages[i - covered] for i in turn_indices]
+        )
+        limit = turn_indices[recent_start] if turn_indices else covered
 
-        # Load existing chat history
-        stored_history = self.load_chat_history()
+        return self.story_memory.update(
+            self.history_store,
+            limit,
+            partial(self.summarize_scene, deadline=deadline),
+            partial(self.summarize_act, deadline=deadline),
+        )
 
-        # If no chat history initialize with request history
-        if not stored_history:
-            stored_history = request.conversation_history
-        # If chat history exists append new messages
-        else:
-            stored_history.extend(request.conversation_history[-2:])
+    @span("game_state.recall")
+    @STAGE_SECONDS.time(pipeline="chat-turn", stage="recall")
+    def recall_message(self, chat_history) -> dict | None:
+        """
+        Builds a system message with the past exchanges most relevant to the player's message,
+        within the backend's recall token budget.
 
-        self.save_chat_history(stored_history)
+        Only exchanges already summarized by the story memory are recalled, the newer ones are
+        still in the chat history.
+        """
+        user_messages = [msg for msg in chat_history if msg["role"] == "user"]
+        if not self.episodic_memory or not user_messages:
+            return None
+
+        exchanges = self.episodic_memory.recall(
+            user_messages[-1]["content"], before=self.story_memory.covered
+        )
+        exchanges = self.context_packer.select_within(exchanges, self.context_packer.recall_tokens)
+        if not exchanges:
+            return None
+        return {"role": "system", "content": "\n\n".join([RECALL_HEADER] + exchanges)}
+
+    @span("game_state.dungeon_master_context")
+    def dungeon_master_context(self, chat_history, deadline: Deadline | None = None):
+        """
+        Builds the Dungeon Master context: the chat history with the recalled past exchanges
+        after the story memory, packed under the prompt budget.
+        """
+        if deadline:
+            deadline.check()
+        recalled = self.recall_message(chat_history)
+        if recalled:
+            pinned, summaries, turns = split_history(chat_history)
+            chat_history = pinned + summaries + [recalled] + turns
+        return self.context_packer.pack(chat_history)
+
+    def index_exchanges_in_background(self):
+        """Embeds the exchanges completed since the last turn, logging any failure."""
+        try:
+            with session_context(self.session_dir.name):
+                self.episodic_memory.add_exchanges(self.history_store)
+        except Exception:
+            logger.exception("Background episodic memory update failed")
+
+    def update_story_memory_in_background(self):
+        """Updates the story memory after the response is sent, logging any failure."""
+        try:
+            with session_context(self.session_dir.name):
+                self.update_story_memory()
+        except Exception:
+            logger.exception("Background story memory update failed")
+        finally:
+            with _memory_updates_lock:
+                _memory_updates_in_flight.discard(self.story_memory.memory_file)
+
+    @span("game_state.manage_chat_history")
+    def manage_chat_history(
+        self,
+        user_message: str,
+        background_tasks: BackgroundTasks | None = None,
+        deadline: Deadline | None = None,
+    ) -> list:
+        """
+        Builds the chat history answering a new player message, summarizing it when needed to
+        maintain story continuity.
+
+        Once the conversation reaches the backend's summary token threshold, the next scene is
+        summarized after the response is sent, when `background_tasks` is given, and the next
+        turn picks it up from the story memory. Scenes are only summarized before the reply when
+        the history no longer fits the prompt budget. Completed exchanges are embedded into the
+        episodic memory after the response as well. The player message is stored with the reply
+        by `record_turn`, so the full chat history is always kept on record.
+
+        Summaries made before the reply take the request's `deadline`, background ones don't.
+        """
+        chat_history = self.build_history(user_message)
+
+        if self.episodic_memory and background_tasks is not None:
+            background_tasks.add_task(self.index_exchanges_in_background)
 
         # Summarize history if needed
-        non_system_messages = [
-            msg for msg in request.conversation_history if msg["role"] != "system"
-        ]
-        if len(non_system_messages) >= 16:
-            return self.summarize_history(request.conversation_history)
-        return request.conversation_history
+        if not self.context_packer.needs_summary(chat_history):
+            return chat_history
+
+        if background_tasks is None or not self.context_packer.fits(chat_history):
+            while self.update_story_memory(deadline):
+                chat_history = self.build_history(user_message)
+                if self.context_packer.fits(chat_history):
+                    break
+            return chat_history
+
+        with _memory_updates_lock:
+            if self.story_memory.memory_file in _memory_updates_in_flight:
+                return chat_history
+            _memory_updates_in_flight.add(self.story_memory.memory_file)
+
+        background_tasks.add_task(self.update_story_memory_in_background)
+        return chat_history
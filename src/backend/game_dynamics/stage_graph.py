@@ -0,0 +1,219 @@
+"""Implements a dependency graph executor for multi-stage game pipelines.
+
+Stages are plain callables that declare which other stages they depend on. Every stage starts as
+soon as all of its dependencies have finished, so independent work (LLM calls, FAISS searches,
+graph lookups) runs concurrently on a thread pool. Per-stage timings are recorded on each run so
+the critical path of a pipeline can be inspected, and in the stage duration metrics. Stages run
+in the context of the caller, each in its own span of the caller's trace.
+"""
+
+import contextvars
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+from src.backend.orchestrator.deadline import Deadline
+from src.backend.orchestrator.metrics import PIPELINE_SECONDS, STAGE_SECONDS
+from src.backend.orchestrator.tracing import span
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+
+class Stage:
+    """
+    A named unit of work inside a StageGraph.
+
+    Args:
+        name (str): Unique stage name, also used as the key of its result.
+        func (Callable[[dict[str, Any]], Any]): Stage body. Receives a dict mapping each dependency
+            name to that dependency's result.
+        depends_on (Iterable[str]): Names of the stages that must finish before this one starts.
+    """
+
+    def __init__(
+        self, name: str, func: Callable[[dict[str, Any]], Any], depends_on: Iterable[str] = ()
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class StageTiming:
+    """
+    Start and end times of a finished stage, in seconds relative to the start of the run.
+
+    Attributes:
+        start (float): Offset at which the stage started running.
+        end (float): Offset at which the stage finished.
+    """
+
+    def __init__(self, start: float, end: float):
+        self.start = start
+        self.end = end
+
+    @property
+    def duration(self) -> float:
+        """Wall-clock time spent inside the stage."""
+        return self.end - self.start
+
+
+class StageGraph:
+    """
+    Runs a directed acyclic graph of stages, starting each one as soon as its dependencies finish.
+
+    Stages must be added after their dependencies, which keeps the graph acyclic by construction.
+
+    Args:
+        name (str): Pipeline name used in log messages.
+        max_workers (int): Maximum number of stages running at the same time.
+
+    Attributes:
+        timings (dict[str, StageTiming]): Timings of the stages finished in the last run.
+    """
+
+    def __init__(self, name: str, max_workers: int = 8):
+        self.name = name
+        self.max_workers = max_workers
+        self.stages: dict[str, Stage] = {}
+        self.timings: dict[str, StageTiming] = {}
+        self.total_time = 0.0
+
+    def add_stage(
+        self, name: str, func: Callable[[dict[str, Any]], Any], depends_on: Iterable[str] = ()
+    ) -> None:
+        """Registers a new stage. Dependencies must already be part of the graph."""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' already exists in pipeline '{self.name}'")
+
+        stage = Stage(name, func, depends_on)
+        missing = [dep for dep in stage.depends_on if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {', '.join(missing)}")
+
+        self.stages[name] = stage
+
+    def _required_stages(self, targets: Iterable[str] | None) -> list[str]:
+        """Returns the targets and all of their ancestors, in insertion order."""
+        if targets is None:
+            return list(self.stages)
+
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}' in pipeline '{self.name}'")
+            if name not in required:
+                required.add(name)
+                pending.extend(self.stages[name].depends_on)
+
+        return [name for name in self.stages if name in required]
+
+    def run(
+        self, targets: Iterable[str] | None = None, deadline: Deadline | None = None
+    ) -> dict[str, Any]:
+        """
+        Executes the graph.
+
+        Args:
+            targets (Iterable[str], optional): Stages whose results are needed. Only these and
+                their ancestors are run. Defaults to running every stage.
+            deadline (Deadline, optional): Time budget of the run. No stage starts once it
+                passes, and the run raises DeadlineExceeded.
+
+        Returns:
+            dict[str, Any]: The result of every stage that was run, keyed by stage name.
+
+        Raises:
+            Exception: The first exception raised by a stage. Stages that have not started yet
+                are cancelled.
+        """
+        to_run = self._required_stages(targets)
+        results: dict[str, Any] = {}
+        self.timings = {}
+        run_start = time.perf_counter()
+
+        def execute(stage: Stage, inputs: dict[str, Any]) -> Any:
+            start = time.perf_counter() - run_start
+            try:
+                with span(f"stage.{stage.name}", pipeline=self.name):
+                    return stage.func(inputs)
+            finally:
+                timing = StageTiming(start, time.perf_counter() - run_start)
+                self.timings[stage.name] = timing
+                STAGE_SECONDS.observe(timing.duration, pipeline=self.name, stage=stage.name)
+
+        waiting = list(to_run)
+        running: dict[Future, str] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=self.name
+        ) as executor:
+            while waiting or running:
+                # Submit every stage whose dependencies are all resolved
+                for name in list(waiting):
+                    stage = self.stages[name]
+                    if all(dep in results for dep in stage.depends_on):
+                        if deadline and deadline.expired:
+                            for pending_future in running:
+                                pending_future.cancel()
+                            logger.error("Pipeline '%s' stopped before '%s'", self.name, name)
+                            deadline.check()
+                        inputs = {dep: results[dep] for dep in stage.depends_on}
+                        # Stages run in the caller's context, in its trace and for its session
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, execute, stage, inputs)] = name
+                        waiting.remove(name)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        for pending_future in running:
+                            pending_future.cancel()
+                        logger.error("Stage '%s' of pipeline '%s' failed", name, self.name)
+                        raise
+
+        self.total_time = time.perf_counter() - run_start
+        PIPELINE_SECONDS.observe(self.total_time, pipeline=self.name)
+        logger.info(self.timing_report())
+
+        return results
+
+    def critical_path(self) -> list[str]:
+        """
+        Returns the chain of stages that determined the duration of the last run.
+
+        Starting from the last stage to finish, walks back through the dependency that finished
+        latest, i.e. the one that gated each stage's start.
+        """
+        if not self.timings:
+            return []
+
+        current = max(self.timings, key=lambda name: self.timings[name].end)
+        path = [current]
+        while True:
+            finished_deps = [dep for dep in self.stages[current].depends_on if dep in self.timings]
+            if not finished_deps:
+                break
+            current = max(finished_deps, key=lambda name: self.timings[name].end)
+            path.append(current)
+
+        return path[::-1]
+
+    def timing_report(self) -> str:
+        """Formats the timings of the last run, flagging the stages on the critical path."""
+        critical = set(self.critical_path())
+        lines = [f"Pipeline '{self.name}' finished in {self.total_time:.2f}s"]
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1].start):
+            marker = "*" if name in critical else " "
+            lines.append(
+                f" {marker} {name}: {timing.duration:.2f}s"
+                f" (start {timing.start:.2f}s, end {timing.end:.2f}s)"
+            )
+        lines.append(" (* = critical path)")
+        return "\n".join(lines)
@@ -0,0 +1,131 @@
+"""Implements a hierarchical memory of the campaign story.
+
+The chat history is cut into fixed-size scenes, windows of consecutive messages of the history
+store. Each scene is summarized once, when it falls out of the recent turns, and every few
+scenes are rolled up into an act summary. Summarizing a scene only reads that scene, and rolling
+up an act only reads its scene summaries, so the cost of a summarization cycle doesn't grow with
+the length of the campaign.
+"""
+
+import copy
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.utils import atomic_write_text, file_lock
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+EMPTY_MEMORY = {"covered": 0, "scenes": [], "acts": []}
+
+
+class StoryMemory:
+    """
+    Scene and act summaries of a chat history, persisted as a JSON file.
+
+    Summaries record the range of history store indices [start, stop) they cover, and
+    `covered` is the index of the first message not summarized yet.
+
+    Args:
+        memory_file (Path): File holding the summaries.
+        scene_size (int): Number of history messages summarized together as a scene.
+        scenes_per_act (int): Number of scene summaries rolled up into an act summary.
+    """
+
+    def __init__(self, memory_file: Path, scene_size: int = 8, scenes_per_act: int = 4):
+        self.memory_file = memory_file
+        # Memory files are updated from request and background task threads of every worker
+        self._lock = file_lock(memory_file.with_suffix(".lock"))
+        self.scene_size = scene_size
+        self.scenes_per_act = scenes_per_act
+
+    def load(self) -> dict:
+        """Loads the summaries, or an empty memory if nothing was summarized yet."""
+        if not self.memory_file.exists():
+            return copy.deepcopy(EMPTY_MEMORY)
+        with open(self.memory_file, encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def covered(self) -> int:
+        """Index of the first history message not covered by a summary."""
+        return self.load()["covered"]
+
+    def context_messages(self, memory: dict | None = None) -> list[dict]:
+        """
+        Builds the system messages carrying the story so far.
+
+        Every act is its own message, followed by the scenes not rolled up yet, so the context
+        packer can drop the oldest acts first.
+        """
+        memory = memory or self.load()
+        messages = [
+            {"role": "system", "content": f"Story so far, act {i}:\n{act['summary']}"}
+            for i, act in enumerate(memory["acts"], start=1)
+        ]
+        if memory["scenes"]:
+            scenes = "\n\n".join(scene["summary"] for scene in memory["scenes"])
+            messages.append(
+                {"role": "system", "content": f"Story so far, latest scenes:\n{scenes}"}
+            )
+        return messages
+
+    def update(
+        self,
+        history_store: ChatHistoryStore,
+        limit: int,
+        summarize_scene: Callable[[list[dict]], str],
+        summarize_act: Callable[[list[str]], str],
+    ) -> bool:
+        """
+        Summarizes the next scene if it ends before `limit`, rolling up an act when enough
+        scenes are summarized.
+
+        Summaries are generated outside the lock and only stored if the memory didn't move in
+        the meantime, so a stale summary never overwrites a newer one.
+
+        Args:
+            history_store (ChatHistoryStore): Full chat history.
+            limit (int): History index where the recent messages, kept verbatim, start.
+            summarize_scene (Callable[[list[dict]], str]): Summarizes the messages of a scene.
+            summarize_act (Callable[[list[str]], str]): Summarizes the scene summaries of an act.
+
+        Returns:
+            bool: Whether a scene was summarized.
+        """
+        memory = self.load()
+        start = memory["covered"]
+        stop = start + self.scene_size
+        if stop > limit:
+            return False
+
+        messages = [msg for msg in history_store.read(start, stop) if msg["role"] != "system"]
+        scene = {"start": start, "stop": stop, "summary": summarize_scene(messages)}
+
+        act = None
+        scenes = memory["scenes"] + [scene]
+        if len(scenes) >= self.scenes_per_act:
+            act = {
+                "start": scenes[0]["start"],
+                "stop": stop,
+                "summary": summarize_act([s["summary"] for s in scenes]),
+            }
+
+        with self._lock:
+            memory = self.load()
+            if memory["covered"] != start:
+                logger.info("Discarding stale summary of scene %d-%d", start, stop)
+                return False
+
+            memory["covered"] = stop
+            if act:
+                memory["acts"].append(act)
+                memory["scenes"] = []
+            else:
+                memory["scenes"].append(scene)
+            atomic_write_text(self.memory_file, json.dumps(memory, ensure_ascii=False))
+
+        logger.info("Summarized scene %d-%d%s", start, stop, " and rolled up an act" if act else "")
+        return True
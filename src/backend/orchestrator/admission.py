@@ -0,0 +1,321 @@
+"""Admission control and priority scheduling for LLM calls.
+
+Every LLM backend gets a bounded number of concurrent calls and a bounded wait queue per
+priority class. Calls beyond the queue are rejected right away with a 429, and calls waiting
+longer than their queue timeout give up with a 503, both with a Retry-After estimate, so a spike
+degrades into fast rejections instead of piling onto the OpenAI client or the CPU model until
+everything times out. Calls whose request deadline passes while they wait fail with the
+request's 504 instead, retrying them won't help.
+
+Freed slots go to the highest priority class waiting: interactive Dungeon Master turns go ahead
+of queued background work such as summaries and campaign generation, which go ahead of batch
+work such as evaluations. Background and batch work still get a minimum share of the slots
+handed out while interactive calls wait, so heavy jobs keep progressing while players are served
+first. The priority of every service type is set in the services config. Work a request waits on,
+such as a summary made before a Dungeon Master reply, inherits the priority class of the request
+so it doesn't queue behind the background work it would otherwise be classed with.
+
+Limits hold per worker process.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import yaml
+
+from src.backend.orchestrator.deadline import DeadlineExceeded
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+# Priority classes, highest first
+PRIORITIES = ("interactive", "background", "batch")
+DEFAULT_PRIORITY = "background"
+
+DEFAULT_ADMISSION_CONFIG = {
+    "max_concurrent": 8,
+    "max_queue": 32,
+    "queue_timeout_seconds": 10,
+    "background_queue_timeout_seconds": 600,
+    "background_min_share": 0.25,
+}
+
+# Weight of the latest call in the moving average of call durations
+DURATION_SMOOTHING = 0.2
+# Latest slot grants the background share is measured over
+GRANT_WINDOW = 20
+
+_controllers: dict[str, "AdmissionController"] = {}
+_controllers_lock = threading.Lock()
+
+# Priority class of the request the current context works for
+_request_priority: ContextVar[str | None] = ContextVar("request_priority", default=None)
+
+
+class OverloadedError(Exception):
+    """
+    Raised when an LLM call is not admitted.
+
+    Args:
+        message (str): The error message.
+        status_code (int): 429 if the queue was full, 503 if the wait timed out.
+        retry_after (int): Seconds the client should wait before retrying.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Ticket:
+    """A call waiting for a slot, ordered by priority class and arrival."""
+
+    rank: int
+    seq: int
+    priority: str = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+
+
+@contextmanager
+def request_priority(priority: str):
+    """
+    Runs the LLM calls made inside the block, on any thread it starts, at the given priority
+    class at least, for the work a request of that class waits on.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def effective_priority(priority: str) -> str:
+    """The higher of a call's own priority class and the one of the request it works for."""
+    inherited = _request_priority.get()
+    if inherited and PRIORITIES.index(inherited) < PRIORITIES.index(priority):
+        return inherited
+    return priority
+
+
+def load_admission_config(backend: str, config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the admission limits of a backend from the LLM services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("admission", {})
+    return {
+        **DEFAULT_ADMISSION_CONFIG,
+        **config.get("default", {}),
+        **config.get("backends", {}).get(backend, {}),
+    }
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with bounded priority wait queues for the calls of one backend.
+
+    Args:
+        name (str): Backend name, used in logs and stats.
+        max_concurrent (int): Calls running at the same time.
+        max_queue (int): Calls of a priority class waiting for a slot before new ones of that
+            class are rejected.
+        queue_timeout_seconds (float): Longest wait for a slot of interactive calls.
+        background_queue_timeout_seconds (float): Longest wait for a slot of background and
+            batch calls.
+        background_min_share (float): Share of the latest slot grants background and batch calls
+            get when they compete with interactive calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+        background_queue_timeout_seconds: float = 600,
+        background_min_share: float = 0.25,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.background_queue_timeout_seconds = background_queue_timeout_seconds
+        self.background_min_share = background_min_share
+
+        self._condition = threading.Condition()
+        self._queue: list[_Ticket] = []
+        self._seq = itertools.count()
+        # Whether each of the latest slot grants went to a background or batch call
+        self._recent_grants: deque[bool] = deque(maxlen=GRANT_WINDOW)
+        self.running = {priority: 0 for priority in PRIORITIES}
+        self.peak_waiting = 0
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+        self.timed_out = {priority: 0 for priority in PRIORITIES}
+        self.total_wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+        self.max_wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+        self.average_call_seconds = 0.0
+
+    @property
+    def waiting(self) -> int:
+        """Calls waiting for a slot."""
+        return len(self._queue)
+
+    def _waiting(self, priority: str) -> int:
+        """Calls of a priority class waiting for a slot."""
+        return sum(ticket.priority == priority for ticket in self._queue)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new call is likely drained."""
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(backlog * self.average_call_seconds))
+
+    def _next_ticket(self) -> _Ticket:
+        """
+        Picks the waiting call that gets the next free slot: the first of the highest priority,
+        unless background and batch calls got less than their share of the latest grants. Before
+        any grant there is no share to make up for.
+        """
+        background = [ticket for ticket in self._queue if ticket.priority != "interactive"]
+        if background and self._recent_grants:
+            background_share = sum(self._recent_grants) / len(self._recent_grants)
+            if background_share < self.background_min_share:
+                return min(background)
+        return min(self._queue)
+
+    def _dispatch(self) -> None:
+        """Grants free slots to waiting calls."""
+        granted = False
+        while self._queue and sum(self.running.values()) < self.max_concurrent:
+            ticket = self._next_ticket()
+            self._queue.remove(ticket)
+            ticket.granted = True
+            self.running[ticket.priority] += 1
+            self._recent_grants.append(ticket.priority != "interactive")
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def _acquire(self, priority: str, timeout: float | None = None) -> None:
+        """
+        Waits for a free slot, raising OverloadedError if the call is not admitted, or
+        DeadlineExceeded if the given timeout ran out before the queue timeout.
+        """
+        with self._condition:
+            if self._waiting(priority) >= self.max_queue:
+                self.rejected[priority] += 1
+                raise OverloadedError(
+                    f"Too many pending {priority} {self.name} calls", 429, self.retry_after()
+                )
+
+            ticket = _Ticket(PRIORITIES.index(priority), next(self._seq), priority)
+            self._queue.append(ticket)
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            self._dispatch()
+
+            start = time.monotonic()
+            queue_timeout = (
+                self.queue_timeout_seconds
+                if priority == "interactive"
+                else self.background_queue_timeout_seconds
+            )
+            # The request runs out of time before the queue does, retrying it won't help
+            deadline_bound = timeout is not None and timeout < queue_timeout
+            if deadline_bound:
+                queue_timeout = timeout
+            deadline = start + queue_timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    self.timed_out[priority] += 1
+                    if deadline_bound:
+                        raise DeadlineExceeded(f"Deadline passed waiting for a {self.name} slot")
+                    raise OverloadedError(
+                        f"Timed out waiting for a {self.name} slot", 503, self.retry_after()
+                    )
+                self._condition.wait(remaining)
+
+            waited = time.monotonic() - start
+            self.admitted[priority] += 1
+            self.total_wait_seconds[priority] += waited
+            self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+
+    def _release(self, priority: str, call_seconds: float) -> None:
+        """Frees a slot and hands it to the next waiting call."""
+        with self._condition:
+            self.running[priority] -= 1
+            self.average_call_seconds += DURATION_SMOOTHING * (
+                call_seconds - self.average_call_seconds
+            )
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: str = DEFAULT_PRIORITY, timeout: float | None = None):
+        """
+        Holds a call slot of the given priority class for the duration of the block.
+
+        Args:
+            priority (str): Priority class of the call.
+            timeout (float, optional): Time left to the request. If it runs out while waiting,
+                before the queue timeout of the priority class, DeadlineExceeded is raised.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        self._acquire(priority, timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(priority, time.monotonic() - start)
+
+    def stats(self) -> dict:
+        """Current queue depths and admission counters, per priority class."""
+        with self._condition:
+            return {
+                "running": sum(self.running.values()),
+                "waiting": self.waiting,
+                "peak_waiting": self.peak_waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "average_call_seconds": self.average_call_seconds,
+                "priorities": {
+                    priority: {
+                        "running": self.running[priority],
+                        "waiting": self._waiting(priority),
+                        "admitted": self.admitted[priority],
+                        "rejected": self.rejected[priority],
+                        "timed_out": self.timed_out[priority],
+                        "average_wait_seconds": self.total_wait_seconds[priority]
+                        / max(self.admitted[priority], 1),
+                        "max_wait_seconds": self.max_wait_seconds[priority],
+                    }
+                    for priority in PRIORITIES
+                },
+            }
+
+
+def get_admission_controller(backend: str) -> AdmissionController:
+    """Returns the process-wide admission controller of a backend."""
+    with _controllers_lock:
+        if backend not in _controllers:
+            _controllers[backend] = AdmissionController(backend, **load_admission_config(backend))
+        return _controllers[backend]
+
+
+def admission_stats() -> dict[str, dict]:
+    """Stats of every backend called so far."""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return {controller.name: controller.stats() for controller in controllers}
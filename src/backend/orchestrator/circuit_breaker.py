@@ -0,0 +1,193 @@
+"""Circuit breakers for LLM backends.
+
+When a backend is down or too slow, every call to it waits and then fails. Each backend gets a
+circuit breaker tracking the outcome of its latest calls, where calls slower than a threshold
+count as failures. Once the failure rate crosses the threshold the breaker opens and the
+services of that backend fall over to the next backend of their fallback chain, set with the
+`fallback` key of every backend in the services config. After a cool-down the breaker lets a
+few probe calls through, half-open, and closes again if they succeed.
+
+Breakers hold per worker process.
+"""
+
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import openai
+import yaml
+
+from src.backend.orchestrator.resilience import RETRYABLE_ERRORS
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+DEFAULT_CIRCUIT_BREAKER_CONFIG = {
+    "window": 20,
+    "min_calls": 5,
+    "failure_rate_threshold": 0.5,
+    "slow_call_seconds": 60,
+    "open_seconds": 30,
+    "half_open_max_calls": 1,
+}
+
+_breakers: dict[str, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a backend's circuit breaker is open and there is no backend to fall over to."""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    Whether an error says the backend is unavailable: a connection failure or timeout, a rate
+    limit or a 5xx response. Problems of the request, such as a rejected prompt, and of this
+    server, such as a bug, an expired deadline or a full queue, are not.
+    """
+    if isinstance(error, RETRYABLE_ERRORS + (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def load_circuit_breaker_config(backend: str, config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the circuit breaker settings of a backend from the services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        backend_config = yaml.safe_load(file)["backends"][backend]
+    return {**DEFAULT_CIRCUIT_BREAKER_CONFIG, **backend_config.get("circuit_breaker", {})}
+
+
+class CircuitBreaker:
+    """
+    Tracks the calls of a backend, opening when too many of them fail.
+
+    Args:
+        name (str): Backend name, used in logs and stats.
+        window (int): Latest calls the failure rate is measured over.
+        min_calls (int): Calls in the window before the breaker can open.
+        failure_rate_threshold (float): Share of failed or slow calls that opens the breaker.
+        slow_call_seconds (float): Calls taking longer count as failures.
+        open_seconds (float): Seconds the breaker stays open before probing the backend.
+        half_open_max_calls (int): Probe calls let through at the same time while half-open.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 60,
+        open_seconds: float = 30,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        # Whether each of the latest calls failed
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def failure_rate(self) -> float:
+        """Share of the latest calls that failed or were slow."""
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend. Every allowed call must be followed by
+        `record_success`, `record_failure` or `release`.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                logger.info("Circuit breaker of %s is half-open, probing the backend", self.name)
+                self.state = HALF_OPEN
+                self.probes = 0
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.probes < self.half_open_max_calls:
+                self.probes += 1
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self, seconds: float) -> None:
+        """Records a call that returned, as a failure if it was too slow."""
+        if seconds > self.slow_call_seconds:
+            logger.warning("%s call took %.1fs, counting it as failed", self.name, seconds)
+            self.record_failure()
+            return
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                logger.info("Circuit breaker of %s closed, the backend recovered", self.name)
+                self.state = CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        """Records a failed call, opening the breaker if the failure rate got too high."""
+        with self._lock:
+            self._outcomes.append(True)
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and self.failure_rate >= self.failure_rate_threshold
+            ):
+                logger.warning(
+                    "Circuit breaker of %s opened, %.0f%% of the latest calls failed",
+                    self.name,
+                    self.failure_rate * 100,
+                )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+    def release(self) -> None:
+        """Ends an allowed call whose outcome says nothing about the backend."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probes = max(self.probes - 1, 0)
+
+    def stats(self) -> dict:
+        """Current state, failure rate and trip counters."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "failure_rate": self.failure_rate,
+                "calls_in_window": len(self._outcomes),
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+def get_circuit_breaker(backend: str) -> CircuitBreaker:
+    """Returns the process-wide circuit breaker of a backend."""
+    with _breakers_lock:
+        if backend not in _breakers:
+            _breakers[backend] = CircuitBreaker(backend, **load_circuit_breaker_config(backend))
+        return _breakers[backend]
+
+
+def circuit_breaker_stats() -> dict[str, dict]:
+    """Stats of every backend called so far."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,128 @@
+"""Per-request deadlines and cancellation for the LLM calls of a turn.
+
+A turn can chain several LLM calls, so every request gets a `Deadline` that is passed down to
+the managers and LLM services it goes through. Each call only waits for what is left of the
+budget, OpenAI completions are streamed so they can be dropped between chunks, and local
+generation stops at the next token. The deadline is also cancelled when the client disconnects,
+so abandoned turns stop spending tokens and CPU.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from pathlib import Path
+
+import yaml
+from fastapi import Request
+
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+DEFAULT_DEADLINE_CONFIG = {
+    "chat_turn_seconds": 120,
+    "campaign_job_seconds": 900,
+}
+
+# Seconds between checks of whether the client of a request is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+# Status code nginx uses for requests closed by the client, the response is never read anyway
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a request runs out of time or is cancelled.
+
+    Args:
+        message (str): The error message.
+        status_code (int): 504 if the deadline passed, 499 if the client disconnected.
+    """
+
+    def __init__(self, message: str, status_code: int = 504):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def load_deadline_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the request time budgets from the LLM services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("deadlines", {})
+    return {**DEFAULT_DEADLINE_CONFIG, **config}
+
+
+class Deadline:
+    """
+    Time budget of a request, shared by every stage working on it.
+
+    Args:
+        timeout_seconds (float | None): Seconds the request may take from now, None for no limit.
+        name (str): Request description, used in error messages.
+        parent (Deadline, optional): Deadline this one is part of. It is cancelled along with its
+            parent and never outlives it.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float | None,
+        name: str = "request",
+        parent: "Deadline | None" = None,
+    ):
+        self.name = name
+        self.parent = parent
+        self.expires_at = (
+            time.monotonic() + timeout_seconds if timeout_seconds is not None else math.inf
+        )
+        if parent:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self._cancelled = threading.Event()
+
+    def child(self) -> "Deadline":
+        """Returns a deadline for part of the request that can be cancelled on its own."""
+        return Deadline(None, self.name, parent=self)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, 0 once it passed and infinite without a limit."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def cancel(self) -> None:
+        """Cancels the request, every stage stops at its next check."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the request, or the one it is part of, was cancelled."""
+        return self._cancelled.is_set() or bool(self.parent and self.parent.cancelled)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the request should stop, because it was cancelled or ran out of time."""
+        return self.cancelled or self.remaining() == 0
+
+    def check(self) -> None:
+        """Raises DeadlineExceeded if the request should stop."""
+        if self.cancelled:
+            raise DeadlineExceeded(f"The {self.name} was cancelled", CLIENT_CLOSED_REQUEST)
+        if self.remaining() == 0:
+            raise DeadlineExceeded(f"The {self.name} ran out of time")
+
+    def timeout(self, cap: float | None = None) -> float | None:
+        """
+        Timeout for the next stage: the time left, at most `cap`, or None without a limit.
+
+        Raises:
+            DeadlineExceeded: If the request should stop already.
+        """
+        self.check()
+        remaining = self.remaining() if cap is None else min(self.remaining(), cap)
+        return None if remaining == math.inf else remaining
+
+
+async def cancel_on_disconnect(request: Request, deadline: Deadline) -> None:
+    """Cancels the deadline once the client of the request disconnects. Runs until cancelled."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+    logger.info("Client disconnected, cancelling the %s", deadline.name)
+    deadline.cancel()
@@ -0,0 +1,9 @@
+"""Dependencies shared by the endpoints"""
+
+from src.backend.orchestrator.metrics import DB_SESSION_SECONDS
+from src.backend.utils import database_session
+
+
+def get_db():
+    """Dependency to get a new database session, recording how long it is held."""
+    yield from database_session(DB_SESSION_SECONDS.observe)
@@ -0,0 +1,56 @@
+"""Short-lived cache of chat replies by idempotency key.
+
+Browser retries, double-clicks and proxy retries resend the same chat request. Requests carrying
+an idempotency key are answered under their game session's lock, so a duplicate arriving while
+the original is in flight waits for it, then gets the original reply from this cache instead of
+a second Dungeon Master call.
+"""
+
+import json
+import time
+from pathlib import Path
+
+from src.backend.orchestrator.models import ChatResponse
+from src.backend.utils import atomic_write_text
+
+# Seconds a reply is kept for duplicates of its request
+REPLY_TTL_SECONDS = 600
+
+
+class ReplyCache:
+    """
+    Replies of a game session's recent chat requests, persisted as a JSON file so duplicates
+    reaching another worker are answered too. Callers hold the session lock.
+
+    Args:
+        session_dir (Path): Directory of the game session.
+        ttl_seconds (float): Seconds a reply is kept.
+    """
+
+    def __init__(self, session_dir: Path, ttl_seconds: float = REPLY_TTL_SECONDS):
+        self.cache_file = session_dir / "replies.json"
+        self.ttl_seconds = ttl_seconds
+
+    def _load(self) -> dict:
+        """Loads the cached replies that haven't expired."""
+        if not self.cache_file.exists():
+            return {}
+        with open(self.cache_file, encoding="utf-8") as f:
+            replies = json.load(f)
+        now = time.time()
+        return {
+            key: reply
+            for key, reply in replies.items()
+            if now - reply["created_at"] < self.ttl_seconds
+        }
+
+    def get(self, idempotency_key: str) -> ChatResponse | None:
+        """Returns the reply to a request, or None if it wasn't answered recently."""
+        reply = self._load().get(idempotency_key)
+        return ChatResponse(**reply["response"]) if reply else None
+
+    def put(self, idempotency_key: str, response: ChatResponse) -> None:
+        """Caches the reply to a request, dropping expired ones."""
+        replies = self._load()
+        replies[idempotency_key] = {"created_at": time.time(), "response": response.dict()}
+        atomic_write_text(self.cache_file, json.dumps(replies, ensure_ascii=False))
@@ -0,0 +1,156 @@
+"""Background job subsystem for long-running campaign creation.
+
+Campaign creation can take tens of seconds, so instead of running inside the `/chat` request it
+is submitted as a job. Jobs are persisted in the game database and executed on a worker pool:
+a campaign keeps generating if the client disconnects, and a refresh picks the same job up
+instead of starting a new generation.
+
+Several worker processes can share the jobs: a job is run by the worker holding its session's
+campaign lock, which the OS releases if that worker dies.
+"""
+
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backend.database.config import SessionLocal
+from src.backend.database.models import CampaignJob
+from src.backend.game_dynamics.game_state_manager import (
+    get_campaign_lock,
+    get_session_dir,
+    get_session_lock,
+)
+from src.backend.orchestrator.models import ChatRequest, ChatResponse, JobStatus
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def job_status(job: CampaignJob) -> JobStatus:
+    """Converts a persisted job into its API representation."""
+    return JobStatus(
+        job_id=job.id,
+        status=job.status,
+        result=ChatResponse(**job.result) if job.result else None,
+        error=job.error,
+    )
+
+
+class CampaignJobManager:
+    """
+    Runs campaign creation jobs on a worker pool, persisting their state.
+
+    Args:
+        run_campaign (Callable[[ChatRequest], ChatResponse]): Runs the campaign creation pipeline
+            for the player's story start request.
+        max_workers (int): Maximum number of campaigns generated at the same time.
+    """
+
+    def __init__(self, run_campaign: Callable[[ChatRequest], ChatResponse], max_workers: int = 2):
+        self.run_campaign = run_campaign
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def start(self) -> None:
+        """
+        Resumes jobs interrupted by a restart. Jobs still running on another worker are left to
+        it.
+        """
+        db = SessionLocal()
+        try:
+            active = db.query(CampaignJob).filter(CampaignJob.status.in_(ACTIVE_STATUSES))
+            for job in active:
+                self.executor.submit(self._run, job.id)
+        finally:
+            db.close()
+
+    def shutdown(self) -> None:
+        """Stops accepting jobs. Unfinished jobs are resumed on the next start."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, request: ChatRequest) -> JobStatus:
+        """
+        Submits a campaign creation job, unless one is already pending or running for the
+        request's game session.
+
+        Returns the active job in that case, so retried or refreshed requests resume it instead
+        of generating a second campaign, even when they reach another worker.
+        """
+        with get_session_lock(get_session_dir(request.session_id)):
+            db = SessionLocal()
+            try:
+                job = (
+                    db.query(CampaignJob)
+                    .filter(
+                        CampaignJob.session_id == request.session_id,
+                        CampaignJob.status.in_(ACTIVE_STATUSES),
+                    )
+                    .order_by(CampaignJob.created_at.desc())
+                    .first()
+                )
+                if job:
+                    return job_status(job)
+
+                job = CampaignJob(
+                    id=uuid.uuid4().hex,
+                    session_id=request.session_id,
+                    user_message=request.user_message,
+                )
+                db.add(job)
+                db.commit()
+                self.executor.submit(self._run, job.id)
+                logger.info("Submitted campaign job %s", job.id)
+                return job_status(job)
+            finally:
+                db.close()
+
+    def get(self, job_id: str) -> JobStatus | None:
+        """Returns the current state of a job, or None if it doesn't exist."""
+        db = SessionLocal()
+        try:
+            job = db.get(CampaignJob, job_id)
+            return job_status(job) if job else None
+        finally:
+            db.close()
+
+    def _run(self, job_id: str) -> None:
+        """
+        Runs a job on a worker thread, persisting its progress and outcome.
+
+        The job is skipped if another worker holds its session's campaign lock, or if it already
+        finished by the time the lock is acquired.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(CampaignJob, job_id)
+            campaign_lock = get_campaign_lock(get_session_dir(job.session_id))
+            if not campaign_lock.acquire(blocking=False):
+                logger.info("Campaign job %s is running on another worker", job_id)
+                return
+
+            try:
+                db.refresh(job)
+                if job.status not in ACTIVE_STATUSES:
+                    return
+                if job.status == "running":
+                    logger.info("Resuming campaign job %s", job_id)
+                job.status = "running"
+                db.commit()
+
+                try:
+                    response = self.run_campaign(
+                        ChatRequest(user_message=job.user_message, session_id=job.session_id)
+                    )
+                    job.result = response.dict()
+                    job.status = "completed"
+                except Exception as e:
+                    logger.exception("Campaign job %s failed", job_id)
+                    job.error = str(e)
+                    job.status = "failed"
+
+                db.commit()
+            finally:
+                campaign_lock.release()
+        finally:
+            db.close()
@@ -3,33 +3,140 @@ FastAPI orchestrator for the DungeonMind project.
 
 This module provides an API for handling chat interactions with a language model (LLM).
 It processes user input, maintains conversation history, and generates AI-driven responses.
+Conversation history lives server-side in game sessions: clients send only the new message and
+receive only the new reply.
 """
 
+import asyncio
+import time
+from contextlib import asynccontextmanager, nullcontext
 from functools import partial
 
-from fastapi import Depends, FastAPI
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
-from src.backend.database.models import Character
+from src.backend.database.config import engine
+from src.backend.database.init_db import create_tables
+from src.backend.database.models import GameSession
 from src.backend.game_dynamics.campaign_creation import CampaignManager
+from src.backend.game_dynamics.campaign_pool import CampaignPool
 from src.backend.game_dynamics.character_creation import CharacterManager
-from src.backend.game_dynamics.game_state_manager import GameStateManager
+from src.backend.game_dynamics.game_state_manager import (
+    GameStateManager,
+    get_campaign_file,
+    get_session_dir,
+    get_session_lock,
+)
+from src.backend.orchestrator.admission import OverloadedError, request_priority
+from src.backend.orchestrator.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    cancel_on_disconnect,
+    load_deadline_config,
+)
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.idempotency import ReplyCache
+from src.backend.orchestrator.jobs import CampaignJobManager
+from src.backend.orchestrator.metrics import HTTP_REQUEST_SECONDS
 from src.backend.orchestrator.models import ChatRequest, ChatResponse
+from src.backend.orchestrator.profiling import profiling
+from src.backend.orchestrator.router import AUTO_BACKEND
+from src.backend.orchestrator.routes.admission import router as admission_router
 from src.backend.orchestrator.routes.character import router as character_router
+from src.backend.orchestrator.routes.jobs import router as jobs_router
+from src.backend.orchestrator.routes.metrics import router as metrics_router
+from src.backend.orchestrator.routes.profiling import router as profiling_router
+from src.backend.orchestrator.routes.resilience import router as resilience_router
+from src.backend.orchestrator.routes.sessions import get_game_session
+from src.backend.orchestrator.routes.sessions import router as sessions_router
+from src.backend.orchestrator.routes.usage import router as usage_router
 from src.backend.orchestrator.services import LLMService, LLMServiceFactory
-from src.backend.utils import get_db
+from src.backend.orchestrator.telemetry import session_context, usage_ledger
+from src.backend.orchestrator.tracing import (
+    SPAN_KIND_SERVER,
+    current_span,
+    instrument_engine,
+    span,
+    tracer,
+)
+from src.backend.utils import file_lock
 from src.constants import DATA_GAME
 from src.logger_definition import get_logger
 
 logger = get_logger(__file__)
 
+# Time budgets of chat turns and campaign jobs
+deadlines = load_deadline_config()
+
+# Database queries made inside a request get a span of its trace
+instrument_engine(engine)
+
+
+@span("campaign.job")
+def run_campaign_creation(
+    request: ChatRequest, campaign_pool: CampaignPool | None = None
+) -> ChatResponse:
+    """
+    Runs the campaign creation pipeline, used by the campaign job workers, serving pooled
+    campaigns from the given pool. The campaign file is only written once the opening turn is
+    recorded, so a failed job leaves the session ready for another one.
+    """
+    deadline = Deadline(deadlines["campaign_job_seconds"], "campaign job")
+    campaign_manager = CampaignManager("gpt-4", campaign_pool=campaign_pool)
+    game_state_manager = GameStateManager("gpt-4", get_session_dir(request.session_id))
+
+    def record_opening_turn(response: ChatResponse) -> int:
+        return game_state_manager.record_turn(
+            request.user_message, response.assistant_message, response.metadata
+        )
+
+    with session_context(request.session_id):
+        return campaign_manager.initialize_campaign(request, record_opening_turn, deadline)
+
+
+@asynccontextmanager
+async def lifespan(fastapi_app: FastAPI):
+    """Starts background workers on startup and stops them on shutdown."""
+    # Worker processes start together, only one of them creates the tables at a time
+    with file_lock(DATA_GAME / "startup.lock"):
+        create_tables()
+        # Pregenerated campaigns, refilled in the background when enabled
+        campaign_pool = CampaignPool()
+        fastapi_app.state.campaign_jobs = CampaignJobManager(
+            partial(run_campaign_creation, campaign_pool=campaign_pool)
+        )
+        fastapi_app.state.campaign_jobs.start()
+
+    if campaign_pool.enabled:
+        pool_manager = CampaignManager(campaign_pool.config["backend"])
+        campaign_pool.start_worker(pool_manager.pregenerate_campaign)
+
+    usage_ledger.start_worker()
+
+    yield
+
+    usage_ledger.stop_worker()
+    campaign_pool.stop_worker()
+    tracer.exporter.flush()
+    fastapi_app.state.campaign_jobs.shutdown()
+
 
 # Initialize FastAPI app
-app = FastAPI(docs_url="/")
+app = FastAPI(docs_url="/", lifespan=lifespan)
 
-# Include character endpoint
+# Include character, campaign job, session, admission, resilience, metrics, usage and profiling
+# endpoints
 app.include_router(character_router, tags=["character"])
+app.include_router(jobs_router, tags=["jobs"])
+app.include_router(sessions_router, tags=["sessions"])
+app.include_router(admission_router, tags=["admission"])
+app.include_router(resilience_router, tags=["resilience"])
+app.include_router(metrics_router, tags=["metrics"])
+app.include_router(usage_router, tags=["usage"])
+app.include_router(profiling_router, tags=["profiling"])
 
 # Enable CORS for frontend communication
 app.add_middleware(
@@ -41,6 +148,72 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Records the duration of every request, labelled by its route template."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            # Paths of unknown routes aren't used as labels, they are unbounded
+            route=route.path if route else "unmatched",
+            status=status_code,
+        )
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Runs every request in a server span, joining the caller's trace if it sent a `traceparent`
+    header, and profiles the requests picked by the profiling settings.
+    """
+    with span(
+        f"{request.method} {request.url.path}",
+        SPAN_KIND_SERVER,
+        request.headers.get("traceparent"),
+        # The event loop thread is shared by every request, it isn't profiled
+        bind_thread=False,
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as request_span:
+        if request_span is None:
+            return await call_next(request)
+
+        profiled = profiling.wanted(request.headers)
+        with profiling.profile(request_span.trace_id) if profiled else nullcontext():
+            response = await call_next(request)
+
+        route = request.scope.get("route")
+        request_span.name = f"{request.method} {route.path if route else 'unmatched'}"
+        request_span.set_attribute("http.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = request_span.trace_id
+        return response
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(_: Request, exc: OverloadedError):
+    """Rejects requests whose LLM calls weren't admitted, telling clients when to retry."""
+    logger.warning("Rejected request with %d: %s", exc.status_code, exc)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(_: Request, exc: DeadlineExceeded):
+    """Answers requests abandoned because they ran out of time or their client disconnected."""
+    logger.warning("Abandoned request with %d: %s", exc.status_code, exc)
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
 def get_llm_service(backend: str, service_type: str) -> LLMService | None:
     """Dependency injection for selecting the LLM service."""
     # Initialize LLMServiceFactory with selected backend
@@ -50,39 +223,148 @@ def get_llm_service(backend: str, service_type: str) -> LLMService | None:
     return llm_service
 
 
-@app.post("/chat", response_model=ChatResponse)
-def chat(
+def play_turn(
     request: ChatRequest,
-    dungeon_master: LLMService = Depends(partial(get_llm_service, "gpt-4", "dungeon-master")),
-    db: Session = Depends(get_db),
-):
-    """Handles chat interactions and injects character stats into the LLM context."""
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    dungeon_master: LLMService,
+    db: Session,
+    game_session: GameSession,
+    deadline: Deadline | None = None,
+) -> ChatResponse:
+    """Answers a player message at the current stage of the game session."""
+    session_dir = get_session_dir(game_session.id)
+    game_state_manager = GameStateManager("gpt-4", session_dir)
+
+    # The reply cache may have expired while the turn is still recorded, its reply is replayed
+    # instead of generating a second one the history would drop
+    if request.idempotency_key:
+        reply = game_state_manager.find_reply(request.idempotency_key)
+        if reply:
+            logger.info("Replaying the recorded reply to request %s", request.idempotency_key)
+            turn, assistant_message = reply
+            return ChatResponse(assistant_message=assistant_message, turn=turn)
+
+    if request.last_seen_turn not in (None, game_state_manager.current_turn):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Session is at turn {game_state_manager.current_turn}",
+        )
+
     # Initialize character
-    if not db.query(Character).first():
-        character_manager = CharacterManager(db, "gpt3-5")
-        return character_manager.initialize_character(request)
+    if not game_session.character_id:
+        character_manager = CharacterManager(db, AUTO_BACKEND)
+        response = character_manager.initialize_character(request, deadline)
+        turn = game_state_manager.record_turn(
+            request.user_message,
+            response.assistant_message,
+            response.metadata,
+            idempotency_key=request.idempotency_key,
+        )
+        return ChatResponse(assistant_message=response.assistant_message, turn=turn)
 
     # Initialize story
-    current_campaign_dir = DATA_GAME / "active_campaign.txt"
-    if not current_campaign_dir.exists():
-        campaign_manager = CampaignManager("gpt-4")
-        return campaign_manager.initialize_campaign(request)
+    if not get_campaign_file(session_dir).exists():
+        job = http_request.app.state.campaign_jobs.submit(request)
+        return ChatResponse(assistant_message="", job_id=job.job_id)
 
     # Manage chat history & summarization
-    game_state_manager = GameStateManager("gpt-4")
-    current_history = game_state_manager.manage_chat_history(request)
-    print(current_history)
+    current_history = game_state_manager.manage_chat_history(
+        request.user_message, background_tasks, deadline
+    )
+    logger.debug(
+        "Chat history of session %s, %d messages: %s",
+        game_session.id,
+        len(current_history),
+        current_history,
+    )
 
-    # Initilize dungeon master service with conversation history
-    dungeon_master.conversation_history = current_history
+    # Initilize dungeon master service with the recalled and packed conversation history
+    dungeon_master.conversation_history = game_state_manager.dungeon_master_context(
+        current_history, deadline
+    )
 
     # Generate next response
-    assistant_reply = dungeon_master.chat_completion()
-
-    return ChatResponse(
-        assistant_message=assistant_reply, metadata=[], conversation_history=current_history
+    assistant_reply = dungeon_master.chat_completion(deadline)
+    turn = game_state_manager.record_turn(
+        request.user_message, assistant_reply, idempotency_key=request.idempotency_key
     )
 
+    return ChatResponse(assistant_message=assistant_reply, turn=turn)
+
+
+@span("chat.answer_turn")
+def answer_turn(
+    request: ChatRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    dungeon_master: LLMService,
+    db: Session,
+    deadline: Deadline,
+) -> ChatResponse:
+    """Plays a turn of the request's game session, once per idempotency key."""
+    game_session = get_game_session(request.session_id, db)
+    session_dir = get_session_dir(game_session.id)
+
+    with get_session_lock(session_dir):
+        reply_cache = ReplyCache(session_dir)
+        if request.idempotency_key:
+            cached = reply_cache.get(request.idempotency_key)
+            if cached:
+                logger.info("Replaying the reply to request %s", request.idempotency_key)
+                return cached
+
+        # Another worker may have moved the session on while this request waited for the lock
+        db.refresh(game_session)
+        response = play_turn(
+            request, http_request, background_tasks, dungeon_master, db, game_session, deadline
+        )
+
+        if request.idempotency_key:
+            reply_cache.put(request.idempotency_key, response)
+        return response
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    dungeon_master: LLMService = Depends(partial(get_llm_service, "gpt-4", "dungeon-master")),
+    db: Session = Depends(get_db),
+):
+    """Handles chat interactions and injects character stats into the LLM context.
+
+    Every game session has its own character, campaign and history, looked up by the session id
+    of the request, so one server hosts many concurrent games. The history is kept server-side,
+    the request only carries the new player message. If `last_seen_turn` is behind the session,
+    the request is rejected with a 409 so the client fetches the missed messages first.
+
+    Turns of a session run one at a time, across workers too. A request resent with the same
+    `idempotency_key` waits for the original and gets its reply, without a second LLM call.
+
+    Every turn has a deadline, `chat_turn_seconds` in the services config, shared by the LLM
+    calls it makes. A turn running out of time is answered with a 504, and a turn whose client
+    disconnects stops its LLM calls.
+
+    Campaign creation runs as a background job: the response carries the job id and the client
+    polls `/campaign/jobs/{job_id}` for the campaign's opening message. Chat history summaries
+    are generated after the response is sent and picked up on the next turn, unless the history
+    no longer fits the prompt; the summaries the reply waits on then run at interactive priority.
+    """
+    deadline = Deadline(deadlines["chat_turn_seconds"], "chat turn")
+    if request_span := current_span():
+        request_span.set_attribute("session.id", request.session_id)
+    watcher = asyncio.create_task(cancel_on_disconnect(http_request, deadline))
+    try:
+        # Summaries made before the reply are waited on by the player, they are interactive too
+        with session_context(request.session_id), request_priority("interactive"):
+            return await run_in_threadpool(
+                answer_turn, request, http_request, background_tasks, dungeon_master, db, deadline
+            )
+    finally:
+        watcher.cancel()
+
 
 # Run the server with Uvicorn (if running locally, use `uvicorn main:app --reload`)
 if __name__ == "__main__":
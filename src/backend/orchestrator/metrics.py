@@ -0,0 +1,262 @@
+"""In-process metrics exported in the Prometheus text format.
+
+Counters and timing histograms are recorded around the LLM calls, the stages of the campaign
+pipeline and chat turns, the game session and world data I/O, the database sessions of the
+endpoints and the HTTP requests, and served at `/metrics` for a Prometheus scraper. Metrics are
+defined once at import time, here, so every label set of a metric stays bounded.
+
+Metrics hold per worker process, so every worker must be scraped on its own.
+"""
+
+import bisect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+# Upper bounds of the latency buckets, in seconds, from file reads up to campaign generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value the way Prometheus parses it."""
+    return "+Inf" if value == math.inf else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    """
+    Base of the metric types, holding one series per set of label values.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): Help text of the metric.
+        labelnames (Iterable[str]): Names of the labels every sample must be given.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict[str, object]) -> tuple[str, ...]:
+        """Label values of a sample, in label name order."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} takes labels {list(self.labelnames)}, got {list(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...], **extra: str) -> str:
+        """Formats the label set of a series, with extra labels such as a bucket bound."""
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """Sample lines of every series."""
+
+    def render(self) -> str:
+        """Formats the metric with its help and type lines."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Value that only goes up, such as a number of calls."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increases the series of the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current value of the series of the given labels."""
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = dict(self._series)
+        for key, value in series.items():
+            yield f"{self.name}{self._labels(key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, such as durations, counted in cumulative buckets.
+
+    Args:
+        buckets (Iterable[float]): Upper bounds of the buckets, the +Inf bucket is added.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """Records a value in the series of the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._series:
+                # Per bucket counts, the last one for values above every bound, sum and count
+                self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts, _, _ = series = self._series[key]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in a block, or in every call when used as a decorator."""
+        self._key(labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """Values observed in the series of the given labels."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = {
+                key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()
+            }
+        for key, (counts, total, n) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _format_value(bound)
+                yield f"{self.name}_bucket{self._labels(key, le=le)} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._labels(key)} {n}"
+
+
+class MetricsRegistry:
+    """Metrics exported by the worker process."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds a metric to the registry, raising ValueError if its name is taken."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Formats every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_CALL_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_llm_call_duration_seconds",
+        "Duration of LLM calls, including retries, hedges and call slot waits.",
+        ["service_type", "backend", "method"],
+    )
+)
+LLM_CALLS = REGISTRY.register(
+    Counter(
+        "dungeonmind_llm_calls_total",
+        "LLM calls by outcome: ok, error, circuit_open or abandoned.",
+        ["service_type", "backend", "method", "outcome"],
+    )
+)
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_stage_duration_seconds",
+        "Duration of the stages of multi-stage pipelines, such as campaign creation or chat turns.",
+        ["pipeline", "stage"],
+    )
+)
+PIPELINE_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_pipeline_duration_seconds",
+        "Duration of whole pipeline runs.",
+        ["pipeline"],
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        "dungeonmind_llm_tokens_total",
+        "Tokens of LLM calls, by kind: prompt or completion.",
+        ["service_type", "backend", "kind"],
+    )
+)
+LLM_TTFT_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_llm_time_to_first_token_seconds",
+        "Time until the first generated token of LLM calls, for backends that report it.",
+        ["service_type", "backend"],
+    )
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.register(
+    Histogram(
+        "dungeonmind_llm_generation_tokens_per_second",
+        "Generation rate of LLM calls after their first token.",
+        ["service_type", "backend"],
+        buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300),
+    )
+)
+IO_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_io_duration_seconds",
+        "Duration of game session and world data reads, writes and searches.",
+        ["component", "operation"],
+    )
+)
+DB_SESSION_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_db_session_duration_seconds",
+        "Time database sessions are held open by a request.",
+    )
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "dungeonmind_http_request_duration_seconds",
+        "Duration of HTTP requests by route template and status code.",
+        ["method", "route", "status"],
+    )
+)
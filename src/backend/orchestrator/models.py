@@ -9,12 +9,16 @@ class ChatRequest(BaseModel):
 
     Attributes:
         user_message (str): The user's input message.
-        conversation_history (List[Dict[str, str]]): The chat history including system and assistant
-        messages.
+        session_id (str): The game session the message belongs to.
+        last_seen_turn (int | None): Turn id of the last message the client has seen.
+        idempotency_key (str | None): Unique key of the message, sent again when the same message
+        is retried so it is answered only once.
     """
 
     user_message: str
-    conversation_history: list[dict[str, str]] = []
+    session_id: str
+    last_seen_turn: int | None = None
+    idempotency_key: str | None = None
 
 
 class ChatResponse(BaseModel):
@@ -23,11 +27,60 @@ class ChatResponse(BaseModel):
 
     Attributes:
         assistant_message (str): The AI-generated response.
-        metadata (str): Hidden context
-        conversation_history (List[Dict[str, str]]): The chat history including system and assistant
-        messages.
+        metadata (List[Dict[str, str]] | None): Hidden context, stored in the session and never
+        sent to the client.
+        turn (int | None): Turn id of the assistant message.
+        job_id (str | None): Background job to poll when the response is produced asynchronously.
     """
 
     assistant_message: str
     metadata: list[dict[str, str]] | None = None
-    conversation_history: list[dict[str, str]] = []
+    turn: int | None = None
+    job_id: str | None = None
+
+
+class SessionMessage(BaseModel):
+    """
+    Represents a message of a game session.
+
+    Attributes:
+        turn (int): Turn id of the message, increasing with every stored message.
+        role (str): "user" or "assistant".
+        content (str): The message text.
+    """
+
+    turn: int
+    role: str
+    content: str
+
+
+class SessionState(BaseModel):
+    """
+    Represents the messages of a game session after a given turn.
+
+    Attributes:
+        session_id (str): The session identifier.
+        turn (int): Turn id of the last stored message.
+        messages (List[SessionMessage]): Messages after the requested turn.
+    """
+
+    session_id: str
+    turn: int
+    messages: list[SessionMessage] = []
+
+
+class JobStatus(BaseModel):
+    """
+    Represents the state of a background job.
+
+    Attributes:
+        job_id (str): The job identifier.
+        status (str): One of "pending", "running", "completed" or "failed".
+        result (ChatResponse | None): The job's response once completed.
+        error (str | None): Failure reason if the job failed.
+    """
+
+    job_id: str
+    status: str
+    result: ChatResponse | None = None
+    error: str | None = None
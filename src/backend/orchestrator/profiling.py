@@ -0,0 +1,164 @@
+"""On-demand sampling profiles of requests, written as flame graph data.
+
+A share of the requests, set in the services config, or at runtime with `PUT /profiling` when
+runtime control is enabled, and requests sent with an `X-Profile: 1` header when allowed, are
+profiled. Runtime control is off by default: the route has no authentication, and a high sample
+rate would make every request pay for the sampler. While a profiled request
+runs, a sampler thread records the stacks of the threads working on its trace, found through
+their spans, so concurrent requests don't show up in its profile. Profiles are written under the
+logs directory in the folded stacks format, one file per trace, which flamegraph.pl, speedscope
+and most flame graph viewers read.
+"""
+
+import random
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import yaml
+
+from src.backend.orchestrator.tracing import threads_in_trace
+from src.constants import BACKEND_CONFIG, LOGS
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+DEFAULT_PROFILING_CONFIG = {
+    "sample_rate": 0.0,
+    "header_enabled": True,
+    "runtime_control": False,
+    "interval_ms": 5,
+    "max_concurrent": 2,
+    "output_dir": "profiles",
+}
+
+PROFILE_HEADER = "X-Profile"
+
+
+def load_profiling_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the profiling settings from the LLM services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("profiling", {})
+    return {**DEFAULT_PROFILING_CONFIG, **config}
+
+
+def fold_stack(frame) -> str:
+    """Formats a stack, root first, as a line of the folded stacks format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{Path(code.co_filename).stem}.{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of the threads working on a trace until stopped.
+
+    Args:
+        trace_id (str): Trace whose threads are sampled.
+        interval_seconds (float): Seconds between samples.
+    """
+
+    def __init__(self, trace_id: str, interval_seconds: float):
+        self.trace_id = trace_id
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            for thread in threads_in_trace(self.trace_id):
+                if thread in frames:
+                    self.stacks[fold_stack(frames[thread])] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        """Starts sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling, waiting for the last sample."""
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        """Writes the sampled stacks in the folded stacks format."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingManager:
+    """
+    Picks the requests to profile and profiles them.
+
+    Args:
+        sample_rate (float): Share of requests profiled.
+        header_enabled (bool): Whether requests can ask to be profiled with the profile header.
+        runtime_control (bool): Whether the sample rate can be changed with `PUT /profiling`.
+        interval_ms (float): Milliseconds between stack samples.
+        max_concurrent (int): Requests profiled at the same time, the rest are not profiled.
+        output_dir (str): Profiles directory, under the logs directory.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        header_enabled: bool = True,
+        runtime_control: bool = False,
+        interval_ms: float = 5,
+        max_concurrent: int = 2,
+        output_dir: str = "profiles",
+    ):
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+        self.runtime_control = runtime_control
+        self.interval_seconds = interval_ms / 1000
+        self.output_dir = LOGS / output_dir
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+    def wanted(self, headers) -> bool:
+        """Whether a request with these headers is picked to be profiled."""
+        if self.header_enabled and headers.get(PROFILE_HEADER) == "1":
+            return True
+        return random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, trace_id: str):
+        """Profiles the threads of the trace while the block runs, if a profiling slot is free."""
+        if not self._slots.acquire(blocking=False):
+            logger.info("Too many profiles running, not profiling trace %s", trace_id)
+            yield
+            return
+
+        profiler = SamplingProfiler(trace_id, self.interval_seconds)
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            self._slots.release()
+            path = self.output_dir / f"{trace_id}.folded"
+            profiler.write(path)
+            logger.info("Wrote a profile of %d samples to %s", profiler.samples, path)
+
+    def profiles(self) -> list[str]:
+        """Names of the written profiles, newest first."""
+        if not self.output_dir.exists():
+            return []
+        paths = sorted(
+            self.output_dir.glob("*.folded"), key=lambda path: path.stat().st_mtime, reverse=True
+        )
+        return [path.name for path in paths]
+
+
+# Process-wide profiling manager
+profiling = ProfilingManager(**load_profiling_config())
@@ -0,0 +1,269 @@
+"""Retries and hedged requests for LLM calls.
+
+A single slow or failed upstream response shouldn't become the player's latency or a 500.
+Calls failing with a retryable error, such as a connection error, a rate limit or a server
+error, are retried with jittered exponential backoff. Services with hedging enabled also fire a
+duplicate call once the first one takes longer than the observed latency quantile, usually the
+p95, and take whichever returns first, cancelling the other. The share of calls hedged is
+bounded by a hedge budget, so hedging only spends extra tokens on the slowest calls.
+
+Policies are set per service type in the services config, and hold per worker process.
+"""
+
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+import openai
+import yaml
+
+from src.backend.orchestrator.deadline import Deadline
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+DEFAULT_RESILIENCE_CONFIG = {
+    "max_retries": 2,
+    "backoff_base_seconds": 0.5,
+    "backoff_max_seconds": 8,
+    "hedge": False,
+    "hedge_quantile": 0.95,
+    "hedge_budget": 0.1,
+    "hedge_min_samples": 20,
+    "latency_window": 200,
+}
+
+# Errors worth another attempt: timeouts, connection errors, rate limits and 5xx responses
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# Threads running hedged calls, shared by every policy
+HEDGE_WORKERS = 32
+
+_policies: dict[tuple[str, str], "ResiliencePolicy"] = {}
+_policies_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+def load_resilience_config(service_type: str, config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the retry and hedging policy of a service type from the services config."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    return {
+        **DEFAULT_RESILIENCE_CONFIG,
+        **config.get("resilience", {}),
+        **config["services"][service_type].get("resilience", {}),
+    }
+
+
+class LatencyTracker:
+    """
+    Latencies of the latest successful calls.
+
+    Args:
+        window (int): Number of latest calls kept.
+    """
+
+    def __init__(self, window: int):
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def record(self, seconds: float) -> None:
+        """Records the latency of a successful call."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        """Latency below which a share `q` of the latest calls finished."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return math.inf
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+class ResiliencePolicy:
+    """
+    Retries and hedging of the LLM calls of one service type on one backend.
+
+    Args:
+        name (str): Policy name, used in logs and stats.
+        max_retries (int): Attempts made after the first one fails with a retryable error.
+        backoff_base_seconds (float): Backoff ceiling after the first failure, doubled after
+            every other one. The actual backoff is drawn uniformly below it.
+        backoff_max_seconds (float): Highest backoff ceiling.
+        hedge (bool): Whether slow calls are hedged.
+        hedge_quantile (float): Latency quantile after which a duplicate call is fired.
+        hedge_budget (float): Largest share of calls that can be hedged.
+        hedge_min_samples (int): Calls measured before hedging starts.
+        latency_window (int): Latest calls the latency quantile is measured over.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_budget: float = 0.1,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = LatencyTracker(latency_window)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to wait before a retry: full jitter below an exponential ceiling."""
+        ceiling = min(self.backoff_max_seconds, self.backoff_base_seconds * 2**retry)
+        return random.uniform(0, ceiling)
+
+    def hedge_delay(self) -> float | None:
+        """Seconds after which a call is hedged, or None if it can't be hedged right now."""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        with self._lock:
+            if self.hedges >= self.hedge_budget * self.calls:
+                return None
+        return self.latencies.quantile(self.hedge_quantile)
+
+    def call(self, attempt: Callable[[Deadline | None], Any], deadline: Deadline | None = None):
+        """
+        Runs a call, retrying it on retryable errors and hedging it when slow.
+
+        Args:
+            attempt (Callable[[Deadline | None], Any]): Makes one attempt of the call, stopping
+                once the deadline it is given passes or is cancelled.
+            deadline (Deadline, optional): Time budget of the request the call is made for.
+                Backoffs stop once it passes.
+
+        Returns:
+            Any: The result of the first successful attempt.
+        """
+        with self._lock:
+            self.calls += 1
+
+        for retry in range(self.max_retries + 1):
+            try:
+                return self._attempt(attempt, deadline)
+            except RETRYABLE_ERRORS as e:
+                backoff = self.backoff(retry)
+                if retry == self.max_retries or (deadline and backoff >= deadline.remaining()):
+                    with self._lock:
+                        self.failures += 1
+                    raise
+
+                logger.warning(
+                    "%s call failed with %s, retrying in %.2fs",
+                    self.name,
+                    type(e).__name__,
+                    backoff,
+                )
+                with self._lock:
+                    self.retries += 1
+                time.sleep(backoff)
+        return None  # Unreachable, every iteration returns or raises
+
+    def _timed(self, attempt: Callable[[Deadline | None], Any], deadline: Deadline | None):
+        """Makes an attempt, recording its latency if it succeeds."""
+        start = time.monotonic()
+        result = attempt(deadline)
+        self.latencies.record(time.monotonic() - start)
+        return result
+
+    def _attempt(self, attempt: Callable[[Deadline | None], Any], deadline: Deadline | None):
+        """Makes an attempt, hedged with a duplicate if it is slower than the hedge delay."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(attempt, deadline)
+
+        # Every attempt gets its own deadline, so the one that loses can be cancelled
+        primary_deadline = deadline.child() if deadline else Deadline(None, "LLM call")
+        primary = self._submit(attempt, primary_deadline)
+        done, _ = wait([primary], timeout=delay)
+        if done or self.hedge_delay() is None:
+            return primary.result()
+
+        with self._lock:
+            self.hedges += 1
+        logger.info("%s call slower than %.2fs, hedging it", self.name, delay)
+        hedge_deadline = deadline.child() if deadline else Deadline(None, "LLM call")
+        hedge = self._submit(attempt, hedge_deadline)
+
+        pending = {primary: primary_deadline, hedge: hedge_deadline}
+        while True:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                if future.exception() is None or not pending:
+                    for other_deadline in pending.values():
+                        other_deadline.cancel()
+                    if future is hedge and future.exception() is None:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+
+    def _submit(self, attempt: Callable[[Deadline | None], Any], deadline: Deadline) -> Future:
+        """Runs an attempt on the hedge threads, in the context of the calling request."""
+        context = contextvars.copy_context()
+        return _hedge_executor.submit(context.run, self._timed, attempt, deadline)
+
+    def stats(self) -> dict:
+        """Retry and hedging counters, and the hedge win rate."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate": self.hedge_wins / self.hedges if self.hedges else None,
+                "hedge_delay_seconds": (
+                    self.latencies.quantile(self.hedge_quantile)
+                    if self.hedge and len(self.latencies)
+                    else None
+                ),
+            }
+
+
+def get_resilience_policy(backend: str, service_type: str) -> ResiliencePolicy:
+    """Returns the process-wide resilience policy of a service type on a backend."""
+    key = (backend, service_type)
+    with _policies_lock:
+        if key not in _policies:
+            _policies[key] = ResiliencePolicy(
+                f"{backend}/{service_type}", **load_resilience_config(service_type)
+            )
+        return _policies[key]
+
+
+def resilience_stats() -> dict[str, dict]:
+    """Stats of every policy used so far."""
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {policy.name: policy.stats() for policy in policies}
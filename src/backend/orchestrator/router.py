@@ -0,0 +1,150 @@
+"""Cost and latency aware routing of LLM calls between backends.
+
+Services created for the `auto` backend don't have a fixed model: every call is routed to one
+of the backends listed in the `routing` section of the services config. A backend is adequate
+for a call if its tier covers the complexity declared by the service and its context window
+fits the prompt. Among the adequate backends whose expected latency meets the service's latency
+SLO, the cheapest one is picked, and the fastest one if none meets it. Expected latencies come
+from the live call durations and queue depths measured by the admission controllers, until a
+backend has been called they are the ones declared in the config. Backends whose circuit
+breaker is open are only used if no other backend is adequate.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+from src.backend.orchestrator.admission import get_admission_controller
+from src.backend.orchestrator.circuit_breaker import OPEN, get_circuit_breaker
+from src.backend.utils import count_tokens
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+# Backend name of services routed per call
+AUTO_BACKEND = "auto"
+
+DEFAULT_ROUTING_CONFIG = {
+    "complexity_tiers": {"low": 1, "medium": 2, "high": 3},
+    "default_complexity": "high",
+    "default_latency_slo_seconds": 30,
+    "reply_tokens": 1000,
+    "backends": {},
+}
+
+
+def load_routing_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the routing rules and the context windows of the routed backends."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    routing = {**DEFAULT_ROUTING_CONFIG, **config.get("routing", {})}
+    routing["backends"] = {
+        backend: {
+            "context_window": config["backends"][backend]["context_window"],
+            "model": config["backends"][backend]["model"],
+            **rules,
+        }
+        for backend, rules in routing["backends"].items()
+    }
+    return routing
+
+
+class ModelRouter:
+    """
+    Picks the backend of every call of the services routed per call.
+
+    Args:
+        backends (dict[str, dict]): Routed backends, cheapest first, with their `tier`,
+            `cost_per_1k_tokens`, `expected_latency_seconds`, `context_window` and `model`.
+        complexity_tiers (dict[str, int]): Lowest backend tier adequate for each task complexity.
+        default_complexity (str): Complexity of services that don't declare one.
+        default_latency_slo_seconds (float): Latency SLO of services that don't declare one.
+        reply_tokens (int): Tokens kept free for the reply when fitting prompts in context windows.
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, dict],
+        complexity_tiers: dict[str, int],
+        default_complexity: str = "high",
+        default_latency_slo_seconds: float = 30,
+        reply_tokens: int = 1000,
+    ):
+        if not backends:
+            raise ValueError("No backends to route to in the routing config")
+        self.backends = backends
+        self.complexity_tiers = complexity_tiers
+        self.default_complexity = default_complexity
+        self.default_latency_slo_seconds = default_latency_slo_seconds
+        self.reply_tokens = reply_tokens
+
+    def expected_latency(self, backend: str) -> float:
+        """Seconds a call to the backend is expected to take, including its queue."""
+        controller = get_admission_controller(backend)
+        stats = controller.stats()
+        call_seconds = (
+            stats["average_call_seconds"]
+            if any(priority["admitted"] for priority in stats["priorities"].values())
+            else self.backends[backend]["expected_latency_seconds"]
+        )
+        return call_seconds * (1 + stats["waiting"] / controller.max_concurrent)
+
+    def adequate(self, backend: str, complexity: str, prompt_tokens: int) -> bool:
+        """Whether the backend can handle a task of that complexity with that prompt."""
+        rules = self.backends[backend]
+        return (
+            rules["tier"] >= self.complexity_tiers[complexity]
+            and prompt_tokens + self.reply_tokens <= rules["context_window"]
+        )
+
+    def choose(self, routing: dict, prompt: str) -> str:
+        """
+        Picks the backend of a call.
+
+        Args:
+            routing (dict): Routing settings of the service: its `complexity` and
+                `latency_slo_seconds`, both optional.
+            prompt (str): Text sent to the model, measured to fit it in context windows.
+
+        Returns:
+            str: Name of the picked backend.
+        """
+        complexity = routing.get("complexity", self.default_complexity)
+        slo = routing.get("latency_slo_seconds", self.default_latency_slo_seconds)
+        # Token counts only need to be close, every backend is measured with the first's tokenizer
+        prompt_tokens = count_tokens(prompt, next(iter(self.backends.values()))["model"])
+
+        candidates = [
+            backend
+            for backend in self.backends
+            if self.adequate(backend, complexity, prompt_tokens)
+        ]
+        if not candidates:
+            # Nothing fits, the largest context window has the best chance
+            return max(self.backends, key=lambda backend: self.backends[backend]["context_window"])
+
+        available = [b for b in candidates if get_circuit_breaker(b).state != OPEN] or candidates
+        latencies = {backend: self.expected_latency(backend) for backend in available}
+        within_slo = [backend for backend in available if latencies[backend] <= slo]
+        if within_slo:
+            chosen = min(within_slo, key=lambda b: self.backends[b]["cost_per_1k_tokens"])
+        else:
+            chosen = min(available, key=latencies.get)
+
+        logger.debug(
+            "Routed a %s complexity call of %d tokens to %s (expected %.1fs, SLO %.1fs)",
+            complexity,
+            prompt_tokens,
+            chosen,
+            latencies[chosen],
+            slo,
+        )
+        return chosen
+
+
+@lru_cache(maxsize=None)
+def get_router() -> ModelRouter:
+    """Returns the process-wide model router."""
+    return ModelRouter(**load_routing_config())
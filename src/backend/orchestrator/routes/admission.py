@@ -0,0 +1,13 @@
+"""Admission control endpoints configuration"""
+
+from fastapi import APIRouter
+
+from src.backend.orchestrator.admission import admission_stats
+
+router = APIRouter()
+
+
+@router.get("/admission")
+def get_admission_stats():
+    """Returns the queue depth and admission counters of every LLM backend of this worker."""
+    return admission_stats()
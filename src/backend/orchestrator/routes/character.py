@@ -3,8 +3,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from src.backend.database.models import Background, Character, CharacterClass, Race
-from src.backend.utils import get_db
+from src.backend.database.models import Background, CharacterClass, Race
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.routes.sessions import get_game_session
 
 router = APIRouter()
 
@@ -14,10 +15,10 @@ DEFAULT_CLASS = "Ranger"
 DEFAULT_BACKGROUND = "Folk Hero"
 
 
-@router.get("/character")
-def get_character(db: Session = Depends(get_db)):
-    """Returns the character sheet details."""
-    character = db.query(Character).first()
+@router.get("/sessions/{session_id}/character")
+def get_character(session_id: str, db: Session = Depends(get_db)):
+    """Returns the character sheet details of a game session."""
+    character = get_game_session(session_id, db).character
     if not character:
         raise HTTPException(status_code=404, detail="No character found")
 
@@ -0,0 +1,32 @@
+"""Campaign job endpoints configuration"""
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.jobs import CampaignJobManager
+from src.backend.orchestrator.models import ChatRequest, JobStatus
+from src.backend.orchestrator.routes.sessions import get_game_session
+
+router = APIRouter()
+
+
+def get_job_manager(request: Request) -> CampaignJobManager:
+    """Returns the job manager started with the app."""
+    return request.app.state.campaign_jobs
+
+
+@router.post("/campaign/jobs", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+def submit_campaign_job(request: ChatRequest, http_request: Request, db: Session = Depends(get_db)):
+    """Submits a campaign creation job for the player's story start, or returns the active one."""
+    get_game_session(request.session_id, db)
+    return get_job_manager(http_request).submit(request)
+
+
+@router.get("/campaign/jobs/{job_id}", response_model=JobStatus)
+def get_campaign_job(job_id: str, http_request: Request):
+    """Returns the status of a campaign creation job, and its response once completed."""
+    job = get_job_manager(http_request).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,14 @@
+"""Metrics endpoint configuration"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.backend.orchestrator.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Returns the metrics of this worker in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,39 @@
+"""Profiling endpoints configuration"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from src.backend.orchestrator.profiling import profiling
+
+router = APIRouter()
+
+
+@router.get("/profiling")
+def get_profiling():
+    """Returns the profiling settings of this worker and the profiles written so far."""
+    return {
+        "sample_rate": profiling.sample_rate,
+        "header_enabled": profiling.header_enabled,
+        "runtime_control": profiling.runtime_control,
+        "profiles": profiling.profiles(),
+    }
+
+
+@router.put("/profiling")
+def set_profiling(sample_rate: float = Query(..., ge=0, le=1)):
+    """
+    Sets the share of the requests of this worker that are profiled, if runtime control is
+    enabled in the services config.
+    """
+    if not profiling.runtime_control:
+        raise HTTPException(status_code=403, detail="Profiling runtime control is disabled")
+    profiling.sample_rate = sample_rate
+    return get_profiling()
+
+
+@router.get("/profiling/{name}")
+def get_profile(name: str):
+    """Returns a profile in the folded stacks format, for flame graph viewers."""
+    if name not in profiling.profiles():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(profiling.output_dir / name, media_type="text/plain")
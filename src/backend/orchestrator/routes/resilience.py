@@ -0,0 +1,20 @@
+"""Resilience endpoints configuration"""
+
+from fastapi import APIRouter
+
+from src.backend.orchestrator.circuit_breaker import circuit_breaker_stats
+from src.backend.orchestrator.resilience import resilience_stats
+
+router = APIRouter()
+
+
+@router.get("/resilience")
+def get_resilience_stats():
+    """Returns the retry and hedging counters of every LLM service of this worker."""
+    return resilience_stats()
+
+
+@router.get("/resilience/circuit-breakers")
+def get_circuit_breaker_stats():
+    """Returns the state of the circuit breaker of every LLM backend of this worker."""
+    return circuit_breaker_stats()
@@ -0,0 +1,46 @@
+"""Game session endpoints configuration"""
+
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from src.backend.database.models import GameSession
+from src.backend.game_dynamics.game_state_manager import (
+    get_history_store,
+    get_session_dir,
+    load_session_messages,
+)
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.models import SessionState
+
+router = APIRouter()
+
+
+def get_game_session(session_id: str, db: Session) -> GameSession:
+    """Returns a game session, raising a 404 if it doesn't exist."""
+    game_session = db.get(GameSession, session_id)
+    if not game_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return game_session
+
+
+@router.post("/sessions", response_model=SessionState, status_code=status.HTTP_201_CREATED)
+def create_session(db: Session = Depends(get_db)):
+    """Starts a new game session."""
+    game_session = GameSession(id=uuid.uuid4().hex)
+    db.add(game_session)
+    db.commit()
+    return SessionState(session_id=game_session.id, turn=0)
+
+
+@router.get("/sessions/{session_id}/messages", response_model=SessionState)
+def get_session_messages(session_id: str, after: int = 0, db: Session = Depends(get_db)):
+    """Returns the session messages after the given turn id, used to resume or catch up."""
+    get_game_session(session_id, db)
+    history_store = get_history_store(get_session_dir(session_id))
+    return SessionState(
+        session_id=session_id,
+        turn=len(history_store),
+        messages=load_session_messages(history_store, after),
+    )
@@ -0,0 +1,25 @@
+"""Usage ledger endpoints configuration"""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.routes.sessions import get_game_session
+from src.backend.orchestrator.telemetry import usage_ledger, usage_summary
+
+router = APIRouter()
+
+
+@router.get("/usage")
+def get_usage(db: Session = Depends(get_db)):
+    """Returns the token usage and latency of every service type and model, over every session."""
+    usage_ledger.flush()
+    return usage_summary(db)
+
+
+@router.get("/sessions/{session_id}/usage")
+def get_session_usage(session_id: str, db: Session = Depends(get_db)):
+    """Returns the token usage and latency of every service type and model of a game session."""
+    get_game_session(session_id, db)
+    usage_ledger.flush()
+    return usage_summary(db, session_id)
@@ -1,31 +1,74 @@
 """LLM Service Abstraction for DungeonMind.
 
 This module provides an abstraction layer for interacting with various language models (LLMs).
-It allows flexibility in switching between different models.
+It allows flexibility in switching between different models. Every call goes through the
+admission controller of its backend, which bounds the calls running at the same time and
+schedules them by the priority class of their service. Calls made for a request take its
+deadline, and stop waiting or generating once it passes or the request is cancelled. OpenAI
+calls are retried on transient errors and, for services that enable it, hedged when slow.
+While a backend's circuit breaker is open, or when a call to it fails, services fall over to
+the next backend of its fallback chain. Services of the `auto` backend pick the backend of
+every call with the model router. The duration and outcome of every call are recorded in the
+LLM call metrics, labelled by service type and backend, and every request to a backend emits a
+generation telemetry record with its token usage, time to first token and generation rate.
 """
 
 import json
 import os
 import pathlib
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import nullcontext
+from functools import cache, partial
 
 import torch
 import yaml
 from langchain_community.embeddings import OpenAIEmbeddings
 from openai import OpenAI
-from transformers import AutoModelForCausalLM, AutoTokenizer
-
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+from src.backend.orchestrator.admission import (
+    DEFAULT_PRIORITY,
+    AdmissionController,
+    effective_priority,
+    get_admission_controller,
+)
+from src.backend.orchestrator.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    get_circuit_breaker,
+    is_backend_failure,
+)
+from src.backend.orchestrator.deadline import Deadline
+from src.backend.orchestrator.metrics import LLM_CALL_SECONDS, LLM_CALLS
+from src.backend.orchestrator.resilience import ResiliencePolicy, get_resilience_policy
+from src.backend.orchestrator.router import AUTO_BACKEND, get_router
+from src.backend.orchestrator.telemetry import current_generation, generation
 from src.constants import BACKEND_CONFIG, SECRETS
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
 
 
 class LLMService(ABC):
     """
-    Abstract base class for language model services.
+    Interface of language model services.
 
     Args:
         model (str): Model version used for response generation.
         initial_prompt (str): Initial instructions for the service.
         conversation_history (List[Dict[str, str]]): Conversation context if exists.
+
+    Every generation method takes an optional deadline, the time budget of the request it is
+    made for. The factory sets the service type and backend calls are recorded under.
     """
 
     def __init__(
@@ -40,6 +83,8 @@ class LLMService(ABC):
             self.conversation_history = conversation_history
         else:
             self.conversation_history = []
+        self.service_type = "unknown"
+        self.backend = model
 
     @property
     def model(self):
@@ -47,7 +92,7 @@ class LLMService(ABC):
         return self._model
 
     @abstractmethod
-    def chat_completion(self) -> str:
+    def chat_completion(self, deadline: Deadline | None = None) -> str:
         """
         Generates a response from the language model continuing the chat history.
 
@@ -56,7 +101,9 @@ class LLMService(ABC):
         """
 
     @abstractmethod
-    def generate_one_off_response(self, system_prompt: str, user_input: str) -> str:
+    def generate_one_off_response(
+        self, system_prompt: str, user_input: str, deadline: Deadline | None = None
+    ) -> str:
         """
         Generates a response from the language model without affecting chat continuity.
 
@@ -65,16 +112,254 @@ class LLMService(ABC):
         """
 
     @abstractmethod
-    def generate_formatted_response(self, formatted_prompt: str) -> str:
+    def generate_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> str:
+        """
+        Generates a response from a pre-formatted prompt.
+
+        Returns:
+            str: The model-generated response.
+        """
+
+    @abstractmethod
+    def stream_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> Iterator[str]:
+        """
+        Streams a response from a pre-formatted prompt as it is generated.
+
+        Yields:
+            str: Consecutive chunks of the model-generated response.
+        """
+
+
+class BackendService(LLMService):
+    """
+    Base class of the services generating with a backend of their own.
+
+    Subclasses implement the underscored generation methods, the public ones run them under the
+    service's admission controller with the service's priority class, under its resilience
+    policy if it has one and under the backend's circuit breaker, all set by the factory, as is
+    the fallback service of the next backend of the chain.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        initial_prompt: str | None,
+        conversation_history: list[dict[str, str]] | None = None,
+    ):
+        super().__init__(model, initial_prompt, conversation_history)
+        self.admission: AdmissionController | None = None
+        self.priority = DEFAULT_PRIORITY
+        self.resilience: ResiliencePolicy | None = None
+        self.breaker: CircuitBreaker | None = None
+        # Builds the service of the next backend of the fallback chain on first use
+        self.fallback: Callable[[], "BackendService"] | None = None
+
+    def _admitted(self, deadline: Deadline | None = None):
+        """
+        Holds a call slot of the backend, raising OverloadedError if none is available before the
+        queue timeout, and DeadlineExceeded if the deadline passes first. Calls made for a request
+        of a higher priority class than the service's take the request's.
+        """
+        if not self.admission:
+            return nullcontext()
+        timeout = deadline.timeout() if deadline else None
+        return self.admission.slot(effective_priority(self.priority), timeout)
+
+    def _record_call(self, method: str, outcome: str, seconds: float | None = None) -> None:
+        """Records a call in the LLM call metrics, with its duration if it reached the backend."""
+        labels = {
+            "service_type": self.service_type,
+            "backend": self.backend,
+            "method": method.lstrip("_"),
+        }
+        LLM_CALLS.inc(outcome=outcome, **labels)
+        if seconds is not None:
+            LLM_CALL_SECONDS.observe(seconds, **labels)
+
+    def _generation(self, method: str):
+        """Records the telemetry of a request to the backend, filled in by the subclasses."""
+        return generation(self.model, self.service_type, self.backend, method.lstrip("_"))
+
+    def _fall_over(self, error: Exception) -> "BackendService":
+        """
+        Returns the fallback service, sharing this service's conversation, or raises the error
+        that made this backend unavailable if there is none.
+        """
+        if self.fallback is None:
+            raise error
+        try:
+            fallback = self.fallback()
+        except Exception:
+            logger.exception("Could not create the fallback of %s", self.model)
+            raise error from None
+
+        logger.warning("%s unavailable (%s), falling over to %s", self.model, error, fallback.model)
+        fallback.conversation_history = self.conversation_history
+        return fallback
+
+    def _call(self, method: str, *args, deadline: Deadline | None = None) -> str:
+        """
+        Runs a generation method under the circuit breaker and the resilience policy, falling
+        over to the fallback service while the breaker is open or when the call fails. Every
+        attempt, retry or hedge, takes its own call slot.
+        """
+        if self.breaker and not self.breaker.allow():
+            self._record_call(method, "circuit_open")
+            error = CircuitOpenError(f"Circuit breaker of {self.model} is open")
+            return self._fall_over(error)._call(method, *args, deadline=deadline)
+
+        generate = partial(getattr(self, method), *args)
+
+        def attempt(attempt_deadline: Deadline | None) -> str:
+            with self._admitted(attempt_deadline), self._generation(method):
+                return generate(attempt_deadline)
+
+        start = time.monotonic()
+        try:
+            if self.resilience is None:
+                result = attempt(deadline)
+            else:
+                result = self.resilience.call(attempt, deadline)
+        except Exception as e:
+            self._record_call(method, "error", time.monotonic() - start)
+            if not self.breaker:
+                raise
+            if not is_backend_failure(e):
+                self.breaker.release()
+                raise
+            self.breaker.record_failure()
+            return self._fall_over(e)._call(method, *args, deadline=deadline)
+
+        seconds = time.monotonic() - start
+        self._record_call(method, "ok", seconds)
+        if self.breaker:
+            self.breaker.record_success(seconds)
+        return result
+
+    def chat_completion(self, deadline: Deadline | None = None) -> str:
+        """
+        Generates a response from the language model continuing the chat history.
+
+        Returns:
+            str: The model-generated response.
+        """
+        return self._call("_chat_completion", deadline=deadline)
+
+    def generate_one_off_response(
+        self, system_prompt: str, user_input: str, deadline: Deadline | None = None
+    ) -> str:
+        """
+        Generates a response from the language model without affecting chat continuity.
+
+        Returns:
+            str: The model-generated response.
+        """
+        return self._call(
+            "_generate_one_off_response", system_prompt, user_input, deadline=deadline
+        )
+
+    def generate_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> str:
         """
         Generates a response from a pre-formatted prompt.
 
         Returns:
             str: The model-generated response.
         """
+        return self._call("_generate_formatted_response", formatted_prompt, deadline=deadline)
 
+    def stream_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> Iterator[str]:
+        """
+        Streams a response from a pre-formatted prompt as it is generated. The call slot is held
+        until the stream is consumed. Streams are not retried, chunks may already be used, and
+        only fall over while the circuit breaker is open.
+
+        Yields:
+            str: Consecutive chunks of the model-generated response.
+        """
+        if self.breaker and not self.breaker.allow():
+            self._record_call("stream_formatted_response", "circuit_open")
+            error = CircuitOpenError(f"Circuit breaker of {self.model} is open")
+            yield from self._fall_over(error).stream_formatted_response(formatted_prompt, deadline)
+            return
+
+        start = time.monotonic()
+        try:
+            with self._admitted(deadline), self._generation("stream_formatted_response"):
+                yield from self._stream_formatted_response(formatted_prompt, deadline)
+        except GeneratorExit:
+            self._record_call("stream_formatted_response", "abandoned", time.monotonic() - start)
+            # Streams abandoned by their reader say nothing about the backend
+            if self.breaker:
+                self.breaker.release()
+            raise
+        except Exception as e:
+            self._record_call("stream_formatted_response", "error", time.monotonic() - start)
+            if self.breaker and is_backend_failure(e):
+                self.breaker.record_failure()
+            elif self.breaker:
+                self.breaker.release()
+            raise
+
+        seconds = time.monotonic() - start
+        self._record_call("stream_formatted_response", "ok", seconds)
+        if self.breaker:
+            self.breaker.record_success(seconds)
+
+    @abstractmethod
+    def _chat_completion(self, deadline: Deadline | None) -> str:
+        """Generates a response continuing the chat history."""
 
-class OpenAIService(LLMService):
+    @abstractmethod
+    def _generate_one_off_response(
+        self, system_prompt: str, user_input: str, deadline: Deadline | None
+    ) -> str:
+        """Generates a response without affecting chat continuity."""
+
+    @abstractmethod
+    def _generate_formatted_response(self, formatted_prompt: str, deadline: Deadline | None) -> str:
+        """Generates a response from a pre-formatted prompt."""
+
+    def _stream_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None
+    ) -> Iterator[str]:
+        """
+        Streams a response from a pre-formatted prompt. Backends without streaming support yield
+        the whole response as a single chunk.
+        """
+        yield self._generate_formatted_response(formatted_prompt, deadline)
+
+
+def load_openai_api_key() -> str:
+    """Loads the OpenAI API key from the environment, or from the secrets file if unset."""
+    # Try fetching API key from environment variables
+    api_key = os.getenv("OPENAI_API_KEY")
+
+    # Fallback to .secrets file if no environment variable is set
+    if not api_key:
+        try:
+            secrets_path = SECRETS / "open-ai-creds.json"
+            with open(secrets_path, encoding="utf-8") as f:
+                api_key = json.load(f).get("key")
+        except (FileNotFoundError, KeyError, json.JSONDecodeError) as e:
+            raise ValueError(f"Error loading OpenAI credentials: {e}") from e
+    return api_key
+
+
+@cache
+def load_embedding_model(embedding_version: str = DEFAULT_EMBEDDING_MODEL) -> OpenAIEmbeddings:
+    """Creates the OpenAI embedding model of the given version once per process."""
+    return OpenAIEmbeddings(model=embedding_version, openai_api_key=load_openai_api_key())
+
+
+class OpenAIService(BackendService):
     """
     OpenAI GPT-based language model service.
     """
@@ -84,74 +369,129 @@ class OpenAIService(LLMService):
         model: str = "gpt-4",
         initial_prompt: str | None = None,
         temperature: float | None = 0.7,
-        embedding_version: str = "text-embedding-ada-002",
+        embedding_version: str = DEFAULT_EMBEDDING_MODEL,
     ):
         super().__init__(model, initial_prompt)
         self.temperature = temperature
 
-        # Try fetching API key from environment variables
-        api_key = os.getenv("OPENAI_API_KEY")
+        # Initialize OpenAI client
+        # Retries are left to the service's resilience policy
+        self.client = OpenAI(api_key=load_openai_api_key(), max_retries=0)
+        self.embedding_model = load_embedding_model(embedding_version)
 
-        # Fallback to .secrets file if no environment variable is set
-        if not api_key:
-            try:
-                secrets_path = SECRETS / "open-ai-creds.json"
-                with open(secrets_path, encoding="utf-8") as f:
-                    api_key = json.load(f).get("key")
-            except (FileNotFoundError, KeyError, json.JSONDecodeError) as e:
-                raise ValueError(f"Error loading OpenAI credentials: {e}") from e
+    def _complete(self, messages: list[dict], deadline: Deadline | None) -> str:
+        """
+        Requests a completion of the messages. Calls with a deadline are streamed, so they can be
+        dropped between chunks once the deadline passes or the request is cancelled.
+        """
+        if deadline:
+            return "".join(self._stream(messages, deadline))
 
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=api_key)
-        self.embedding_model = OpenAIEmbeddings(model=embedding_version, openai_api_key=api_key)
+        response = self.client.chat.completions.create(
+            model=self.model, messages=messages, temperature=self.temperature
+        )
+        if response.usage:
+            record = current_generation()
+            record.prompt_tokens = response.usage.prompt_tokens
+            record.completion_tokens = response.usage.completion_tokens
+        return response.choices[0].message.content
 
-    def chat_completion(self):
+    def _stream(self, messages: list[dict], deadline: Deadline | None) -> Iterator[str]:
+        """
+        Streams a completion of the messages, closing the connection if the deadline passes.
+        The token usage comes in the last chunk, streams closed before it count one token per
+        chunk received.
+        """
+        record = current_generation()
+        timeout = deadline.timeout() if deadline else None
+        # Without a time limit the client's default timeout applies
+        options = {"timeout": timeout} if timeout is not None else {}
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **options,
+        )
+        # Closing the stream drops the connection, which stops the generation
+        with stream:
+            for chunk in stream:
+                if deadline:
+                    deadline.check()
+                if chunk.usage:
+                    record.prompt_tokens = chunk.usage.prompt_tokens
+                    record.completion_tokens = chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    record.first_token()
+                    record.completion_tokens = (record.completion_tokens or 0) + 1
+                    yield chunk.choices[0].delta.content
+
+    def _chat_completion(self, deadline):
         """Generates a response using the current conversation history."""
         messages = [{"role": "system", "content": self.initial_prompt}] + self.conversation_history
 
         # Get response from current history
-        response = (
-            self.client.chat.completions.create(
-                model=self.model, messages=messages, temperature=self.temperature
-            )
-            .choices[0]
-            .message.content
-        )
-
-        return response
+        return self._complete(messages, deadline)
 
-    def generate_one_off_response(self, system_prompt: str, user_input: str):
+    def _generate_one_off_response(self, system_prompt: str, user_input: str, deadline):
         """Generates a response without modifying conversation history."""
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_input},
         ]
-        response = (
-            self.client.chat.completions.create(
-                model=self.model, messages=messages, temperature=self.temperature
-            )
-            .choices[0]
-            .message.content
-        )
+        return self._complete(messages, deadline)
 
-        return response
-
-    def generate_formatted_response(self, formatted_prompt: str):
+    def _generate_formatted_response(self, formatted_prompt: str, deadline):
         """Generates a response from a pre-formatted prompt."""
-        messages = [{"role": "user", "content": formatted_prompt}]
+        return self._complete([{"role": "user", "content": formatted_prompt}], deadline)
 
-        response = (
-            self.client.chat.completions.create(
-                model=self.model, messages=messages, temperature=self.temperature
-            )
-            .choices[0]
-            .message.content
+    def _stream_formatted_response(self, formatted_prompt: str, deadline):
+        """Streams a response from a pre-formatted prompt."""
+        return self._stream([{"role": "user", "content": formatted_prompt}], deadline)
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """Stops local generation at the next token once the deadline of its request passes."""
+
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],), self.deadline.expired, dtype=torch.bool, device=input_ids.device
         )
 
-        return response
+
+class FirstTokenCriteria(StoppingCriteria):
+    """Never stops local generation, marks the time to first token of the call's telemetry."""
+
+    def __init__(self, record):
+        self.record = record
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.record.first_token()
+        return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
 
 
-class MixtralService(LLMService):
+@cache
+def load_local_model(model: str, hf_token: str | None):
+    """
+    Loads the tokenizer and weights of a local model once per process, so services falling
+    over to it don't reload them on every call.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model, token=hf_token)
+    inference = AutoModelForCausalLM.from_pretrained(
+        model,
+        torch_dtype=torch.float32,
+        device_map={"": "cpu"},
+        token=hf_token,
+        low_cpu_mem_usage=True,
+    )
+    return tokenizer, inference
+
+
+class MixtralService(BackendService):
     """
     Mixtral-based LLM service.
     """
@@ -177,31 +517,39 @@ class MixtralService(LLMService):
             except (FileNotFoundError, KeyError, json.JSONDecodeError) as e:
                 raise ValueError(f"Error loading Hugging Face credentials: {e}") from e
 
-        self.tokenizer = AutoTokenizer.from_pretrained(model, token=hf_token)
-        self.inference = AutoModelForCausalLM.from_pretrained(
-            self.model,
-            torch_dtype=torch.float32,
-            device_map={"": "cpu"},
-            token=hf_token,
-            low_cpu_mem_usage=True,
-        )
+        self.tokenizer, self.inference = load_local_model(model, hf_token)
 
-    def chat_completion(self):
+    def _generate(self, prompt: str, deadline: Deadline | None, **generate_kwargs) -> str:
+        """Generates a completion of the prompt, stopping early if the deadline passes."""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        record = current_generation()
+        criteria = [FirstTokenCriteria(record)]
+        if deadline:
+            criteria.append(DeadlineStoppingCriteria(deadline))
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList(criteria)
+        outputs = self.inference.generate(**inputs, max_length=512, **generate_kwargs)
+
+        # The output starts with the prompt
+        record.prompt_tokens = inputs["input_ids"].shape[1]
+        record.completion_tokens = outputs.shape[1] - record.prompt_tokens
+
+        # A generation cut short by the deadline is discarded
+        if deadline:
+            deadline.check()
+        return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    def _chat_completion(self, deadline):
         """Generates a response using the current conversation history."""
         messages = [{"role": "system", "content": self.initial_prompt}] + self.conversation_history
 
         # Construct prompt from conversation history
         prompt = "\n".join(f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages)
 
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-        outputs = self.inference.generate(**inputs, max_length=512)
-
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response
+        return self._generate(prompt, deadline)
 
-    def generate_one_off_response(self, system_prompt: str, user_input: str):
+    def _generate_one_off_response(self, system_prompt: str, user_input: str, deadline):
         """
         Generates a response from the language model without affecting chat continuity.
         Keeps API consistency with OpenAIService.
@@ -215,29 +563,17 @@ class MixtralService(LLMService):
             f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages
         )
 
-        inputs = self.tokenizer(formatted_prompt, return_tensors="pt").to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-        outputs = self.inference.generate(**inputs, max_length=512, temperature=self.temperature)
+        return self._generate(formatted_prompt, deadline, temperature=self.temperature)
 
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response
-
-    def generate_formatted_response(self, formatted_prompt: str):
+    def _generate_formatted_response(self, formatted_prompt: str, deadline):
         """
         Generates a response from Mixtral using a pre-formatted prompt.
         Useful for direct prompt testing.
         """
-        inputs = self.tokenizer(formatted_prompt, return_tensors="pt").to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-        outputs = self.inference.generate(**inputs, max_length=512, temperature=self.temperature)
+        return self._generate(formatted_prompt, deadline, temperature=self.temperature)
 
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response
 
-
-class SampleService(LLMService):
+class SampleService(BackendService):
     """
     Hello world model service for testing conection with the front end.
     """
@@ -245,24 +581,108 @@ class SampleService(LLMService):
     def __init__(self, model: str = "sample", initial_prompt: str | None = None):
         super().__init__(model, initial_prompt)
 
-    def chat_completion(self):
+    def _chat_completion(self, deadline):
 
         return f"(Local AI) You said: {self.conversation_history[-1]['content']}"
 
-    def generate_one_off_response(self, system_prompt: str, user_input: str):
+    def _generate_one_off_response(self, system_prompt: str, user_input: str, deadline):
         return f"(Local AI) System was prompted {system_prompt}, user message was {user_input}"
 
-    def generate_formatted_response(self, formatted_prompt: str):
+    def _generate_formatted_response(self, formatted_prompt: str, deadline):
         """Generates a response from a pre-formatted prompt."""
         return f"(Local AI) Prompt was: '{formatted_prompt}'"
 
 
+class RoutedService(LLMService):
+    """
+    Service whose calls are each routed to the backend picked by the model router, using the
+    routing settings of the service type.
+
+    Args:
+        service_type (str): Type of the routed service.
+        initial_prompt (str): Initial instructions for the service.
+        routing (dict): Routing settings of the service type: `complexity` and
+            `latency_slo_seconds`.
+        config_path (pathlib.Path): Path to LLM services config file.
+    """
+
+    def __init__(
+        self,
+        service_type: str,
+        initial_prompt: str | None,
+        routing: dict,
+        config_path: pathlib.Path = BACKEND_CONFIG,
+    ):
+        super().__init__(AUTO_BACKEND, initial_prompt)
+        self.service_type = service_type
+        self.routing = routing
+        self.config_path = config_path
+        self.router = get_router()
+        self._services: dict[str, LLMService] = {}
+        self._embedding_model: OpenAIEmbeddings | None = None
+
+    def service(self, backend: str) -> LLMService:
+        """Returns the service of the given backend, created on first use."""
+        if backend not in self._services:
+            factory = LLMServiceFactory(backend, self.service_type, self.config_path)
+            self._services[backend] = factory.get_service()
+        return self._services[backend]
+
+    @property
+    def embedding_model(self) -> OpenAIEmbeddings | None:
+        """Embedding model of the first routed backend that has one, resolved on first use."""
+        if self._embedding_model is None:
+            for backend in self.router.backends:
+                factory = LLMServiceFactory(backend, self.service_type, self.config_path)
+                self._embedding_model = factory.get_embedding_model()
+                if self._embedding_model:
+                    break
+        return self._embedding_model
+
+    def _route(self, *prompt_parts: str) -> LLMService:
+        """Returns the service of the backend picked for a call with the given prompt."""
+        prompt = "\n".join(prompt_parts)
+        service = self.service(self.router.choose(self.routing, prompt))
+        service.conversation_history = self.conversation_history
+        return service
+
+    def chat_completion(self, deadline: Deadline | None = None) -> str:
+        """Continues the chat history with the backend picked for the whole conversation."""
+        prompt_parts = [self.initial_prompt or ""] + [
+            msg["content"] for msg in self.conversation_history
+        ]
+        return self._route(*prompt_parts).chat_completion(deadline)
+
+    def generate_one_off_response(
+        self, system_prompt: str, user_input: str, deadline: Deadline | None = None
+    ) -> str:
+        """Generates a one-off response with the backend picked for the prompt."""
+        return self._route(system_prompt, user_input).generate_one_off_response(
+            system_prompt, user_input, deadline
+        )
+
+    def generate_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> str:
+        """Generates a response with the backend picked for the prompt."""
+        return self._route(formatted_prompt).generate_formatted_response(formatted_prompt, deadline)
+
+    def stream_formatted_response(
+        self, formatted_prompt: str, deadline: Deadline | None = None
+    ) -> Iterator[str]:
+        """Streams a response from the service of the backend picked for the prompt."""
+        yield from self._route(formatted_prompt).stream_formatted_response(
+            formatted_prompt, deadline
+        )
+
+
 class LLMServiceFactory:
     """
     Factory class to dynamically LLM services based on backend and specific service configuration.
 
     Args:
-        llm_backend (str): Defines base model to use with its configurations.
+        llm_backend (str): Defines base model to use with its configurations, or `auto` to route
+            every call of the service to a backend picked by the model router.
         service_type (str): Defines type of service called. E.g. dungeon-master, character-creator.
         config_path (pathlib.Path): Path to LLM services config file.
     """
@@ -273,11 +693,34 @@ class LLMServiceFactory:
         self.llm_backend = llm_backend
         self.service_type = service_type
 
+        self.config_path = config_path
+
         with open(config_path, encoding="utf-8") as file:
             config = yaml.safe_load(file)
-            self.backend_config = config["backends"][self.llm_backend]
+            # Routed services don't have a backend of their own
+            self.backend_config = (
+                {} if llm_backend == AUTO_BACKEND else config["backends"][self.llm_backend]
+            )
             self.service_config = config["services"][self.service_type]
 
+        # Backends of the fallback chain, each one falling over to the next
+        self.fallback_chain = []
+        fallback = self.backend_config.get("fallback")
+        while fallback:
+            if fallback == llm_backend or fallback in self.fallback_chain:
+                raise ValueError(f"Fallback chain of {llm_backend} loops back to {fallback}")
+            self.fallback_chain.append(fallback)
+            fallback = config["backends"][fallback].get("fallback")
+
+    def get_embedding_model(self) -> OpenAIEmbeddings | None:
+        """
+        Returns the embedding model of the backend without creating its service, None for
+        backends without one.
+        """
+        if not self.llm_backend.startswith("gpt"):
+            return None
+        return load_embedding_model()
+
     def get_service(self) -> LLMService:
         """
         Returns an instance of the selected LLM service.
@@ -287,26 +730,49 @@ class LLMServiceFactory:
         """
         initial_prompt = self.service_config.get("initial_prompt", None)
 
+        # Routed services delegate every call to services of the routed backends
+        if self.llm_backend == AUTO_BACKEND:
+            return RoutedService(
+                self.service_type,
+                initial_prompt,
+                self.service_config.get("routing", {}),
+                self.config_path,
+            )
+
         if self.llm_backend.startswith("gpt"):
-            openai_service = OpenAIService(
+            service = OpenAIService(
                 model=self.backend_config["model"],
                 temperature=self.backend_config["temperature"],
                 initial_prompt=initial_prompt,
             )
-            return openai_service
 
         elif self.llm_backend == "mixtral":
-            return MixtralService(
+            service = MixtralService(
                 model=self.backend_config["model"],
                 initial_prompt=initial_prompt,
                 temperature=self.backend_config["temperature"],
             )
 
         elif self.llm_backend == "samplev1":
-            sample_service = SampleService(
+            service = SampleService(
                 model=self.backend_config["model"],
                 initial_prompt=initial_prompt,
             )
-            return sample_service
         else:
             raise ValueError(f"Unsupported backend: {self.llm_backend}")
+
+        service.service_type = self.service_type
+        service.backend = self.llm_backend
+        service.admission = get_admission_controller(self.llm_backend)
+        service.priority = self.service_config.get("priority", DEFAULT_PRIORITY)
+        # Only remote backends fail transiently or have slow outliers worth a duplicate call
+        if isinstance(service, OpenAIService):
+            service.resilience = get_resilience_policy(self.llm_backend, self.service_type)
+
+        service.breaker = get_circuit_breaker(self.llm_backend)
+        if self.fallback_chain:
+            fallback_factory = LLMServiceFactory(
+                self.fallback_chain[0], self.service_type, self.config_path
+            )
+            service.fallback = cache(fallback_factory.get_service)
+        return service
@@ -0,0 +1,345 @@
+"""Generation telemetry of LLM calls and the token usage ledger.
+
+Every call an LLM service makes to its backend, retries and hedges included, produces a
+`GenerationRecord`: model, service type, prompt and completion tokens, time to first token,
+total latency and generation rate. Backends fill in the record of the call they are running,
+found with `current_generation`. Finished records are logged, added to the generation metrics
+and aggregated per game session, service type and model in the usage ledger, a table of the game
+database written in the background, so cost tracking and capacity planning rest on data.
+
+The session of a call is taken from the context of the request it is made for, set with
+`session_context`. Work a request hands to other threads, pipeline stages, campaign streams and
+hedged calls, runs in a copy of the request's context, so its calls are charged to the session
+too.
+"""
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+import yaml
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from src.backend.database.config import SessionLocal
+from src.backend.database.models import UsageLedgerEntry
+from src.backend.orchestrator.deadline import DeadlineExceeded
+from src.backend.orchestrator.metrics import (
+    LLM_TOKENS,
+    LLM_TOKENS_PER_SECOND,
+    LLM_TTFT_SECONDS,
+)
+from src.backend.orchestrator.tracing import SPAN_KIND_CLIENT, span
+from src.constants import BACKEND_CONFIG
+from src.logger_definition import get_logger
+
+logger = get_logger(__file__)
+
+DEFAULT_TELEMETRY_CONFIG = {
+    "ledger_flush_seconds": 10,
+}
+
+# Ledger key of calls made outside of a game session, such as campaign pool refills
+NO_SESSION = ""
+
+# Ledger totals summed per call, on top of the number of calls
+LEDGER_TOTALS = (
+    "failed_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "latency_seconds",
+    "ttft_calls",
+    "ttft_seconds",
+    "generation_seconds",
+)
+
+_session_id: ContextVar[str | None] = ContextVar("session_id", default=None)
+_generation: ContextVar["GenerationRecord | None"] = ContextVar("generation", default=None)
+
+
+def load_telemetry_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the telemetry settings from the LLM services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("telemetry", {})
+    return {**DEFAULT_TELEMETRY_CONFIG, **config}
+
+
+@contextmanager
+def session_context(session_id: str | None):
+    """Attributes the LLM calls made inside the block, on any thread it starts, to a session."""
+    token = _session_id.set(session_id)
+    try:
+        yield
+    finally:
+        _session_id.reset(token)
+
+
+def current_session_id() -> str | None:
+    """Session the calls of the current context are attributed to, if any."""
+    return _session_id.get()
+
+
+class GenerationRecord:
+    """
+    Telemetry of one call to an LLM backend.
+
+    Args:
+        model (str): Model that served the call.
+        service_type (str): Type of the service that made the call.
+        backend (str): Backend that served the call.
+        method (str): Generation method called.
+        session_id (str, optional): Game session the call was made for.
+
+    Attributes:
+        prompt_tokens (int | None): Tokens of the prompt, as counted by the backend.
+        completion_tokens (int | None): Tokens generated.
+        ttft_seconds (float | None): Seconds until the first generated token, for backends that
+            report it.
+        latency_seconds (float | None): Seconds the call took, once finished.
+        outcome (str | None): `ok`, `error`, `cancelled` or `abandoned`, once finished.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        service_type: str,
+        backend: str,
+        method: str,
+        session_id: str | None = None,
+    ):
+        self.model = model
+        self.service_type = service_type
+        self.backend = backend
+        self.method = method
+        self.session_id = session_id
+        self.prompt_tokens: int | None = None
+        self.completion_tokens: int | None = None
+        self.ttft_seconds: float | None = None
+        self.latency_seconds: float | None = None
+        self.outcome: str | None = None
+        self._start = time.monotonic()
+
+    def first_token(self) -> None:
+        """Marks the arrival of the first generated token, only the first mark counts."""
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.monotonic() - self._start
+
+    def finish(self, outcome: str) -> None:
+        """Marks the end of the call."""
+        self.latency_seconds = time.monotonic() - self._start
+        self.outcome = outcome
+
+    @property
+    def generation_seconds(self) -> float | None:
+        """Seconds spent generating after the first token, the whole call if TTFT is unknown."""
+        if self.latency_seconds is None:
+            return None
+        return self.latency_seconds - (self.ttft_seconds or 0.0)
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Generation rate of the call, without the time to first token."""
+        seconds = self.generation_seconds
+        if not self.completion_tokens or not seconds:
+            return None
+        return self.completion_tokens / seconds
+
+    def as_dict(self) -> dict:
+        """Record fields, as logged."""
+        return {
+            "model": self.model,
+            "service_type": self.service_type,
+            "backend": self.backend,
+            "method": self.method,
+            "session_id": self.session_id,
+            "outcome": self.outcome,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "ttft_seconds": self.ttft_seconds,
+            "latency_seconds": self.latency_seconds,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+def current_generation() -> GenerationRecord:
+    """
+    Record of the call running in the current context, for backends to fill in. Outside of a
+    recorded call a throwaway record is returned.
+    """
+    return _generation.get() or GenerationRecord("", "", "", "")
+
+
+@contextmanager
+def generation(
+    model: str, service_type: str, backend: str, method: str
+) -> Iterator[GenerationRecord]:
+    """
+    Records the call to a backend made inside the block in a client span, emitting its telemetry
+    at the end.
+    """
+    record = GenerationRecord(model, service_type, backend, method, current_session_id())
+    # Restored by value, streams can be resumed from another context than the one they started in
+    previous = _generation.get()
+    _generation.set(record)
+    outcome = "error"
+    with span(f"llm.{method}", SPAN_KIND_CLIENT) as llm_span:
+        try:
+            yield record
+            outcome = "ok"
+        except DeadlineExceeded:
+            outcome = "cancelled"
+            raise
+        except GeneratorExit:
+            # Streams closed by their reader before the end
+            outcome = "abandoned"
+            raise
+        finally:
+            _generation.set(previous)
+            record.finish(outcome)
+            if llm_span:
+                for key, value in record.as_dict().items():
+                    llm_span.set_attribute(f"llm.{key}", value)
+            emit(record)
+
+
+def emit(record: GenerationRecord) -> None:
+    """Logs a finished record, adds it to the generation metrics and to the usage ledger."""
+    fields = record.as_dict()
+    logger.info("Generation %s", json.dumps(fields), extra={"data": fields})
+
+    labels = {"service_type": record.service_type, "backend": record.backend}
+    if record.prompt_tokens:
+        LLM_TOKENS.inc(record.prompt_tokens, kind="prompt", **labels)
+    if record.completion_tokens:
+        LLM_TOKENS.inc(record.completion_tokens, kind="completion", **labels)
+    if record.ttft_seconds is not None:
+        LLM_TTFT_SECONDS.observe(record.ttft_seconds, **labels)
+    if record.tokens_per_second is not None:
+        LLM_TOKENS_PER_SECOND.observe(record.tokens_per_second, **labels)
+
+    usage_ledger.add(record)
+
+
+class UsageLedger:
+    """
+    Token usage and latency totals per game session, service type and model, kept in the game
+    database. Records are summed in memory and added to the stored totals on every flush.
+
+    Args:
+        flush_seconds (float): Seconds between flushes of the background writer.
+    """
+
+    def __init__(self, flush_seconds: float = 10):
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, str, str], dict[str, float]] = {}
+        self._stop = threading.Event()
+        self._worker: threading.Thread | None = None
+
+    def add(self, record: GenerationRecord) -> None:
+        """Adds a finished call to the totals waiting for the next flush."""
+        key = (record.session_id or NO_SESSION, record.service_type, record.model)
+        with self._lock:
+            totals = self._pending.setdefault(key, dict.fromkeys(("calls",) + LEDGER_TOTALS, 0))
+            totals["calls"] += 1
+            totals["failed_calls"] += record.outcome != "ok"
+            totals["prompt_tokens"] += record.prompt_tokens or 0
+            totals["latency_seconds"] += record.latency_seconds or 0.0
+            # Averages only cover the calls that report what they average
+            if record.ttft_seconds is not None:
+                totals["ttft_calls"] += 1
+                totals["ttft_seconds"] += record.ttft_seconds
+            if record.completion_tokens:
+                totals["completion_tokens"] += record.completion_tokens
+                totals["generation_seconds"] += record.generation_seconds or 0.0
+
+    def flush(self) -> None:
+        """Adds the pending totals to the stored ones. Totals that fail to write are kept."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        db = SessionLocal()
+        try:
+            for (session_id, service_type, model), totals in pending.items():
+                statement = insert(UsageLedgerEntry).values(
+                    session_id=session_id, service_type=service_type, model=model, **totals
+                )
+                db.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["session_id", "service_type", "model"],
+                        set_={
+                            name: getattr(UsageLedgerEntry, name) + value
+                            for name, value in totals.items()
+                        },
+                    )
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Could not write the usage ledger, retrying on the next flush")
+            with self._lock:
+                for key, totals in pending.items():
+                    current = self._pending.setdefault(key, dict.fromkeys(totals, 0))
+                    for name, value in totals.items():
+                        current[name] += value
+        finally:
+            db.close()
+
+    def start_worker(self) -> None:
+        """Starts the background thread flushing the ledger."""
+        if self._worker and self._worker.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(self.flush_seconds):
+                self.flush()
+
+        self._stop.clear()
+        self._worker = threading.Thread(target=run, name="usage-ledger", daemon=True)
+        self._worker.start()
+
+    def stop_worker(self) -> None:
+        """Stops the background writer, flushing what is left."""
+        self._stop.set()
+        if self._worker:
+            self._worker.join()
+        self.flush()
+
+
+def usage_summary(db: Session, session_id: str | None = None) -> list[dict]:
+    """
+    Stored usage totals per service type and model, of one game session or of every session,
+    with the average latency, time to first token and generation rate.
+    """
+    columns = [func.sum(getattr(UsageLedgerEntry, name)) for name in ("calls",) + LEDGER_TOTALS]
+    query = db.query(UsageLedgerEntry.service_type, UsageLedgerEntry.model, *columns)
+    if session_id is not None:
+        query = query.filter(UsageLedgerEntry.session_id == session_id)
+
+    summary = []
+    for service_type, model, *sums in query.group_by(
+        UsageLedgerEntry.service_type, UsageLedgerEntry.model
+    ):
+        totals = dict(zip(("calls",) + LEDGER_TOTALS, sums))
+        ttft_calls, ttft_seconds = totals.pop("ttft_calls"), totals.pop("ttft_seconds")
+        generation_seconds = totals.pop("generation_seconds")
+        totals["average_latency_seconds"] = (
+            totals["latency_seconds"] / totals["calls"] if totals["calls"] else None
+        )
+        totals["average_ttft_seconds"] = ttft_seconds / ttft_calls if ttft_calls else None
+        totals["tokens_per_second"] = (
+            totals["completion_tokens"] / generation_seconds if generation_seconds else None
+        )
+        summary.append({"service_type": service_type, "model": model, **totals})
+    return summary
+
+
+# Process-wide ledger, flushed by the worker started with the app
+usage_ledger = UsageLedger(load_telemetry_config()["ledger_flush_seconds"])
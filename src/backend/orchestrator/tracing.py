@@ -0,0 +1,438 @@
+"""Span tracing of requests, exported in the OpenTelemetry JSON format.
+
+Every request gets a trace: a span for the request, with child spans for the managers it goes
+through and for the LLM calls, FAISS searches and database queries they make. Spans follow the
+context of the code running them, so they also nest across the threads of pipeline stages and
+hedged calls. Requests carrying a W3C `traceparent` header join the caller's trace. The trace
+and span ids are added to every log record written inside a span.
+
+Finished spans of sampled traces are appended by a background writer to the trace file under
+the logs directory, one OTLP/JSON `ExportTraceServiceRequest` per line, which OpenTelemetry
+collectors and most trace viewers import. The file is rotated by size.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+import yaml
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.backend.utils import file_lock
+from src.constants import BACKEND_CONFIG, LOGS
+from src.logger_definition import get_logger, trace_context
+
+logger = get_logger(__file__)
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": True,
+    "sample_rate": 0.05,
+    "export_file": "traces.jsonl",
+    "batch_size": 200,
+    "max_queue": 10000,
+    "max_file_mb": 50,
+    "backup_count": 3,
+}
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_ERROR = 0, 2
+
+SERVICE_NAME = "dungeonmind"
+# Characters of database statements kept in query spans
+MAX_STATEMENT_CHARS = 500
+# Seconds a partial batch of spans waits for the end of its trace before being written
+FLUSH_SECONDS = 5
+# Queued by flushes, makes the writer write what it holds
+_FLUSH = object()
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+# Trace each thread is working on, used to profile the threads of a request
+_thread_traces: dict[int, str] = {}
+
+
+def load_tracing_config(config_path: Path = BACKEND_CONFIG) -> dict:
+    """Loads the tracing settings from the LLM services config, with defaults."""
+    with open(config_path, encoding="utf-8") as file:
+        config = yaml.safe_load(file).get("tracing", {})
+    return {**DEFAULT_TRACING_CONFIG, **config}
+
+
+def _otlp_value(value) -> dict:
+    """Converts an attribute value to an OTLP `AnyValue`."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    """Converts attributes to OTLP key-values, leaving out unset ones."""
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Span:
+    """
+    A timed operation of a trace.
+
+    Args:
+        name (str): Operation name.
+        trace_id (str): Id of the trace, 32 hex characters.
+        parent_id (str, optional): Id of the parent span, 16 hex characters.
+        sampled (bool): Whether the trace is exported.
+        kind (int): OTLP span kind.
+        attributes (dict, optional): Initial attributes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None = None,
+        sampled: bool = True,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: dict | None = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """Sets an attribute of the span."""
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        """Marks the span as failed by the error."""
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def traceparent(self) -> str:
+        """W3C trace context header continuing the trace from this span."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict:
+        """The span in the OTLP/JSON format."""
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+class SpanExporter:
+    """
+    Appends finished spans to the trace file from a background writer thread, so neither
+    request threads nor the event loop wait on the file. A batch is written when a trace's local
+    root span ends, once `batch_size` spans are waiting or after `FLUSH_SECONDS`. Spans ended
+    while `max_queue` spans wait for the writer are dropped. The file is rotated once it reaches
+    `max_bytes`, keeping `backup_count` rotated files.
+
+    Args:
+        path (Path): Trace file, shared by the worker processes.
+        batch_size (int): Spans buffered before a write.
+        max_queue (int): Spans waiting for the writer before new ones are dropped.
+        max_bytes (int): Size of the trace file that triggers a rotation.
+        backup_count (int): Rotated trace files kept.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        batch_size: int = 200,
+        max_queue: int = 10000,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 3,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def export(self, span: Span, local_root: bool) -> None:
+        """Hands a finished span to the writer, dropping it if the writer is too far behind."""
+        self._start()
+        try:
+            self._queue.put_nowait((span, local_root))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self) -> None:
+        """Waits until every span ended so far is written."""
+        if self._thread is None:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def _start(self) -> None:
+        """Starts the writer thread on the first export."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Writes the queued spans in batches."""
+        spans: list[Span] = []
+        taken = 0
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_SECONDS if spans else None)
+            except queue.Empty:
+                item = _FLUSH
+            else:
+                taken += 1
+
+            if item is _FLUSH:
+                write = True
+            else:
+                span, local_root = item
+                spans.append(span)
+                write = local_root or len(spans) >= self.batch_size
+
+            if write:
+                if spans:
+                    self._write(spans)
+                spans = []
+                for _ in range(taken):
+                    self._queue.task_done()
+                taken = 0
+
+    def _rotate(self) -> None:
+        """Shifts the rotated trace files by one, the current one becoming the first."""
+        for index in range(self.backup_count - 1, 0, -1):
+            rotated = self.path.with_name(f"{self.path.name}.{index}")
+            if rotated.exists():
+                os.replace(rotated, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def _write(self, spans: list[Span]) -> None:
+        """Appends one OTLP export request with the spans to the trace file."""
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        try:
+            # Workers share the file, each export is a single line appended under the lock
+            with file_lock(self.path.with_suffix(".lock")):
+                if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(request) + "\n")
+        except OSError:
+            logger.exception("Could not export %d spans to %s", len(spans), self.path)
+
+
+class Tracer:
+    """
+    Starts spans and exports the finished ones of sampled traces.
+
+    Args:
+        enabled (bool): Whether spans are recorded at all.
+        sample_rate (float): Share of new traces exported. Traces continued from a caller
+            follow the caller's sampling decision.
+        export_file (str): Trace file name, under the logs directory.
+        batch_size (int): Spans buffered before a write.
+        max_queue (int): Spans waiting for the writer before new ones are dropped.
+        max_file_mb (float): Size of the trace file that triggers a rotation, in megabytes.
+        backup_count (int): Rotated trace files kept.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 0.05,
+        export_file: str = "traces.jsonl",
+        batch_size: int = 200,
+        max_queue: int = 10000,
+        max_file_mb: float = 50,
+        backup_count: int = 3,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = SpanExporter(
+            LOGS / export_file, batch_size, max_queue, int(max_file_mb * 1024 * 1024), backup_count
+        )
+
+    def start_span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        traceparent: str | None = None,
+        **attributes,
+    ) -> Span | None:
+        """
+        Starts a span, child of the span of the current context, of the `traceparent` header's
+        span if given, or the root of a new trace otherwise. Returns None if tracing is off.
+        """
+        if not self.enabled:
+            return None
+
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is None and (current := _current_span.get()):
+            parent = (current.trace_id, current.span_id, current.sampled)
+        if parent is None:
+            parent = (os.urandom(16).hex(), None, random.random() < self.sample_rate)
+
+        trace_id, parent_id, sampled = parent
+        return Span(name, trace_id, parent_id, sampled, kind, attributes)
+
+    def end_span(self, span: Span, local_root: bool = False) -> None:
+        """Ends a span, exporting it if its trace is sampled."""
+        span.end_ns = time.time_ns()
+        if span.sampled:
+            self.exporter.export(span, local_root)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        traceparent: str | None = None,
+        bind_thread: bool = True,
+        **attributes,
+    ) -> Iterator[Span | None]:
+        """
+        Runs the block in a span, current in its context until the block ends. The thread
+        running the block is bound to the span's trace for the profiler unless `bind_thread` is
+        False, for blocks that share their thread, such as coroutines.
+        """
+        span = self.start_span(name, kind, traceparent, **attributes)
+        if span is None:
+            yield None
+            return
+
+        local_root = _current_span.get() is None
+        thread = threading.get_ident()
+        # Restored by value, generators can be resumed from another context than their own
+        previous = _current_span.get(), trace_context.get(), _thread_traces.get(thread)
+        _current_span.set(span)
+        trace_context.set((span.trace_id, span.span_id))
+        if bind_thread:
+            _thread_traces[thread] = span.trace_id
+        try:
+            yield span
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.set(previous[0])
+            trace_context.set(previous[1])
+            if bind_thread and previous[2] is None:
+                _thread_traces.pop(thread, None)
+            elif bind_thread:
+                _thread_traces[thread] = previous[2]
+            self.end_span(span, local_root)
+
+
+def parse_traceparent(header: str) -> tuple[str, str, bool] | None:
+    """Trace id, parent span id and sampled flag of a W3C `traceparent` header, if valid."""
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def current_span() -> Span | None:
+    """Span running in the current context, if any."""
+    return _current_span.get()
+
+
+def threads_in_trace(trace_id: str) -> list[int]:
+    """Ids of the threads currently running a span of the trace."""
+    return [thread for thread, trace in _thread_traces.copy().items() if trace == trace_id]
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Adds a client span for every query run by the engine inside a trace."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_span(conn, cursor, statement, parameters, context, executemany):
+        # Statements are only worth their text in traces that get exported
+        current = _current_span.get()
+        if current is None or not current.sampled:
+            return
+        context._trace_span = tracer.start_span(
+            "db.query",
+            SPAN_KIND_CLIENT,
+            **{"db.system": engine.dialect.name, "db.statement": statement[:MAX_STATEMENT_CHARS]},
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query_span(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span:
+            tracer.end_span(span)
+
+    @event.listens_for(engine, "handle_error")
+    def fail_query_span(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None) if context else None
+        if span:
+            span.record_error(exception_context.original_exception)
+            tracer.end_span(span)
+
+
+# Process-wide tracer
+tracer = Tracer(**load_tracing_config())
+span = tracer.span
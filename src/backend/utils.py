@@ -1,12 +1,128 @@
 """Backend utils functions"""
 
+import os
+import threading
+import time
+import weakref
+from collections.abc import Callable, Iterator
+from functools import lru_cache
+from pathlib import Path
+
+import tiktoken
+from sqlalchemy.orm import Session
+
 from src.backend.database.config import SessionLocal
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, locks only hold within the process there
+    fcntl = None
 
-def get_db():
-    """Dependency to get a new database session."""
+# One lock per path and process, so nested acquisitions by the same thread are reentrant
+_file_locks: "weakref.WeakValueDictionary[Path, FileLock]" = weakref.WeakValueDictionary()
+_file_locks_lock = threading.Lock()
+
+
+def database_session(observe_seconds: Callable[[float], None] | None = None) -> Iterator[Session]:
+    """Yields a new database session and closes it, passing how long it was held to the callback."""
+    start = time.perf_counter()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        if observe_seconds:
+            observe_seconds(time.perf_counter() - start)
+
+
+def get_db():
+    """Dependency to get a new database session."""
+    yield from database_session()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Returns the tokenizer of an OpenAI model, falling back to cl100k_base for other models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Counts the tokens of a text with the model's tokenizer."""
+    return len(get_encoding(model).encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Cuts a text to its first tokens."""
+    encoding = get_encoding(model)
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Writes a text file through a temporary file so readers never see a partial write."""
+    # Unique per writer, so concurrent writers never share a temporary file
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class FileLock:
+    """
+    Reentrant lock held across threads and processes through an advisory lock on a file.
+
+    Use `file_lock` to get one, so every thread of a process shares the same instance per path.
+    The advisory lock is released by the OS if the process dies, so a lock that can be acquired
+    is never held by a live worker.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Acquires the lock, returning False if `blocking` is False and it is held elsewhere."""
+        if not self._lock.acquire(blocking=blocking):
+            return False
+        if self._depth == 0:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a+b")
+            if fcntl:
+                try:
+                    fcntl.flock(self._file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    self._file.close()
+                    self._lock.release()
+                    return False
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        """Releases the lock, unlocking the file once the outermost acquisition is released."""
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def file_lock(path: Path) -> FileLock:
+    """Returns the process-wide lock of a lock file."""
+    with _file_locks_lock:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = FileLock(path)
+        return lock
@@ -1,6 +1,7 @@
 document.addEventListener("DOMContentLoaded", async function () {
     try {
-        const response = await fetch("http://127.0.0.1:8000/character");
+        const sessionId = sessionStorage.getItem("sessionId");
+        const response = await fetch(`http://127.0.0.1:8000/sessions/${sessionId}/character`);
         if (!response.ok) throw new Error("Failed to fetch character data");
 
         const data = await response.json();
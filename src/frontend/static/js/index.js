@@ -25,63 +25,86 @@ function typeText(element, text, speed = 75) {
     type();
 }
 
-let chatHistory = []; // Stores conversation history
+const API_URL = "http://127.0.0.1:8000";
 
-// ✅ Load chat history on page load
-document.addEventListener("DOMContentLoaded", function () {
-    const chatLog = document.getElementById("chat-log");
-    let storedChatHistory = sessionStorage.getItem("chatHistory");
-
-    if (!storedChatHistory) {
-        // ✅ No history exists, start with the DungeonMind introduction
-        let storyText = `Between the realms of thought and reality, I dwell: the DungeonMind,
-        the silent watcher, weaving fate into form.
-        A thousand souls have walked this path before you, their fates entwined with destiny.
-        Now the quill hovers over the page once more—who will you become, traveler?
-        A noble warrior, a seeker of knowledge, a trickster in the shadows?
-        Or will you forge a path unlike any before?`;
-
-        let messageElement = document.createElement("p");
-        messageElement.innerHTML = "<strong>DungeonMind:</strong> ";
-        chatLog.appendChild(messageElement);
-
-        typeText(messageElement, storyText);
-
-        // ✅ Store the intro message in history
-        chatHistory.push({ role: "assistant", content: storyText });
-        sessionStorage.setItem("chatHistory", JSON.stringify(chatHistory));
-    } else {
-        // ✅ Load existing chat history and display messages
-        chatHistory = JSON.parse(storedChatHistory);
-        chatHistory.forEach((msg) => {
-            if (msg.role !== "system") {
-                let messageElement = document.createElement("p");
-                messageElement.innerHTML = `<strong>${msg.role === "user" ? "You" : "Dungeon Master"}:</strong> ${msg.content}`;
-                chatLog.appendChild(messageElement);
-            }
-        });
-    }
+// The conversation lives server-side, the client only tracks its session and the last turn shown
+let sessionId = sessionStorage.getItem("sessionId");
+let lastSeenTurn = Number(sessionStorage.getItem("lastSeenTurn") || 0);
 
-    scrollToBottom();
-});
+function setLastSeenTurn(turn) {
+    lastSeenTurn = turn;
+    sessionStorage.setItem("lastSeenTurn", String(turn));
+}
 
+// Display a stored session message
+function showSessionMessage(msg, chatLog) {
+    let messageElement = document.createElement("p");
+    messageElement.innerHTML = `<strong>${msg.role === "user" ? "You" : "Dungeon Master"}:</strong> ${msg.content}`;
+    chatLog.appendChild(messageElement);
+}
 
-async function sendMessage() {
-    const userInput = document.getElementById("user-input").value;
+// Fetch and display the session messages after the last turn shown
+async function catchUp(chatLog) {
+    const response = await fetch(`${API_URL}/sessions/${sessionId}/messages?after=${lastSeenTurn}`);
+    if (!response.ok) throw new Error("Failed to fetch session messages");
+
+    const session = await response.json();
+    session.messages.forEach((msg) => showSessionMessage(msg, chatLog));
+    setLastSeenTurn(session.turn);
+    scrollToBottom(chatLog);
+}
+
+// ✅ Load the session on page load
+document.addEventListener("DOMContentLoaded", async function () {
     const chatLog = document.getElementById("chat-log");
 
-    if (!userInput.trim()) return; // Prevent empty messages
+    // ✅ The DungeonMind introduction opens every session
+    let storyText = `Between the realms of thought and reality, I dwell: the DungeonMind,
+    the silent watcher, weaving fate into form.
+    A thousand souls have walked this path before you, their fates entwined with destiny.
+    Now the quill hovers over the page once more—who will you become, traveler?
+    A noble warrior, a seeker of knowledge, a trickster in the shadows?
+    Or will you forge a path unlike any before?`;
 
-    // ✅ Add user message to chat history
-    chatHistory.push({ role: "user", content: userInput });
+    let messageElement = document.createElement("p");
+    messageElement.innerHTML = "<strong>DungeonMind:</strong> ";
+    chatLog.appendChild(messageElement);
 
-    // ✅ Display user message in chat log
-    chatLog.innerHTML += `<p><strong>You:</strong> ${userInput}</p>`;
-    scrollToBottom(chatLog);
+    try {
+        if (!sessionId) {
+            // ✅ No session exists, start one and type the introduction
+            const response = await fetch(`${API_URL}/sessions`, { method: "POST" });
+            if (!response.ok) throw new Error("Failed to start session");
+
+            const session = await response.json();
+            sessionId = session.session_id;
+            sessionStorage.setItem("sessionId", sessionId);
+            setLastSeenTurn(session.turn);
+            typeText(messageElement, storyText);
+        } else {
+            // ✅ Reload the stored messages of the session
+            messageElement.innerHTML += storyText;
+            setLastSeenTurn(0);
+            await catchUp(chatLog);
+        }
+    } catch (error) {
+        console.error("Error:", error);
+        chatLog.innerHTML += `<p><strong>Error:</strong> Failed to load the session.</p>`;
+    }
 
-    // ✅ Create loading message with animation
+    scrollToBottom();
+
+    // ✅ Resume waiting for a campaign that was still being created before a refresh
+    let pendingJobId = sessionStorage.getItem("pendingJobId");
+    if (pendingJobId) {
+        resumeJob(pendingJobId);
+    }
+});
+
+// Show an animated "Thinking..." message while waiting for the Dungeon Master
+function showLoadingMessage(chatLog) {
     let loadingElement = document.createElement("p");
-    loadingElement.innerHTML = `<strong>Dungeon Master:</strong> <span id="loading-text">Thinking</span>`;
+    loadingElement.innerHTML = `<strong>Dungeon Master:</strong> <span class="loading-text">Thinking</span>`;
     chatLog.appendChild(loadingElement);
     scrollToBottom(chatLog);
 
@@ -89,53 +112,142 @@ async function sendMessage() {
     let dots = 0;
     const loadingInterval = setInterval(() => {
         dots = (dots + 1) % 4;
-        document.getElementById("loading-text").innerText = "Thinking" + ".".repeat(dots);
+        loadingElement.querySelector(".loading-text").innerText = "Thinking" + ".".repeat(dots);
     }, 500);
 
+    return function stopLoading() {
+        clearInterval(loadingInterval);
+        loadingElement.remove();
+    };
+}
+
+// Poll a background job until it finishes and return its chat response
+async function pollJob(jobId, intervalMs = 2000) {
+    while (true) {
+        const response = await fetch(`${API_URL}/campaign/jobs/${jobId}`);
+        if (!response.ok) throw new Error("Failed to fetch job status");
+
+        const job = await response.json();
+        if (job.status === "completed") return job.result;
+        if (job.status === "failed") throw new Error(job.error || "Job failed");
+
+        await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+}
+
+// Wait for a background job, remembering it so a refresh resumes instead of resubmitting
+async function waitForJob(jobId) {
+    sessionStorage.setItem("pendingJobId", jobId);
+    const data = await pollJob(jobId);
+    sessionStorage.removeItem("pendingJobId");
+    return data;
+}
+
+// Display a Dungeon Master response and remember its turn
+function showAssistantResponse(data, chatLog) {
+    setLastSeenTurn(data.turn);
+
+    let messageElement = document.createElement("p");
+    messageElement.innerHTML = "<strong>Dungeon Master:</strong> ";
+    chatLog.appendChild(messageElement);
+
+    typeText(messageElement, data.assistant_message); // Typing effect
+    scrollToBottom(chatLog);
+}
+
+async function resumeJob(jobId) {
+    const chatLog = document.getElementById("chat-log");
+    const stopLoading = showLoadingMessage(chatLog);
+
     try {
-        const response = await fetch("http://127.0.0.1:8000/chat", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-                user_message: userInput,
-                conversation_history: chatHistory, // ✅ Send full history
-            }),
-        });
+        const data = await waitForJob(jobId);
+        stopLoading();
+        // ✅ The reply may already be shown from the session messages
+        if (data.turn > lastSeenTurn) {
+            showAssistantResponse(data, chatLog);
+        }
+    } catch (error) {
+        console.error("Error:", error);
+        stopLoading();
+        sessionStorage.removeItem("pendingJobId");
+        chatLog.innerHTML += `<p><strong>Error:</strong> Failed to get response.</p>`;
+        scrollToBottom(chatLog);
+    }
+}
 
-        if (!response.ok) throw new Error("Failed to fetch response");
 
-        const data = await response.json();
+// Send a chat message, retrying network failures with the same idempotency key so the
+// server answers it only once
+async function postChat(body, retries = 2) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await fetch(`${API_URL}/chat`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify(body),
+            });
+        } catch (error) {
+            if (attempt >= retries) throw error;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+        }
+    }
+}
 
-        // ✅ Overwrite chatHistory if API provides a full history
-        if (data.conversation_history) {
-            chatHistory = data.conversation_history;
+async function sendMessage() {
+    const userInput = document.getElementById("user-input").value;
+    const chatLog = document.getElementById("chat-log");
+
+    if (!userInput.trim()) return; // Prevent empty messages
+
+    // ✅ Display user message in chat log
+    chatLog.innerHTML += `<p><strong>You:</strong> ${userInput}</p>`;
+    scrollToBottom(chatLog);
+
+    // ✅ Create loading message with animation
+    const stopLoading = showLoadingMessage(chatLog);
+
+    try {
+        const response = await postChat({
+            session_id: sessionId,
+            user_message: userInput,
+            last_seen_turn: lastSeenTurn, // ✅ Send only the new message
+            idempotency_key: crypto.randomUUID(),
+        });
+
+        // ✅ The session moved on in another tab, show the missed messages instead
+        if (response.status === 409) {
+            stopLoading();
+            chatLog.lastElementChild.remove();
+            await catchUp(chatLog);
+            return;
         }
 
-        // ✅ First, push metadata into history (but don't display)
-        if (data.metadata) {
-            data.metadata.forEach((meta) => chatHistory.push(meta));
+        // ✅ The server is overloaded, ask the player to retry later instead of waiting
+        if (response.status === 429 || response.status === 503) {
+            const retryAfter = response.headers.get("Retry-After") || "a few";
+            stopLoading();
+            chatLog.lastElementChild.remove();
+            chatLog.innerHTML += `<p><strong>DungeonMind:</strong> The Dungeon Master is busy, try again in ${retryAfter} seconds.</p>`;
+            scrollToBottom(chatLog);
+            return;
         }
 
-        // ✅ Then, add assistant's response to chat history
-        chatHistory.push({ role: "assistant", content: data.assistant_message });
+        if (!response.ok) throw new Error("Failed to fetch response");
 
-        // ✅ Remove loading message
-        clearInterval(loadingInterval);
-        loadingElement.remove();
+        let data = await response.json();
 
-        // ✅ Only display non-hidden messages
-        let messageElement = document.createElement("p");
-        messageElement.innerHTML = "<strong>Dungeon Master:</strong> ";
-        chatLog.appendChild(messageElement);
+        // ✅ Campaign creation runs as a background job, wait for its result
+        if (data.job_id) {
+            data = await waitForJob(data.job_id);
+        }
 
-        typeText(messageElement, data.assistant_message); // Typing effect
-        scrollToBottom(chatLog);
+        // ✅ Remove loading message
+        stopLoading();
 
-        // ✅ Save updated history in sessionStorage
-        sessionStorage.setItem("chatHistory", JSON.stringify(chatHistory));
+        showAssistantResponse(data, chatLog);
     } catch (error) {
         console.error("Error:", error);
-        clearInterval(loadingInterval);
+        stopLoading();
         chatLog.innerHTML += `<p><strong>Error:</strong> Failed to get response.</p>`;
         scrollToBottom(chatLog);
     }
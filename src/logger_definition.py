@@ -1,24 +1,176 @@
-"""Utility functions to handle logging in the whole project."""
+"""Utility functions to handle logging in the whole project.
 
+Loggers don't write logs themselves: records go through a bounded queue to a background thread
+that writes them to the console and to a JSON lines file, so code logging never waits on log
+I/O. The log file of each process is rotated once it reaches `MAX_LOG_BYTES` or is
+`ROTATE_SECONDS` old, keeping `BACKUP_COUNT` rotated files. Messages longer than
+`MAX_MESSAGE_CHARS` are truncated, large payloads belong in debug records, which aren't even
+formatted unless the logger's level lets them through.
+"""
+
+import atexit
+import json
 import logging
-from datetime import datetime
+import os
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 from src.constants import LOGS
 
+# Records waiting for the writer thread, records logged while it is full are dropped
+QUEUE_SIZE = 10000
+MAX_MESSAGE_CHARS = 4000
+MAX_LOG_BYTES = 10 * 1024 * 1024
+ROTATE_SECONDS = 24 * 60 * 60
+BACKUP_COUNT = 5
+
+# Trace and span ids of the span running in the current context, set by the backend's tracer
+trace_context: ContextVar[tuple[str, str] | None] = ContextVar("trace_context", default=None)
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the trace and span ids of the current span to log records, `-` outside of traces."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id, record.span_id = trace_context.get() or ("-", "-")
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as JSON objects, with the `data` dict passed in `extra` if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "span_id": getattr(record, "span_id", "-"),
+            "message": record.getMessage(),
+        }
+        if getattr(record, "data", None) is not None:
+            entry["data"] = record.data
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotates its file once it reaches `max_bytes` or once `rotate_seconds` passed since the
+    last rotation, whichever comes first.
+    """
+
+    def __init__(self, filename: Path, max_bytes: int, backup_count: int, rotate_seconds: float):
+        super().__init__(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        self.rotate_seconds = rotate_seconds
+        self.rollover_at = time.time() + rotate_seconds
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.rotate_seconds
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever waiting for it. Records are stamped with
+    the trace context of the thread logging them, and records logged while the queue is full
+    are dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.addFilter(TraceContextFilter())
+        # Records are enqueued by every thread that logs
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merges the message arguments, truncating long messages, and renders the traceback."""
+        message = record.getMessage()
+        if len(message) > MAX_MESSAGE_CHARS:
+            hidden = len(message) - MAX_MESSAGE_CHARS
+            message = f"{message[:MAX_MESSAGE_CHARS]}... [{hidden} more characters]"
+
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.msg = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Queues a record, or drops and counts it if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            warning = logging.makeLogRecord(
+                {
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Dropped {dropped} log records, the log queue was full",
+                    "trace_id": "-",
+                    "span_id": "-",
+                }
+            )
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                with self._dropped_lock:
+                    self.dropped += dropped
+
+
 # Spawn formatter and handler as a singleton to avoid repeated logs if calling `get_logger` from
 # multiple modules
 formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s -  %(funcName)s.%(lineno)d - %(message)s"
+    "%(asctime)s - %(name)s - %(levelname)s -  %(funcName)s.%(lineno)d"
+    " - [trace=%(trace_id)s span=%(span_id)s] - %(message)s"
 )
 console = logging.StreamHandler()
 console.setFormatter(formatter)
 console.setLevel("INFO")
 
-file = logging.FileHandler(LOGS / f"{datetime.now().isoformat()}.log")
-file.setFormatter(formatter)
+# Worker processes rotate their own file, several processes can't rotate a shared one safely
+file = SizeAndTimeRotatingFileHandler(
+    LOGS / f"dungeonmind.{os.getpid()}.log", MAX_LOG_BYTES, BACKUP_COUNT, ROTATE_SECONDS
+)
+file.setFormatter(JSONFormatter())
 file.setLevel("DEBUG")
 
+log_queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+listener = QueueListener(log_queue, console, file, respect_handler_level=True)
+listener.start()
+# Writes the records still queued when the process exits
+atexit.register(listener.stop)
+
 logging.captureWarnings(capture=True)
 
 
@@ -40,9 +192,8 @@ def get_logger(file_or_name: str, level: str = "INFO") -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(level)
 
-    # Add the handlers if they are not already added
+    # Add the handler if it is not already added
     if not logger.hasHandlers():
-        logger.addHandler(console)
-        logger.addHandler(file)
+        logger.addHandler(queue_handler)
 
     return logger
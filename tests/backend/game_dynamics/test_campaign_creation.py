@@ -0,0 +1,313 @@
+"""Testing module for sectioned campaign creation"""
+
+import threading
+
+import pytest
+
+from src.backend.game_dynamics import campaign_creation
+from src.backend.game_dynamics.campaign_creation import (
+    CAMPAIGN_INCOMPLETE,
+    SECTION_FALLBACK,
+    CampaignManager,
+    CampaignStream,
+)
+from src.backend.game_dynamics.stage_graph import StageGraph
+from src.backend.orchestrator.deadline import DeadlineExceeded
+from src.backend.orchestrator.models import ChatRequest, ChatResponse
+
+SECTIONS = [
+    {"name": "overview", "heading": "1. Campaign Overview", "from_outline": "Campaign Overview"},
+    {"name": "setting", "heading": "2. Setting & Worldbuilding", "instructions": "Setting"},
+    {"name": "core_encounters", "heading": "3. Core Encounters", "from_outline": "Core Encounters"},
+    {"name": "act_1", "group": "4. Adventure Structure", "heading": "# Act 1", "instructions": ""},
+    {"name": "act_2", "group": "4. Adventure Structure", "heading": "# Act 2", "instructions": ""},
+]
+
+OUTLINE = """Campaign Overview
+Title: The Cursed Obelisk
+
+Core Encounters
+| Act | Type | Encounter Name | Details |
+"""
+
+
+@pytest.fixture
+def manager():
+    """Campaign manager writing the test sections, without loading any model or database."""
+    campaign_manager = CampaignManager.__new__(CampaignManager)
+    campaign_manager.campaign_sections = SECTIONS
+    return campaign_manager
+
+
+def test_split_outline(manager):
+    """
+    Tests that the outline is split at its section titles, whatever their order and case.
+    """
+    assert manager._split_outline(OUTLINE) == {
+        "overview": "Title: The Cursed Obelisk",
+        "core_encounters": "| Act | Type | Encounter Name | Details |",
+    }
+
+    swapped = "core encounters\n| Act |\n\ncampaign overview\nTitle: The Cursed Obelisk"
+    assert manager._split_outline(swapped) == {
+        "overview": "Title: The Cursed Obelisk",
+        "core_encounters": "| Act |",
+    }
+
+
+def test_split_outline_with_missing_or_extra_sections(manager):
+    """
+    Tests that an outline missing a section is kept whole in the first section, and that text
+    outside the outline sections stays in the section it follows.
+    """
+    missing = "Campaign Overview\nTitle: The Cursed Obelisk"
+    assert manager._split_outline(missing) == {"overview": missing}
+
+    extra = OUTLINE + "\nNotes\nThe obelisk hums at night."
+    assert manager._split_outline(extra)["core_encounters"] == (
+        "| Act | Type | Encounter Name | Details |\n\nNotes\nThe obelisk hums at night."
+    )
+
+
+def test_stitch_campaign_follows_the_section_order(manager):
+    """
+    Tests that sections are stitched in config order, whatever the order they were written in,
+    with group headings written once.
+    """
+    campaign = manager.stitch_campaign(
+        OUTLINE, {"act_2": "The twist.", "act_1": "The hook.", "setting": "A dark forest."}
+    )
+
+    assert campaign == "\n\n".join(
+        [
+            "1. Campaign Overview\nTitle: The Cursed Obelisk",
+            "2. Setting & Worldbuilding\nA dark forest.",
+            "3. Core Encounters\n| Act | Type | Encounter Name | Details |",
+            "4. Adventure Structure",
+            "# Act 1\nThe hook.",
+            "# Act 2\nThe twist.",
+        ]
+    )
+
+
+def build_sectioned_graph(manager, write_section):
+    """Builds the sectioned campaign stages on top of an empty campaign context."""
+    manager.write_campaign_outline = lambda context, deadline: OUTLINE
+    manager.write_campaign_section = write_section
+
+    graph = StageGraph("test")
+    graph.add_stage("campaign_context", lambda _: {})
+    manager._add_sectioned_campaign_stages(graph)
+    return graph
+
+
+def test_failed_sections_fall_back_to_the_outline(manager):
+    """
+    Tests that a failed section is replaced with the fallback note, while the other sections
+    are kept.
+    """
+
+    def write_section(section, outline, context, deadline):
+        if section["name"] == "act_2":
+            raise RuntimeError("Backend unavailable")
+        return f"{section['name']} text"
+
+    campaign = build_sectioned_graph(manager, write_section).run(["campaign"])["campaign"]
+
+    assert "# Act 1\nact_1 text" in campaign
+    assert f"# Act 2\n{SECTION_FALLBACK}" in campaign
+    assert campaign.index("2. Setting") < campaign.index("# Act 1") < campaign.index("# Act 2")
+
+
+def test_sections_past_the_deadline_fail_the_campaign(manager):
+    """
+    Tests that a section running out of time fails the campaign instead of falling back.
+    """
+
+    def write_section(section, outline, context, deadline):
+        raise DeadlineExceeded("Deadline passed")
+
+    with pytest.raises(DeadlineExceeded):
+        build_sectioned_graph(manager, write_section).run(["campaign"])
+
+
+def start_stream(chunks, **callbacks):
+    """Streams the chunks, collecting the text every callback is called with."""
+    calls = {"opening": [], "complete": [], "incomplete": []}
+    stream = CampaignStream(
+        chunks,
+        on_opening_sections=calls["opening"].append,
+        on_complete=calls["complete"].append,
+        on_incomplete=calls["incomplete"].append,
+    )
+    return stream, calls
+
+
+def test_stream_releases_the_opening_sections_before_the_end():
+    """
+    Tests that the opening sections are released once the Act 2 heading line is streamed, even
+    when the heading is split across chunks, while the rest keeps streaming.
+    """
+    resume = threading.Event()
+
+    def chunks():
+        yield "1. Campaign Overview\nThe obelisk act"
+        yield "s up.\n# Ac"
+        yield "t 2: Rising"
+        yield " Action\n"
+        resume.wait(5)
+        yield "The twist."
+
+    stream, calls = start_stream(chunks())
+
+    assert stream.wait_for_opening_sections() == "1. Campaign Overview\nThe obelisk acts up."
+    assert not stream.done.is_set()
+
+    resume.set()
+    stream.done.wait(5)
+    assert calls["complete"] == [
+        "1. Campaign Overview\nThe obelisk acts up.\n# Act 2: Rising Action\nThe twist."
+    ]
+    assert calls["opening"] == ["1. Campaign Overview\nThe obelisk acts up."]
+    assert calls["incomplete"] == []
+
+
+def test_stream_without_act_2_is_released_once_complete():
+    """
+    Tests that a campaign without an Act 2 heading is released whole at the end, and that an
+    unterminated last line is still searched.
+    """
+    stream, calls = start_stream(iter(["Overview\nAct 1", "\nThe end."]))
+    assert stream.wait_for_opening_sections() == "Overview\nAct 1\nThe end."
+
+    stream, calls = start_stream(iter(["Overview\n", "Act 2"]))
+    assert stream.wait_for_opening_sections() == "Overview"
+    stream.done.wait(5)
+    assert calls["complete"] == ["Overview\nAct 2"]
+
+
+def test_stream_failures_mark_the_campaign_incomplete():
+    """
+    Tests that a stream failing after the opening sections were released reports them as
+    incomplete, and that one failing before fails the wait.
+    """
+
+    def chunks(fail_after):
+        yield from fail_after
+        raise RuntimeError("Stream interrupted")
+
+    stream, calls = start_stream(chunks(["Overview\n", "Act 2\n", "The twi"]))
+    stream.done.wait(5)
+    assert stream.wait_for_opening_sections() == "Overview"
+    assert calls["incomplete"] == ["Overview"]
+    assert calls["complete"] == []
+
+    stream, calls = start_stream(chunks(["Overview\n"]))
+    with pytest.raises(RuntimeError, match="before the opening sections"):
+        stream.wait_for_opening_sections()
+    assert calls["incomplete"] == []
+
+
+def join_campaign_streams():
+    """Waits for the campaign streams started by the test to finish."""
+    for thread in threading.enumerate():
+        if thread.name == "campaign-stream":
+            thread.join(5)
+
+
+@pytest.fixture
+def initializing_manager(manager, tmp_path, monkeypatch):
+    """Campaign manager creating the campaign of a game session stored in a test directory."""
+    monkeypatch.setattr(campaign_creation, "get_session_dir", lambda session_id: tmp_path)
+
+    def build_campaign_graph(user_input, deadline):
+        graph = StageGraph("test")
+        graph.add_stage("campaign_context", lambda _: {})
+        graph.add_stage("campaign", lambda _: "Overview\nAct 1\nAct 2")
+        return graph
+
+    manager.campaign_pool = None
+    manager.streaming = False
+    manager.build_campaign_graph = build_campaign_graph
+    manager.stream_campaign = lambda context, deadline: iter(["Overview\nAct 1\nAct 2\n"])
+    manager.get_opening_message = lambda text, deadline: f"Opening of {text!r}"
+    manager.get_campaign_metadata = lambda text: [{"role": "system", "content": text}]
+    return manager
+
+
+def test_campaign_file_is_written_once_the_turn_is_recorded(initializing_manager, tmp_path):
+    """
+    Tests that the campaign file doesn't exist yet when the opening turn is recorded, and holds
+    the campaign once it is.
+    """
+    campaign_file = tmp_path / "campaign.txt"
+    recorded = []
+
+    def record_turn(response):
+        assert not campaign_file.exists()
+        recorded.append(response)
+        return 2
+
+    response = initializing_manager.initialize_campaign(
+        ChatRequest(user_message="the north", session_id="session-1"), record_turn
+    )
+
+    assert response == ChatResponse(
+        assistant_message="Opening of 'Overview\\nAct 1\\nAct 2'", turn=2
+    )
+    assert recorded[0].metadata == [{"role": "system", "content": "Overview\nAct 1\nAct 2"}]
+    assert campaign_file.read_text(encoding="utf-8") == "Overview\nAct 1\nAct 2"
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("failing_step", ["opening_message", "record_turn"])
+def test_failed_campaign_creation_leaves_no_campaign_file(
+    initializing_manager, tmp_path, streaming, failing_step
+):
+    """
+    Tests that a campaign creation whose opening message or turn recording fails leaves no
+    campaign file, even once the campaign stream completes, so the session can start it again.
+    """
+
+    def fail(*args):
+        raise RuntimeError("Backend unavailable")
+
+    initializing_manager.streaming = streaming
+    if failing_step == "opening_message":
+        initializing_manager.get_opening_message = fail
+
+    with pytest.raises(RuntimeError, match="Backend unavailable"):
+        initializing_manager.initialize_campaign(
+            ChatRequest(user_message="the north", session_id="session-1"),
+            fail if failing_step == "record_turn" else lambda response: 2,
+        )
+
+    join_campaign_streams()
+    assert not (tmp_path / "campaign.txt").exists()
+
+
+def test_streamed_campaign_file_is_marked_incomplete(initializing_manager, tmp_path):
+    """
+    Tests that the campaign file holds the opening sections once the player is answered, and a
+    note to improvise the rest once the stream fails.
+    """
+    resume = threading.Event()
+
+    def chunks():
+        yield "Overview\nAct 1\nAct 2\n"
+        resume.wait(5)
+        raise RuntimeError("Stream interrupted")
+
+    initializing_manager.streaming = True
+    initializing_manager.stream_campaign = lambda context, deadline: chunks()
+    campaign_file = tmp_path / "campaign.txt"
+
+    response = initializing_manager.initialize_campaign(
+        ChatRequest(user_message="the north", session_id="session-1"), lambda response: 2
+    )
+    assert response == ChatResponse(assistant_message="Opening of 'Overview\\nAct 1'", turn=2)
+    assert campaign_file.read_text(encoding="utf-8") == "Overview\nAct 1"
+
+    resume.set()
+    join_campaign_streams()
+    assert campaign_file.read_text(encoding="utf-8") == f"Overview\nAct 1\n\n{CAMPAIGN_INCOMPLETE}"
@@ -0,0 +1,82 @@
+"""Testing module for the pregenerated campaign pool"""
+
+import numpy as np
+
+from src.backend.game_dynamics.campaign_pool import DEFAULT_POOL_CONFIG, CampaignPool
+
+# Two well separated themes in a toy embedding space
+DUNGEON = [1.0, 0.0, 0.0]
+CITY = [0.0, 1.0, 0.0]
+
+
+def get_pool(tmp_path, **overrides):
+    """Builds an enabled pool in a temporary directory."""
+    config = {**DEFAULT_POOL_CONFIG, "enabled": True, "min_answers": 4, **overrides}
+    return CampaignPool(config, pool_dir=tmp_path)
+
+
+def test_refill_generates_one_campaign_per_theme(tmp_path):
+    """
+    Tests that recorded answers are clustered into themes and each theme gets its campaigns.
+    """
+    pool = get_pool(tmp_path, pool_size=2, num_themes=2)
+    for noise in (0.0, 0.1):
+        pool.record_answer("a dark dungeon", [1.0, noise, 0.0])
+        pool.record_answer("a busy city", [noise, 1.0, 0.0])
+
+    generated = []
+
+    def generate(answer):
+        generated.append(answer)
+        return f"campaign for {answer}", f"opening for {answer}"
+
+    pool.refill(generate)
+    assert sorted(set(generated)) == ["a busy city", "a dark dungeon"]
+    assert len(pool.load_campaigns()) == 2
+
+    # A full pool is not refilled again
+    pool.refill(generate)
+    assert len(generated) == 2
+
+
+def test_claim_respects_threshold_and_removes_campaign(tmp_path):
+    """
+    Tests that only close enough answers are served and that a campaign is served once.
+    """
+    pool = get_pool(tmp_path, similarity_threshold=0.9)
+    pool.add_campaign({"answer": "dungeon", "embedding": np.array(DUNGEON)}, "text", "opening")
+
+    assert pool.claim(CITY) is None
+
+    claimed = pool.claim([0.95, 0.05, 0.0])
+    assert claimed["campaign_text"] == "text"
+    assert claimed["opening_message"] == "opening"
+    assert pool.claim(DUNGEON) is None
+
+
+def test_stale_campaigns_are_discarded(tmp_path):
+    """
+    Tests that campaigns older than the configured age are never served.
+    """
+    pool = get_pool(tmp_path, max_age_hours=0)
+    pool.add_campaign({"answer": "dungeon", "embedding": np.array(DUNGEON)}, "text", "opening")
+
+    assert pool.claim(DUNGEON) is None
+    assert not list(pool.campaigns_dir.glob("*.json"))
+
+
+def test_old_answers_are_dropped_from_the_answers_file(tmp_path):
+    """
+    Tests that only the most recent answers are kept once the answers are loaded.
+    """
+    pool = get_pool(tmp_path, max_answers=3)
+    for i in range(5):
+        pool.record_answer(f"answer {i}", [1.0, float(i), 0.0])
+
+    answers, embeddings = pool.load_answers()
+    assert answers == ["answer 2", "answer 3", "answer 4"]
+    assert embeddings.shape == (3, 3)
+    assert len(pool.answers_file.read_text(encoding="utf-8").splitlines()) == 3
+
+    pool.record_answer("answer 5", DUNGEON)
+    assert pool.load_answers()[0] == ["answer 3", "answer 4", "answer 5"]
@@ -0,0 +1,165 @@
+"""Testing module for the append-only chat history store"""
+
+import multiprocessing
+
+import pytest
+
+from src.backend.game_dynamics import chat_history_store
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+
+
+def make_messages(start, stop):
+    """Builds alternating user/assistant messages numbered from start to stop."""
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} ✨"}
+        for i in range(start, stop)
+    ]
+
+
+def test_append_and_read(tmp_path):
+    """
+    Tests appends, ranged reads and reads of the last messages.
+    """
+    store = ChatHistoryStore(tmp_path)
+    assert len(store) == 0
+    assert store.read_last(4) == []
+
+    store.append(make_messages(0, 5))
+    store.append(make_messages(5, 8))
+
+    assert len(store) == 8
+    assert store.read_all() == make_messages(0, 8)
+    assert store.read_last(3) == make_messages(5, 8)
+    assert store.read(2, 4) == make_messages(2, 4)
+
+    # A new store over the same directory sees the same history
+    assert ChatHistoryStore(tmp_path).read_all() == make_messages(0, 8)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_compaction_keeps_global_indices(tmp_path, compress):
+    """
+    Tests that compacted messages are archived and still readable by their original index.
+    """
+    store = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3, compress=compress)
+
+    for start in range(0, 25, 5):
+        store.append(make_messages(start, start + 5))
+
+    assert len(store) == 25
+    assert list(store.archive_dir.iterdir())
+    assert store.read_all() == make_messages(0, 25)
+    assert store.read(4, 14) == make_messages(4, 14)
+    assert store.read_last(2) == make_messages(23, 25)
+
+    reopened = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3, compress=compress)
+    assert len(reopened) == 25
+    assert reopened.read(12, 20) == make_messages(12, 20)
+
+
+def test_manifest_is_read_again_only_after_a_compaction(tmp_path, monkeypatch):
+    """
+    Tests that accesses reuse the manifest and archive listing they read last, until another
+    store's compaction replaces the manifest.
+    """
+    store = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3)
+    other = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3)
+    store.append(make_messages(0, 12))
+    assert store.read_all() == make_messages(0, 12)
+
+    reads = []
+    read_bytes = chat_history_store.Path.read_bytes
+
+    def count_manifest_reads(path):
+        if path.name == "history.manifest":
+            reads.append(path)
+        return read_bytes(path)
+
+    monkeypatch.setattr(chat_history_store.Path, "read_bytes", count_manifest_reads)
+    globs = []
+    glob = chat_history_store.Path.glob
+    monkeypatch.setattr(
+        chat_history_store.Path,
+        "glob",
+        lambda path, pattern: globs.append(pattern) or glob(path, pattern),
+    )
+
+    for _ in range(3):
+        assert store.read(0, 12) == make_messages(0, 12)
+    assert len(store) == 12
+    assert reads == [] and globs == []
+
+    # Compacting from another store replaces the manifest, which is then read once
+    other.append(make_messages(12, 20))
+    reads.clear()
+    globs.clear()
+    assert store.read_all() == make_messages(0, 20)
+    assert store.read_all() == make_messages(0, 20)
+    assert len(reads) == 1 and globs == ["segment-*"]
+
+
+def test_interrupted_compaction_leaves_the_history_intact(tmp_path, monkeypatch):
+    """
+    Tests that a compaction interrupted before its manifest swap leaves the previous history in
+    place, without duplicated messages, and that the next compaction cleans up after it.
+    """
+    store = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3)
+    store.append(make_messages(0, 9))
+
+    replace = chat_history_store.os.replace
+
+    def crash_on_manifest(src, dst):
+        if dst == store.manifest_file:
+            raise OSError("Crashed before the manifest swap")
+        replace(src, dst)
+
+    monkeypatch.setattr(chat_history_store.os, "replace", crash_on_manifest)
+    with pytest.raises(OSError):
+        store.append(make_messages(9, 10))
+    monkeypatch.undo()
+
+    # The archive and next generation written by the crashed compaction are ignored
+    reopened = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3)
+    assert reopened.read_all() == make_messages(0, 10)
+
+    reopened.append(make_messages(10, 20))
+    assert reopened.read_all() == make_messages(0, 20)
+    assert [path.name for path in reopened.archive_dir.iterdir()] == [
+        "segment-000000000-000000017.jsonl" + (".zst" if reopened.compress else "")
+    ]
+    assert sorted(path.name for path in tmp_path.glob("history.*.*")) == [
+        "history.1.idx",
+        "history.1.jsonl",
+    ]
+
+
+def append_in_process(directory, start, stop):
+    """Appends messages from another worker process."""
+    store = ChatHistoryStore(directory, compact_threshold=10, keep_recent=3)
+    for i in range(start, stop):
+        store.append(make_messages(i, i + 1))
+
+
+def test_concurrent_workers_share_the_store(tmp_path):
+    """
+    Tests that stores opened by several processes see each other's appends and compactions.
+    """
+    store = ChatHistoryStore(tmp_path, compact_threshold=10, keep_recent=3)
+    store.append(make_messages(0, 2))
+
+    workers = [
+        multiprocessing.get_context("spawn").Process(
+            target=append_in_process, args=(tmp_path, 2 + 20 * k, 22 + 20 * k)
+        )
+        for k in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # Every message was stored once, whatever the interleaving
+    assert len(store) == 42
+    assert sorted(msg["content"] for msg in store.read_all()) == sorted(
+        msg["content"] for msg in make_messages(0, 42)
+    )
@@ -0,0 +1,34 @@
+"""Testing module for the local extractive compression"""
+
+from src.backend.game_dynamics.compression import compress_messages
+
+
+def test_compression_keeps_salient_sentences():
+    """
+    Tests that boilerplate and repeated descriptions are dropped while player messages and
+    sentences with numbers are always kept.
+    """
+    messages = [
+        {"role": "user", "content": "I enter the tavern. What do you do?"},
+        {
+            "role": "assistant",
+            "content": "**The Rusty Flagon** is dim and smoky. Borin the dwarf polishes a mug."
+            " Borin says goblins haunt the north road. You take 3 damage from a falling beam."
+            " What would you like to do next?",
+        },
+        {
+            "role": "assistant",
+            "content": "The Rusty Flagon is dim and smoky. Borin whispers that goblins took"
+            " his daughter.",
+        },
+    ]
+
+    compressed = compress_messages(messages, keep_ratio=0.5)
+    compressed_text = " ".join(msg["content"] for msg in compressed)
+
+    assert compressed[0] == {"role": "user", "content": "I enter the tavern. What do you do?"}
+    assert "You take 3 damage from a falling beam." in compressed_text
+    assert "What would you like" not in compressed_text
+    assert "**" not in compressed_text
+    assert compressed_text.count("dim and smoky") <= 1
+    assert len(compressed_text) < len(" ".join(msg["content"] for msg in messages))
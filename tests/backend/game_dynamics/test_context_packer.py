@@ -0,0 +1,87 @@
+"""Testing module for the token-budgeted context packer"""
+
+import pytest
+
+from src.backend.game_dynamics import context_packer
+from src.backend.game_dynamics.context_packer import ContextPacker, split_history
+
+CHARACTER = [
+    {"role": "system", "content": "Game Context: You know the character."},
+    {"role": "system", "content": "Name: Ayla"},
+]
+SUMMARY = {"role": "system", "content": "Continuity summary: Ayla found a key"}
+
+
+@pytest.fixture(autouse=True)
+def count_words(monkeypatch):
+    """Counts one token per word, so budgets are easy to reason about."""
+    monkeypatch.setattr(context_packer, "count_tokens", lambda text, _: len(text.split()))
+
+
+def make_turns(num_turns):
+    """Builds alternating user/assistant turns of two words each."""
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"}
+        for i in range(num_turns)
+    ]
+
+
+def test_split_history():
+    """
+    Tests that game context headers pin the message that follows them.
+    """
+    turns = make_turns(2)
+    pinned, summaries, split_turns = split_history(CHARACTER + [SUMMARY] + turns)
+
+    assert pinned == CHARACTER
+    assert summaries == [SUMMARY]
+    assert split_turns == turns
+
+
+def test_pack_drops_oldest_turns_first():
+    """
+    Tests that pinned context, recent turns and the summary are kept before older turns.
+    """
+    turns = make_turns(8)
+    history = CHARACTER + [SUMMARY] + turns
+
+    # Pinned context takes 16 tokens, the summary 10 and every turn 6
+    packer = ContextPacker(
+        "gpt-4",
+        {
+            "prompt_budget": 16 + 10 + 3 * 6,
+            "summary_trigger_tokens": 10 + 8 * 6,
+            "recent_tokens": 12,
+        },
+    )
+
+    assert packer.recent_turns_start(turns) == 6
+    assert packer.pack(history) == CHARACTER + [SUMMARY] + turns[-3:]
+    assert not packer.fits(history)
+    assert packer.needs_summary(history)
+    assert not packer.needs_summary(history[:-1])
+
+
+def test_pack_keeps_the_current_message_when_pinned_context_fills_the_budget(monkeypatch):
+    """
+    Tests that the player's current message is kept when the pinned context takes the whole
+    budget, cutting the pinned context and dropping the summary and older turns instead.
+    """
+    monkeypatch.setattr(
+        context_packer, "truncate_tokens", lambda text, n, _: " ".join(text.split()[:n])
+    )
+    turns = make_turns(3)
+    history = CHARACTER + [SUMMARY] + turns
+
+    # The current message takes 6 tokens and the first pinned message 10, leaving 5 for the
+    # 6 tokens of the second one, cut to a single word
+    packer = ContextPacker("gpt-4", {"prompt_budget": 21, "recent_tokens": 12})
+    packed = packer.pack(history)
+
+    assert packed[-1] == turns[-1]
+    assert packed[:-1] == [CHARACTER[0], {"role": "system", "content": "Name:"}]
+    assert not packer.fits(history)
+
+    # No room left for any of the pinned context
+    packer = ContextPacker("gpt-4", {"prompt_budget": 10})
+    assert packer.pack(history) == [turns[-1]]
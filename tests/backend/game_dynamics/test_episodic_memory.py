@@ -0,0 +1,51 @@
+"""Testing module for the episodic memory of past exchanges"""
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.game_dynamics.episodic_memory import EpisodicMemory
+
+KEYWORDS = ["dragon", "key", "tavern", "river"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds texts as normalized keyword counts, so relevance is easy to predict."""
+
+    def embed_query(self, text):
+        counts = np.array([text.lower().count(word) for word in KEYWORDS], dtype=float) + 0.01
+        return (counts / np.linalg.norm(counts)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def exchange(topic):
+    """Builds a player message about a topic and the Dungeon Master reply."""
+    return [
+        {"role": "user", "content": f"I ask about the {topic}"},
+        {"role": "assistant", "content": f"You learn about the {topic}"},
+    ]
+
+
+def test_exchanges_are_indexed_once_and_recalled(tmp_path):
+    """
+    Tests that only completed exchanges are indexed, each once, and that recall ranks them by
+    relevance while skipping the exchanges still in the context.
+    """
+    store = ChatHistoryStore(tmp_path / "history")
+    memory = EpisodicMemory(tmp_path / "index", KeywordEmbeddings(), top_k=2)
+
+    store.append(exchange("dragon") + exchange("key") + exchange("tavern")[:1])
+    assert memory.add_exchanges(store) == 2
+    assert memory.add_exchanges(store) == 0
+
+    store.append(exchange("tavern")[1:] + exchange("river"))
+    assert memory.add_exchanges(store) == 2
+    assert memory.indexed == 8
+
+    assert memory.recall("Where is the key?", before=8)[0] == (
+        "Player: I ask about the key\n\nDungeon Master: You learn about the key"
+    )
+    # With only 4 messages summarized, the tavern exchange (messages 4 to 6) is still in the context
+    assert not any("tavern" in text for text in memory.recall("the tavern", before=4))
@@ -0,0 +1,126 @@
+"""Testing module for chat history summarization in the game state manager"""
+
+from fastapi import BackgroundTasks
+
+from src.backend.game_dynamics import context_packer
+from src.backend.game_dynamics.game_state_manager import (
+    GameStateManager,
+    load_session_messages,
+)
+
+CAMPAIGN = [
+    {"role": "system", "content": "Game Context: The campaign follows."},
+    {"role": "system", "content": "campaign"},
+]
+
+
+def make_turns(num_turns):
+    """Builds alternating user/assistant messages of two words each."""
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"}
+        for i in range(num_turns)
+    ]
+
+
+def get_manager(tmp_path, monkeypatch, prompt_budget=10**6):
+    """
+    Builds a manager on the sample backend counting one token per word, where 16 turns trigger
+    a summary keeping the last 4 and scenes are 8 history messages long.
+
+    The session holds the first 16 turns, with the campaign stored after the first one.
+    """
+    monkeypatch.setattr(context_packer, "count_tokens", lambda text, _: len(text.split()))
+    manager = GameStateManager("samplev1", tmp_path, summary_backend="samplev1")
+    # Every turn takes 2 tokens plus the message overhead
+    manager.context_packer.system_prompt = ""
+    manager.context_packer.summary_trigger_tokens = 16 * 6
+    manager.context_packer.recent_tokens = 4 * 6
+    manager.context_packer.prompt_budget = prompt_budget
+    manager.story_memory.scene_size = 8
+
+    turns = make_turns(16)
+    manager.record_turn(turns[0]["content"], turns[1]["content"], CAMPAIGN)
+    manager.save_chat_history(turns[2:])
+    return manager
+
+
+def test_session_messages_skip_hidden_context(tmp_path, monkeypatch):
+    """
+    Tests that stored turns are listed by turn id without the hidden game context, which is
+    kept for the Dungeon Master instead.
+    """
+    manager = get_manager(tmp_path, monkeypatch)
+
+    assert manager.current_turn == 18
+    assert manager.load_context() == CAMPAIGN
+    assert [msg["turn"] for msg in load_session_messages(manager.history_store)[:3]] == [1, 4, 5]
+    assert load_session_messages(manager.history_store, after=17) == [
+        {"turn": 18, "role": "assistant", "content": "turn 15"}
+    ]
+
+
+def test_scene_is_summarized_in_background(tmp_path, monkeypatch):
+    """
+    Tests that the scene summary is deferred to a background task and picked up on the next
+    turn, keeping every message newer than the scene.
+    """
+    manager = get_manager(tmp_path, monkeypatch)
+    tasks = BackgroundTasks()
+
+    turns = make_turns(19)
+    assert manager.manage_chat_history("turn 16", tasks) == CAMPAIGN + turns[:17]
+    assert len(tasks.tasks) == 1
+
+    # Run the task after the response, while the player sends another message
+    tasks.tasks[0].func()
+    manager.record_turn("turn 16", "turn 17")
+    summarized = manager.manage_chat_history("turn 18", BackgroundTasks())
+
+    # The scene holds the first 6 turns and the campaign stored with them
+    assert summarized[:2] == CAMPAIGN
+    assert "turn 5" in summarized[2]["content"] and "turn 6" not in summarized[2]["content"]
+    assert summarized[3:] == turns[6:]
+
+
+def test_overflow_summarizes_before_reply(tmp_path, monkeypatch):
+    """
+    Tests that a history that doesn't fit the prompt budget is summarized right away.
+    """
+    manager = get_manager(tmp_path, monkeypatch, prompt_budget=50)
+    tasks = BackgroundTasks()
+
+    summarized = manager.manage_chat_history("turn 16", tasks)
+
+    assert not tasks.tasks
+    assert manager.story_memory.covered == 8
+    assert summarized[3:] == make_turns(17)[6:]
+
+
+def test_sessions_are_isolated(tmp_path, monkeypatch):
+    """
+    Tests that a session only sees its own history and campaign.
+    """
+    manager = get_manager(tmp_path / "first", monkeypatch)
+    manager.campaign_file.write_text("campaign, in full", encoding="utf-8")
+    other = GameStateManager("samplev1", tmp_path / "second", summary_backend="samplev1")
+
+    assert manager.load_context()[1]["content"] == "campaign, in full"
+    assert other.current_turn == 0
+    assert other.build_history("turn 0") == [{"role": "user", "content": "turn 0"}]
+
+
+def test_retried_turn_is_recorded_once(tmp_path, monkeypatch):
+    """
+    Tests that a player message resent with the same idempotency key is stored only once, and
+    that the key never reaches the Dungeon Master context.
+    """
+    manager = get_manager(tmp_path, monkeypatch)
+
+    turn = manager.record_turn("turn 16", "turn 17", idempotency_key="key")
+    assert manager.record_turn("turn 16", "turn 17, again", idempotency_key="key") == turn
+    assert manager.current_turn == turn == 20
+    assert manager.find_reply("key") == (turn, "turn 17")
+    assert manager.find_reply("other key") is None
+
+    history = manager.build_history("turn 18")
+    assert history[-3:] == make_turns(19)[-3:]
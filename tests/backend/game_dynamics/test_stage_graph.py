@@ -0,0 +1,87 @@
+"""Testing module for the campaign pipeline stage graph"""
+
+import threading
+import time
+
+import pytest
+
+from src.backend.game_dynamics.stage_graph import StageGraph
+from src.backend.orchestrator.deadline import Deadline, DeadlineExceeded
+
+
+def test_independent_stages_run_concurrently():
+    """
+    Tests that sibling stages start together and receive their dependency results.
+    """
+    barrier = threading.Barrier(2, timeout=5)
+
+    def sibling(deps):
+        barrier.wait()  # Deadlocks (and times out) unless both siblings run at the same time
+        return deps["root"] + 1
+
+    graph = StageGraph("test")
+    graph.add_stage("root", lambda _: 1)
+    graph.add_stage("left", sibling, depends_on=["root"])
+    graph.add_stage("right", sibling, depends_on=["root"])
+    graph.add_stage("join", lambda deps: deps["left"] + deps["right"], depends_on=["left", "right"])
+
+    results = graph.run()
+
+    assert results["join"] == 4
+    assert set(graph.timings) == {"root", "left", "right", "join"}
+
+
+def test_critical_path_and_targets():
+    """
+    Tests that only the requested targets run and the slowest branch is the critical path.
+    """
+    graph = StageGraph("test")
+    graph.add_stage("root", lambda _: None)
+    graph.add_stage("slow", lambda _: time.sleep(0.2), depends_on=["root"])
+    graph.add_stage("fast", lambda _: None, depends_on=["root"])
+    graph.add_stage("join", lambda _: None, depends_on=["slow", "fast"])
+    graph.add_stage("unused", lambda _: None)
+
+    results = graph.run(["join"])
+
+    assert "unused" not in results
+    assert graph.critical_path() == ["root", "slow", "join"]
+
+
+def test_failures_propagate():
+    """
+    Tests that a failing stage raises and that unknown dependencies are rejected.
+    """
+    graph = StageGraph("test")
+
+    def fail(_):
+        raise RuntimeError("stage failed")
+
+    graph.add_stage("fail", fail)
+    graph.add_stage("after", lambda _: None, depends_on=["fail"])
+
+    with pytest.raises(RuntimeError):
+        graph.run()
+
+    with pytest.raises(ValueError):
+        graph.add_stage("orphan", lambda _: None, depends_on=["missing"])
+
+
+def test_cancelled_run_starts_no_more_stages():
+    """
+    Tests that once the deadline of a run is cancelled, the stages waiting on the running ones
+    never start.
+    """
+    deadline = Deadline(60)
+
+    def cancel(_):
+        deadline.cancel()
+
+    graph = StageGraph("test")
+    graph.add_stage("root", cancel)
+    graph.add_stage("child", lambda _: pytest.fail("Stage started after cancellation"), ["root"])
+
+    with pytest.raises(DeadlineExceeded) as exceeded:
+        graph.run(deadline=deadline)
+    assert exceeded.value.status_code == 499
+    assert set(graph.timings) == {"root"}
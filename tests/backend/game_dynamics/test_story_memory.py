@@ -0,0 +1,53 @@
+"""Testing module for the hierarchical story memory"""
+
+from src.backend.game_dynamics.chat_history_store import ChatHistoryStore
+from src.backend.game_dynamics.story_memory import StoryMemory
+
+
+def summarize_scene(messages):
+    """Joins the scene messages as its summary."""
+    return " ".join(msg["content"] for msg in messages)
+
+
+def summarize_act(scene_summaries):
+    """Joins the scene summaries as the act summary."""
+    return " | ".join(scene_summaries)
+
+
+def get_memory(tmp_path, num_messages):
+    """Builds a memory of 2 message scenes over a history store of user messages."""
+    store = ChatHistoryStore(tmp_path / "history")
+    store.append([{"role": "user", "content": f"m{i}"} for i in range(num_messages)])
+    return StoryMemory(tmp_path / "memory.json", scene_size=2, scenes_per_act=2), store
+
+
+def test_scenes_roll_up_into_acts(tmp_path):
+    """
+    Tests that scenes are summarized once, up to the limit, and rolled up into acts.
+    """
+    memory, store = get_memory(tmp_path, 7)
+
+    while memory.update(store, 7, summarize_scene, summarize_act):
+        pass
+
+    assert memory.covered == 6
+    assert memory.load()["acts"] == [{"start": 0, "stop": 4, "summary": "m0 m1 | m2 m3"}]
+    assert [msg["content"] for msg in memory.context_messages()] == [
+        "Story so far, act 1:\nm0 m1 | m2 m3",
+        "Story so far, latest scenes:\nm4 m5",
+    ]
+
+
+def test_stale_scene_summary_is_discarded(tmp_path):
+    """
+    Tests that a scene summary is not stored if another update covered the scene first.
+    """
+    memory, store = get_memory(tmp_path, 4)
+
+    def racing_summarize_scene(messages):
+        # Another worker stores its summary of the same scene while this one is generated
+        memory.update(store, 4, summarize_scene, summarize_act)
+        return "stale"
+
+    assert not memory.update(store, 4, racing_summarize_scene, summarize_act)
+    assert memory.load()["scenes"] == [{"start": 0, "stop": 2, "summary": "m0 m1"}]
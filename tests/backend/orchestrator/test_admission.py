@@ -0,0 +1,131 @@
+"""Testing module for the admission control of LLM calls"""
+
+import threading
+import time
+
+import pytest
+
+from src.backend.orchestrator.admission import (
+    AdmissionController,
+    OverloadedError,
+    _Ticket,
+    request_priority,
+)
+from src.backend.orchestrator.services import SampleService
+
+
+def test_full_queue_is_rejected_and_waits_time_out():
+    """
+    Tests that calls beyond the queue are rejected with a 429, and that queued calls give up
+    with a 503 once their wait times out.
+    """
+    controller = AdmissionController(
+        "test", max_concurrent=1, max_queue=1, queue_timeout_seconds=0.2
+    )
+    running, release = threading.Event(), threading.Event()
+
+    def hold_slot():
+        with controller.slot("interactive"):
+            running.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    running.wait()
+
+    errors = []
+
+    def wait_for_slot():
+        try:
+            with controller.slot("interactive"):
+                pass
+        except OverloadedError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    while not controller.waiting:
+        time.sleep(0.01)
+
+    with pytest.raises(OverloadedError) as rejected:
+        with controller.slot("interactive"):
+            pass
+    assert rejected.value.status_code == 429
+    assert rejected.value.retry_after >= 1
+
+    waiter.join()
+    release.set()
+    holder.join()
+
+    assert [e.status_code for e in errors] == [503]
+    stats = controller.stats()["priorities"]["interactive"]
+    assert stats["rejected"] == 1 and stats["timed_out"] == 1
+
+    # Once the slot is free, calls are admitted again
+    with controller.slot("interactive"):
+        assert controller.stats()["running"] == 1
+
+
+def test_interactive_calls_go_first_and_background_keeps_its_share():
+    """
+    Tests that a freed slot goes to a waiting interactive call before an earlier background
+    call, unless background calls got less than their share of the latest grants.
+    """
+    controller = AdmissionController(
+        "test", max_concurrent=1, max_queue=4, queue_timeout_seconds=5, background_min_share=0.25
+    )
+    granted = []
+
+    def call(priority):
+        with controller.slot(priority):
+            granted.append(priority)
+
+    def run_queued(priorities):
+        """Queues calls behind a held slot in the given order, then frees the slot."""
+        with controller.slot("interactive"):
+            threads = []
+            for priority in priorities:
+                threads.append(threading.Thread(target=call, args=(priority,)))
+                threads[-1].start()
+                while controller.waiting < len(threads):
+                    time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+    # Only interactive grants so far, so the background call gets the next slot
+    run_queued(["interactive", "background"])
+    assert granted == ["background", "interactive"]
+
+    # A quarter of the latest grants went to background calls, so interactive goes first
+    granted.clear()
+    run_queued(["background", "interactive"])
+    assert granted == ["interactive", "background"]
+
+    # Before any grant, background calls have no share to make up for
+    controller = AdmissionController("test", 1, 4, 5, background_min_share=0.25)
+    controller._queue = [_Ticket(1, 0, "background"), _Ticket(0, 1, "interactive")]
+    assert controller._next_ticket().priority == "interactive"
+
+
+def test_calls_inherit_the_priority_of_their_request():
+    """
+    Tests that calls made for a request of a higher priority class take the request's class,
+    and that requests of a lower class don't lower the class of their calls.
+    """
+    controller = AdmissionController("test", 1, 4, 5)
+    service = SampleService()
+    service.admission = controller
+    service.priority = "background"
+
+    with request_priority("interactive"):
+        service.generate_formatted_response("prompt")
+    service.generate_formatted_response("prompt")
+
+    service.priority = "interactive"
+    with request_priority("batch"):
+        service.generate_formatted_response("prompt")
+
+    admitted = {
+        priority: stats["admitted"] for priority, stats in controller.stats()["priorities"].items()
+    }
+    assert admitted == {"interactive": 2, "background": 1, "batch": 0}
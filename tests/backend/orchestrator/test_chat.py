@@ -0,0 +1,51 @@
+"""Testing module for chat turns"""
+
+from fastapi import BackgroundTasks
+
+from src.backend.database.models import GameSession
+from src.backend.game_dynamics.game_state_manager import GameStateManager
+from src.backend.orchestrator import main
+from src.backend.orchestrator.models import ChatRequest, ChatResponse
+
+
+class FailingService:
+    """Dungeon Master that fails the test if it is asked for a reply."""
+
+    def chat_completion(self, deadline=None):
+        raise AssertionError("The recorded reply should have been replayed")
+
+
+def test_recorded_turn_is_replayed_without_a_new_reply(tmp_path, monkeypatch):
+    """
+    Tests that a retried request whose reply expired from the reply cache but is still in the
+    history gets the recorded reply, even if it is behind the session's turn.
+    """
+    monkeypatch.setattr(main, "get_session_dir", lambda session_id: tmp_path)
+    # The turn is played with the sample backends, without OpenAI credentials
+    monkeypatch.setattr(
+        main,
+        "GameStateManager",
+        lambda backend, session_dir: GameStateManager(
+            "samplev1", session_dir, summary_backend="samplev1"
+        ),
+    )
+    manager = GameStateManager("samplev1", tmp_path, summary_backend="samplev1")
+    manager.record_turn("I open the door", "The door creaks open.", idempotency_key="key")
+    manager.record_turn("I step in", "It is dark inside.")
+
+    response = main.play_turn(
+        ChatRequest(
+            user_message="I open the door",
+            session_id="session-1",
+            last_seen_turn=0,
+            idempotency_key="key",
+        ),
+        http_request=None,
+        background_tasks=BackgroundTasks(),
+        dungeon_master=FailingService(),
+        db=None,
+        game_session=GameSession(id="session-1", character_id=1),
+    )
+
+    assert response == ChatResponse(assistant_message="The door creaks open.", turn=2)
+    assert manager.current_turn == 4
@@ -0,0 +1,73 @@
+"""Testing module for backend circuit breakers and fallbacks"""
+
+import time
+
+import openai
+import pytest
+
+from src.backend.orchestrator.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    is_backend_failure,
+)
+from src.backend.orchestrator.services import SampleService
+
+
+class FailingService(SampleService):
+    """Sample service whose backend is down."""
+
+    def _generate_formatted_response(self, formatted_prompt, deadline):
+        raise openai.APIConnectionError(request=None)
+
+
+def test_breaker_opens_falls_over_and_recovers():
+    """
+    Tests that failed calls open the breaker and fall over to the fallback service, and that a
+    successful probe after the cool-down closes the breaker again.
+    """
+    breaker = CircuitBreaker("test", window=4, min_calls=2, open_seconds=0.1)
+    service = FailingService()
+    service.breaker = breaker
+    service.fallback = SampleService
+
+    for _ in range(2):
+        assert service.generate_formatted_response("hi") == "(Local AI) Prompt was: 'hi'"
+    assert breaker.state == OPEN and breaker.trips == 1
+
+    # While open, calls go straight to the fallback
+    assert service.generate_formatted_response("hi") == "(Local AI) Prompt was: 'hi'"
+    assert breaker.rejected == 1
+
+    # After the cool-down a single probe goes through and closes the breaker if it succeeds
+    time.sleep(0.1)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success(0.01)
+    assert breaker.state == CLOSED
+
+
+def test_only_backend_failures_trip_the_breaker():
+    """
+    Tests that bugs of this server propagate without counting against the backend or falling
+    over, while connection errors do.
+    """
+
+    class BuggyService(SampleService):
+        """Sample service with a bug of its own."""
+
+        def _generate_formatted_response(self, formatted_prompt, deadline):
+            raise KeyError("content")
+
+    breaker = CircuitBreaker("test", window=4, min_calls=1)
+    service = BuggyService()
+    service.breaker = breaker
+    service.fallback = SampleService
+
+    with pytest.raises(KeyError):
+        service.generate_formatted_response("hi")
+    assert breaker.state == CLOSED
+
+    assert is_backend_failure(openai.APIConnectionError(request=None))
+    assert not is_backend_failure(TypeError("bad argument"))
@@ -0,0 +1,36 @@
+"""Testing module for request deadlines"""
+
+import time
+
+import pytest
+
+from src.backend.orchestrator.admission import AdmissionController
+from src.backend.orchestrator.deadline import Deadline, DeadlineExceeded
+from src.backend.orchestrator.services import SampleService
+
+
+def test_deadline_caps_stage_timeouts_and_expires():
+    """
+    Tests that stages get the time left as timeout, and that LLM calls fail fast once the
+    deadline passed.
+    """
+    deadline = Deadline(0.2)
+    assert 0 < deadline.timeout() <= 0.2
+    assert deadline.timeout(cap=0.05) == 0.05
+
+    # The admission wait is bounded by the deadline, not by the queue timeout, and running out
+    # of time is a 504, not an overload to retry
+    controller = AdmissionController("test", 1, 1, queue_timeout_seconds=10)
+    with controller.slot("interactive"):
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with controller.slot("interactive", deadline.timeout()):
+                pass
+        assert time.monotonic() - start < 1
+
+    service = SampleService()
+    service.admission = controller
+    with pytest.raises(DeadlineExceeded) as exceeded:
+        service.generate_formatted_response("prompt", deadline)
+    assert exceeded.value.status_code == 504
+    assert controller.stats()["running"] == 0
@@ -0,0 +1,152 @@
+"""Testing module for the campaign creation jobs"""
+
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.backend.database.init_db import create_tables
+from src.backend.database.models import CampaignJob, GameSession
+from src.backend.game_dynamics import game_state_manager
+from src.backend.orchestrator import jobs
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.jobs import CampaignJobManager
+from src.backend.orchestrator.models import ChatRequest, ChatResponse
+from src.backend.orchestrator.routes.jobs import router
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """Points the jobs at a fresh game database and sessions directory."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'game.db'}", connect_args={"check_same_thread": False}
+    )
+    create_tables(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    monkeypatch.setattr(game_state_manager, "SESSIONS_DIR", tmp_path / "sessions")
+    yield factory
+    engine.dispose()
+
+
+def welcome(request):
+    """Campaign creation pipeline answering with the player's story start."""
+    return ChatResponse(assistant_message=f"Welcome to {request.user_message}")
+
+
+def test_submit_returns_the_active_job_of_a_session(session_factory):
+    """
+    Tests that a second submission for a session resumes its active job, and that the job's
+    status holds the response once completed.
+    """
+    release = threading.Event()
+
+    def run_campaign(request):
+        release.wait(5)
+        return welcome(request)
+
+    manager = CampaignJobManager(run_campaign)
+    request = ChatRequest(user_message="the north", session_id="session-1")
+
+    job = manager.submit(request)
+    assert job.status in jobs.ACTIVE_STATUSES
+    assert manager.submit(request).job_id == job.job_id
+    assert manager.get(job.job_id).result is None
+
+    release.set()
+    manager.executor.shutdown(wait=True)
+
+    completed = manager.get(job.job_id)
+    assert completed.status == "completed"
+    assert completed.result.assistant_message == "Welcome to the north"
+    assert manager.get("unknown") is None
+
+
+def test_failed_jobs_record_their_error(session_factory):
+    """
+    Tests that a job whose pipeline raises is marked as failed with the error.
+    """
+
+    def run_campaign(_):
+        raise ValueError("No campaign outline")
+
+    manager = CampaignJobManager(run_campaign)
+    job = manager.submit(ChatRequest(user_message="the north", session_id="session-1"))
+    manager.executor.shutdown(wait=True)
+
+    failed = manager.get(job.job_id)
+    assert failed.status == "failed"
+    assert failed.error == "No campaign outline"
+    assert failed.result is None
+
+
+def test_start_resumes_jobs_interrupted_by_a_restart(session_factory):
+    """
+    Tests that jobs left pending or running by a previous worker are run on start, and that
+    finished jobs are left alone.
+    """
+    db = session_factory()
+    db.add_all(
+        [
+            CampaignJob(id="running", session_id="session-1", user_message="the north"),
+            CampaignJob(id="pending", session_id="session-2", user_message="the south"),
+            CampaignJob(
+                id="failed", session_id="session-3", user_message="the east", status="failed"
+            ),
+        ]
+    )
+    db.commit()
+    db.get(CampaignJob, "running").status = "running"
+    db.commit()
+    db.close()
+
+    manager = CampaignJobManager(welcome)
+    manager.start()
+    manager.executor.shutdown(wait=True)
+
+    assert manager.get("running").status == "completed"
+    assert manager.get("running").result.assistant_message == "Welcome to the north"
+    assert manager.get("pending").status == "completed"
+    assert manager.get("failed").status == "failed"
+
+
+def test_job_routes(session_factory):
+    """
+    Tests that jobs are submitted for existing game sessions only and polled by id.
+    """
+    app = FastAPI()
+    app.include_router(router)
+    app.state.campaign_jobs = CampaignJobManager(welcome)
+
+    def get_test_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    db = session_factory()
+    db.add(GameSession(id="session-1"))
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    payload = {"user_message": "the north", "session_id": "session-1"}
+    assert (
+        client.post("/campaign/jobs", json={**payload, "session_id": "unknown"}).status_code == 404
+    )
+
+    submitted = client.post("/campaign/jobs", json=payload)
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+    app.state.campaign_jobs.executor.shutdown(wait=True)
+
+    polled = client.get(f"/campaign/jobs/{job_id}")
+    assert polled.status_code == 200
+    assert polled.json()["status"] == "completed"
+    assert polled.json()["result"]["assistant_message"] == "Welcome to the north"
+    assert client.get("/campaign/jobs/unknown").status_code == 404
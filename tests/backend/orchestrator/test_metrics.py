@@ -0,0 +1,63 @@
+"""Testing module for the Prometheus metrics"""
+
+import pytest
+
+from src.backend.orchestrator.dependencies import get_db
+from src.backend.orchestrator.metrics import (
+    DB_SESSION_SECONDS,
+    LLM_CALL_SECONDS,
+    LLM_CALLS,
+    Histogram,
+    Metric,
+)
+from src.backend.orchestrator.services import SampleService
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    Tests that histograms count every value in its bucket and in all the larger ones, and
+    reject samples missing a label.
+    """
+    histogram = Histogram("test_seconds", "Test durations.", ["stage"], buckets=(0.1, 1))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5, stage="a")
+
+    lines = histogram.render().splitlines()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+    with pytest.raises(ValueError):
+        histogram.observe(1)
+
+    # Metric types must say how their samples are rendered
+    with pytest.raises(TypeError):
+        Metric("test_total", "Test values.")
+
+
+def test_llm_calls_are_recorded_by_service_type_and_backend():
+    """
+    Tests that LLM service calls are timed and counted under their service type and backend.
+    """
+    service = SampleService(initial_prompt="You are a test.")
+    service.service_type, service.backend = "test-service", "test-backend"
+    labels = {"service_type": "test-service", "backend": "test-backend"}
+
+    service.generate_formatted_response("Hello")
+
+    assert LLM_CALL_SECONDS.count(method="generate_formatted_response", **labels) == 1
+    assert LLM_CALLS.value(method="generate_formatted_response", outcome="ok", **labels) == 1
+
+
+def test_database_sessions_are_timed_by_the_endpoint_dependency():
+    """
+    Tests that the database session dependency of the endpoints records how long it was held.
+    """
+    count = DB_SESSION_SECONDS.count()
+    sessions = get_db()
+    next(sessions)
+    sessions.close()
+
+    assert DB_SESSION_SECONDS.count() == count + 1
@@ -0,0 +1,53 @@
+"""Testing module for retries and hedged LLM calls"""
+
+import threading
+
+import openai
+
+from src.backend.orchestrator.resilience import ResiliencePolicy
+
+
+def test_retryable_errors_are_retried():
+    """
+    Tests that calls failing with a retryable error are retried until they succeed.
+    """
+    policy = ResiliencePolicy("test", max_retries=2, backoff_base_seconds=0.01)
+    attempts = []
+
+    def attempt(_):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise openai.APIConnectionError(request=None)
+        return "reply"
+
+    assert policy.call(attempt) == "reply"
+    assert len(attempts) == 3
+    assert policy.stats()["retries"] == 2 and policy.stats()["failures"] == 0
+
+
+def test_slow_calls_are_hedged_and_the_loser_cancelled():
+    """
+    Tests that a call slower than the hedge delay gets a duplicate, that the first to return is
+    used, and that the slow one is cancelled.
+    """
+    policy = ResiliencePolicy("test", hedge=True, hedge_budget=1, hedge_min_samples=1)
+    policy.latencies.record(0.05)
+    policy.calls = 1
+
+    calls = []
+    cancelled = threading.Event()
+
+    def attempt(deadline):
+        calls.append(deadline)
+        if len(calls) == 1:
+            # The first call hangs until it is cancelled
+            while not deadline.expired:
+                threading.Event().wait(0.01)
+            cancelled.set()
+            raise TimeoutError
+        return "hedged reply"
+
+    assert policy.call(attempt) == "hedged reply"
+    assert cancelled.wait(5)
+    stats = policy.stats()
+    assert stats["hedges"] == 1 and stats["hedge_win_rate"] == 1
@@ -0,0 +1,84 @@
+"""Testing module for the cost and latency aware model router"""
+
+import pytest
+
+from src.backend.orchestrator import router
+from src.backend.orchestrator.router import ModelRouter
+from src.backend.orchestrator.services import RoutedService
+
+
+@pytest.fixture(autouse=True)
+def count_words(monkeypatch):
+    """Counts one token per word, so prompt sizes are easy to reason about."""
+    monkeypatch.setattr(router, "count_tokens", lambda text, _: len(text.split()))
+
+
+def get_router(cheap_latency: float = 2, cheap_window: int = 4096) -> ModelRouter:
+    """Router between a cheap low tier backend and an expensive high tier one."""
+    return ModelRouter(
+        backends={
+            "gpt3-5": {
+                "tier": 1,
+                "cost_per_1k_tokens": 0.0015,
+                "expected_latency_seconds": cheap_latency,
+                "context_window": cheap_window,
+                "model": "gpt-3.5-turbo",
+            },
+            "gpt-4": {
+                "tier": 2,
+                "cost_per_1k_tokens": 0.03,
+                "expected_latency_seconds": 8,
+                "context_window": 8192,
+                "model": "gpt-4",
+            },
+        },
+        complexity_tiers={"low": 1, "high": 2},
+        reply_tokens=100,
+    )
+
+
+def test_routes_by_complexity_prompt_size_and_latency():
+    """
+    Tests that cheap tasks go to the cheap backend, unless their prompt doesn't fit it or it
+    is expected to miss the latency SLO, and that complex tasks go to the high tier backend.
+    """
+    router = get_router()
+    cheap_task = {"complexity": "low", "latency_slo_seconds": 5}
+
+    assert router.choose(cheap_task, "Pick a location") == "gpt3-5"
+    assert router.choose({"complexity": "high"}, "Write a campaign") == "gpt-4"
+
+    long_prompt = "The party walks further into the dungeon. " * 100
+    assert get_router(cheap_window=200).choose(cheap_task, long_prompt) == "gpt-4"
+
+    # No backend meets the SLO, the fastest one is picked
+    assert get_router(cheap_latency=30).choose(cheap_task, "Pick a location") == "gpt-4"
+
+
+def test_routed_service_delegates_to_the_routed_backend():
+    """
+    Tests that routed services answer with the service of the picked backend, and that looking
+    up their embedding model doesn't create backend services.
+    """
+    routed = RoutedService("prompt-tester", None, {"complexity": "low"})
+    routed.router = ModelRouter(
+        backends={
+            "samplev1": {
+                "tier": 1,
+                "cost_per_1k_tokens": 0,
+                "expected_latency_seconds": 0.1,
+                "context_window": 4096,
+                "model": "sample",
+            }
+        },
+        complexity_tiers={"low": 1},
+        reply_tokens=100,
+    )
+
+    assert routed.embedding_model is None
+    assert not routed._services
+
+    assert routed.generate_formatted_response("hi") == "(Local AI) Prompt was: 'hi'"
+    routed.conversation_history = [{"role": "user", "content": "Hello"}]
+    assert routed.chat_completion() == "(Local AI) You said: Hello"
+    assert list(routed._services) == ["samplev1"]
@@ -0,0 +1,94 @@
+"""Testing module for the generation telemetry and the usage ledger"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.backend.database.models import UsageLedgerEntry
+from src.backend.game_dynamics.campaign_creation import CampaignStream
+from src.backend.game_dynamics.stage_graph import StageGraph
+from src.backend.orchestrator import telemetry
+from src.backend.orchestrator.services import SampleService
+from src.backend.orchestrator.telemetry import (
+    GenerationRecord,
+    UsageLedger,
+    session_context,
+    usage_summary,
+)
+
+
+def test_calls_are_recorded_for_the_session_of_their_request(monkeypatch):
+    """
+    Tests that every call of a service emits a telemetry record attributed to the session of
+    the context it is made in.
+    """
+    records = []
+    monkeypatch.setattr(telemetry, "emit", records.append)
+    service = SampleService(initial_prompt="You are a test.")
+    service.service_type = "test-service"
+
+    with session_context("session-1"):
+        service.generate_formatted_response("Hello")
+
+    assert len(records) == 1
+    record = records[0]
+    assert record.session_id == "session-1" and record.service_type == "test-service"
+    assert record.method == "generate_formatted_response" and record.outcome == "ok"
+    assert record.latency_seconds is not None
+
+
+def test_calls_on_other_threads_are_recorded_for_the_caller_session(monkeypatch):
+    """
+    Tests that calls made by pipeline stages and streamed on a campaign stream thread are
+    attributed to the session of the context that started them.
+    """
+    records = []
+    monkeypatch.setattr(telemetry, "emit", records.append)
+    service = SampleService(initial_prompt="You are a test.")
+
+    with session_context("session-1"):
+        graph = StageGraph("test")
+        graph.add_stage("first", lambda _: service.generate_formatted_response("Hello"))
+        graph.add_stage("second", lambda _: service.generate_formatted_response("Hi"))
+        graph.run()
+
+        stream = CampaignStream(
+            service.stream_formatted_response("Hello"),
+            on_opening_sections=lambda text: None,
+            on_complete=lambda text: None,
+        )
+    stream.done.wait(5)
+
+    assert len(records) == 3
+    assert {record.session_id for record in records} == {"session-1"}
+
+
+def test_ledger_aggregates_usage_per_session_and_service(monkeypatch):
+    """
+    Tests that flushed records are summed per session, service type and model, and that the
+    summary averages TTFT only over the calls reporting it.
+    """
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    UsageLedgerEntry.__table__.create(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(telemetry, "SessionLocal", session_factory)
+
+    ledger = UsageLedger()
+    for ttft in (0.5, None):
+        record = GenerationRecord("gpt-4", "dungeon-master", "gpt-4", "chat_completion", "s1")
+        record.prompt_tokens, record.completion_tokens, record.ttft_seconds = 100, 20, ttft
+        record.finish("ok")
+        ledger.add(record)
+        ledger.flush()
+
+    db = session_factory()
+    summary = usage_summary(db, "s1")
+    assert len(summary) == 1
+    usage = summary[0]
+    assert usage["calls"] == 2 and usage["failed_calls"] == 0
+    assert usage["prompt_tokens"] == 200 and usage["completion_tokens"] == 40
+    assert usage["average_ttft_seconds"] == 0.5
+    assert usage_summary(db, "other-session") == []
+    db.close()
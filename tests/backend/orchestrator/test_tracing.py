@@ -0,0 +1,100 @@
+"""Testing module for request tracing and profiling"""
+
+import json
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.backend.orchestrator.profiling import ProfilingManager
+from src.backend.orchestrator.routes import profiling as profiling_routes
+from src.backend.orchestrator.tracing import Span, SpanExporter, Tracer
+from src.logger_definition import TraceContextFilter
+
+
+def test_nested_spans_are_exported_as_one_trace(tmp_path):
+    """
+    Tests that spans started inside a span join its trace, that logs written inside carry the
+    trace id, and that the trace is exported as OTLP JSON once its root span ends.
+    """
+    tracer = Tracer(sample_rate=1.0, export_file=str(tmp_path / "traces.jsonl"))
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "message", None, None)
+
+    with tracer.span("request") as root:
+        with tracer.span("llm.call", model="gpt-4") as child:
+            TraceContextFilter().filter(record)
+
+    assert record.trace_id == root.trace_id and record.span_id == child.span_id
+    tracer.exporter.flush()
+    lines = (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_name = {span["name"]: span for span in spans}
+    assert by_name["llm.call"]["parentSpanId"] == root.span_id
+    assert {span["traceId"] for span in spans} == {root.trace_id}
+    assert "parentSpanId" not in by_name["request"]
+
+
+def test_trace_files_are_rotated_by_size(tmp_path):
+    """Tests that the exporter rotates the trace file once it reaches its size limit."""
+    exporter = SpanExporter(tmp_path / "traces.jsonl", max_bytes=1, backup_count=1)
+    for name in ("first", "second", "third"):
+        exporter.export(Span(name, "0" * 31 + "1"), local_root=True)
+        exporter.flush()
+
+    assert "third" in (tmp_path / "traces.jsonl").read_text(encoding="utf-8")
+    assert "second" in (tmp_path / "traces.jsonl.1").read_text(encoding="utf-8")
+    assert not (tmp_path / "traces.jsonl.2").exists()
+
+
+def test_requests_join_the_trace_of_their_traceparent(tmp_path):
+    """Tests that a span started from a W3C traceparent header continues the caller's trace."""
+    tracer = Tracer(sample_rate=1.0, export_file=str(tmp_path / "traces.jsonl"))
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+    with tracer.span("request", traceparent=header) as request_span:
+        pass
+
+    assert request_span.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert request_span.parent_id == "b7ad6b7169203331" and request_span.sampled
+
+
+def test_profiles_hold_the_stacks_of_the_traced_threads(tmp_path):
+    """Tests that a profiled trace records the stacks of the code running in its spans."""
+    tracer = Tracer(sample_rate=1.0, export_file=str(tmp_path / "traces.jsonl"))
+    profiling = ProfilingManager(interval_ms=1, output_dir=str(tmp_path / "profiles"))
+
+    def busy_turn():
+        end = time.monotonic() + 0.2
+        while time.monotonic() < end:
+            pass
+
+    with tracer.span("request") as request_span:
+        with profiling.profile(request_span.trace_id):
+            busy_turn()
+
+    profile = (tmp_path / "profiles" / f"{request_span.trace_id}.folded").read_text()
+    assert "test_tracing.busy_turn" in profile
+    assert profiling.profiles() == [f"{request_span.trace_id}.folded"]
+
+
+def test_sample_rate_is_changed_at_runtime_only_when_enabled(tmp_path, monkeypatch):
+    """
+    Tests that the sample rate can't be changed through the profiling route unless runtime
+    control is enabled.
+    """
+    profiling = ProfilingManager(output_dir=str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiling_routes, "profiling", profiling)
+    app = FastAPI()
+    app.include_router(profiling_routes.router)
+    client = TestClient(app)
+
+    assert client.put("/profiling", params={"sample_rate": 1.0}).status_code == 403
+    assert profiling.sample_rate == 0.0
+
+    profiling.runtime_control = True
+    response = client.put("/profiling", params={"sample_rate": 0.5})
+    assert response.status_code == 200
+    assert response.json()["sample_rate"] == 0.5
+    assert profiling.sample_rate == 0.5
@@ -0,0 +1,13 @@
+"""Project wide test fixtures"""
+
+import pytest
+
+from src.backend.orchestrator import tracing
+
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    """Exports the spans of the process-wide tracer to a temporary trace file."""
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing.tracer, "exporter", tracing.SpanExporter(path))
+    return path
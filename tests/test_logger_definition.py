@@ -0,0 +1,87 @@
+"""Testing module for the queued JSON logging"""
+
+import json
+import logging
+import queue
+import threading
+
+from src.logger_definition import (
+    MAX_MESSAGE_CHARS,
+    JSONFormatter,
+    NonBlockingQueueHandler,
+    trace_context,
+)
+
+
+def make_record(msg: str, *args) -> logging.LogRecord:
+    """Builds an info record of the test logger."""
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_long_messages_are_truncated_and_stamped_with_the_trace():
+    """
+    Tests that queued records have their arguments merged into a truncated message and carry
+    the trace context of the thread that logged them.
+    """
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    token = trace_context.set(("a" * 32, "b" * 16))
+    try:
+        handler.handle(make_record("History: %s", "x" * (MAX_MESSAGE_CHARS * 2)))
+    finally:
+        trace_context.reset(token)
+
+    record = log_queue.get_nowait()
+    assert record.args is None
+    assert record.getMessage().endswith(f"... [{MAX_MESSAGE_CHARS + 9} more characters]")
+    entry = json.loads(JSONFormatter().format(record))
+    assert (entry["trace_id"], entry["span_id"]) == ("a" * 32, "b" * 16)
+
+
+def test_records_are_dropped_when_the_queue_is_full():
+    """
+    Tests that records logged while the queue is full are dropped and counted, without blocking
+    the thread logging them.
+    """
+    log_queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+    for i in range(3):
+        handler.handle(make_record("Record %d", i))
+    assert handler.dropped == 2
+
+    log_queue.get_nowait()
+    handler.handle(make_record("Record %d", 3))
+    assert log_queue.get_nowait().getMessage() == "Record 3"
+    assert handler.dropped == 2
+
+
+def test_dropped_records_are_counted_across_threads():
+    """
+    Tests that records dropped by many threads at once are all counted.
+    """
+    log_queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.enqueue(make_record("Record"))
+
+    def log_records():
+        for _ in range(1000):
+            handler.enqueue(make_record("Record"))
+
+    threads = [threading.Thread(target=log_records) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert handler.dropped == 8000
+
+
+def test_json_records_carry_extra_data():
+    """
+    Tests that the data attached to a record is written as a JSON field next to its message.
+    """
+    record = make_record("Generation")
+    record.data = {"tokens": 3}
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["message"] == "Generation"
+    assert entry["data"] == {"tokens": 3}